@@ -0,0 +1,55 @@
+import datetime
+import unittest
+from anniversaries import AnniversaryIndex, BIRTHDAY, ANNIVERSARY
+from Family import Family
+from Individual import Individual
+
+def person(id, birt):
+    return Individual.instance_from_dict({'INDI': id, 'NAME': 'Person /%s' % id, 'SEX': 'M', 'BIRT': birt}, validate=False)
+
+class AnniversariesTests(unittest.TestCase):
+    def setUp(self):
+        self.people = [person('I1', '29 FEB 1996'), person('I2', '28 FEB 1990'), person('I3', '1 MAR 1980'),
+                       person('I4', '31 DEC 1950'), person('I5', '1 JAN 2000'), person('I6', '10 OCT 2020')]
+        self.index = AnniversaryIndex(self.people)
+
+    def ids(self, occurrences):
+        return [occurrence.entity.id for occurrence in occurrences]
+
+    def test_leap_day(self):
+        # In a common year 29 Feb comes round on 28 Feb
+        found = self.index.between(BIRTHDAY, datetime.date(2023, 2, 28), datetime.date(2023, 2, 28))
+        self.assertEqual(sorted(self.ids(found)), ['I1', 'I2'])
+        self.assertEqual(found[0].on, datetime.date(2023, 2, 28))
+        self.assertEqual(self.ids(self.index.between(BIRTHDAY, datetime.date(2023, 3, 1), datetime.date(2023, 3, 1))), ['I3'])
+        self.assertEqual(self.ids(self.index.between(BIRTHDAY, datetime.date(2024, 2, 29), datetime.date(2024, 3, 1))), ['I1', 'I3'])
+
+    def test_year_end(self):
+        found = self.index.upcoming(BIRTHDAY, datetime.datetime(2023, 12, 20, 15, 30), 30)
+        self.assertEqual(self.ids(found), ['I4', 'I5'])
+        self.assertEqual([occurrence.on.year for occurrence in found], [2023, 2024])
+        self.assertEqual(self.ids(self.index.recent(BIRTHDAY, datetime.date(2024, 1, 1), 1)), ['I4', 'I5'])
+
+    def test_matches_scan(self):
+        for start in range(0, 800, 7):
+            as_of = datetime.date(2023, 1, 1) + datetime.timedelta(days=start)
+            expected = []
+            for day in range(1, 31):
+                on = as_of + datetime.timedelta(days=day)
+                for indiv in self.people:
+                    month, mday = indiv.bday.month, indiv.bday.day
+                    if (month, mday) == (2, 29) and on.year % 4:
+                        mday = 28
+                    if (on.month, on.day) == (month, mday):
+                        expected.append(indiv.id)
+            self.assertEqual(self.ids(self.index.upcoming(BIRTHDAY, as_of, 30)), expected)
+
+    def test_anniversaries_and_births(self):
+        fam = Family.instance_from_dict({'FAM': 'F1', 'HUSB': self.people[3], 'WIFE': self.people[4],
+                                         'MARR': '5 JAN 1975', 'CHIL': []}, validate=False)
+        index = AnniversaryIndex(self.people, [fam])
+        self.assertEqual(self.ids(index.upcoming(ANNIVERSARY, datetime.date(2030, 1, 1), 4)), ['F1'])
+        self.assertEqual([indiv.id for indiv in index.born_since(datetime.date(2000, 1, 1))], ['I5', 'I6'])
+
+if __name__ == "__main__":
+    unittest.main()
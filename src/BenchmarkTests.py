@@ -0,0 +1,27 @@
+import unittest
+import benchmark
+
+class BenchmarkTests(unittest.TestCase):
+    def test_measure(self):
+        stats = benchmark.measure("./data/SmithFamilyErrors_Final.ged", repeat=2, allocations=True)
+        phases = stats["phases"]
+        for phase in ["parse", "build", "link", "index:kinship", "rule:Family._check_dates",
+                      "rule:_tree_bigamy", "diagnostics", "render"]:
+            self.assertTrue(phase in phases)
+            self.assertTrue(phases[phase]["seconds"] >= 0)
+            self.assertTrue("peak_bytes" in phases[phase])
+        self.assertEqual(phases["parse"]["records"], stats["records"])
+        self.assertEqual(phases["rule:Family._check_dates"]["stories"][0], "US01")
+
+    def test_compare(self):
+        def run(name, seconds, rss=1000):
+            return { "name": name, "peak_rss_kb": rss,
+                     "phases": dict((phase, { "seconds": value }) for phase, value in seconds.items()) }
+        baseline = { "runs": [run("1000", { "parse": 1.0, "link": 0.001, "render": 2.0 })] }
+        results = { "runs": [run("1000", { "parse": 1.5, "link": 0.005, "render": 2.1 }, 2000),
+                             run("5000", { "parse": 9.0 })] }
+        self.assertEqual(benchmark.compare(results, baseline),
+                         [("1000", "parse", 1.0, 1.5), ("1000", "peak_rss_kb", 1000, 2000)])
+
+if __name__ == "__main__":
+    unittest.main()
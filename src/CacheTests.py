@@ -0,0 +1,63 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import cache
+import rules
+import Project3
+from io import StringIO
+
+class CacheTests(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.old_stdout = sys.stdout
+        self.old_stderr = sys.stderr
+        sys.stdout = StringIO()
+        sys.stderr = StringIO()
+
+    def tearDown(self):
+        sys.stdout = self.old_stdout
+        sys.stderr = self.old_stderr
+        shutil.rmtree(self.cache_dir)
+
+    def test_hit_matches_parse(self):
+        indivs, fams = Project3.process_file("./data/SmithFamilyErrors2.ged", validate=False)
+        rules.validate_all(indivs, fams)
+        Project3.cached_process_file("./data/SmithFamilyErrors2.ged", self.cache_dir)
+        err = sys.stderr.getvalue()
+        sys.stderr = StringIO()
+        cached_indivs, cached_fams = Project3.cached_process_file("./data/SmithFamilyErrors2.ged", self.cache_dir)
+
+        self.assertEqual(sys.stderr.getvalue() * 2, err)
+        self.assertEqual([i.to_row() for i in cached_indivs], [i.to_row() for i in indivs])
+        self.assertEqual([f.to_row() for f in cached_fams], [f.to_row() for f in fams])
+        self.assertEqual([f.errors for f in cached_fams], [f.errors for f in fams])
+        self.assertTrue(any(indiv is cached_fams[0].husband for indiv in cached_indivs))
+
+    def test_corrupt_snapshot_is_a_miss(self):
+        Project3.cached_process_file("./data/SmithFamily.ged", self.cache_dir)
+        err = sys.stderr.getvalue()
+        written = os.listdir(self.cache_dir)
+        self.assertEqual(len(written), 1)
+        path = os.path.join(self.cache_dir, written[0])
+        with open(path, "wb") as f:
+            f.write(cache.MAGIC + b"garbage")
+
+        sys.stderr = StringIO()
+        indivs, fams = Project3.cached_process_file("./data/SmithFamily.ged", self.cache_dir)
+        self.assertEqual(sys.stderr.getvalue(), err)
+        self.assertTrue(indivs and fams)
+        self.assertEqual(os.listdir(self.cache_dir), written)
+        self.assertIsNotNone(cache.load(self.cache_dir, written[0][:-len(cache.SUFFIX)]))
+
+    def test_eviction(self):
+        Project3.cached_process_file("./data/SmithFamily.ged", self.cache_dir)
+        Project3.cached_process_file("./data/SmithFamilyErrors2.ged", self.cache_dir, max_bytes=4096)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+
+        Project3.cached_process_file("./data/SmithFamilyErrors3.ged", self.cache_dir, max_bytes=1)
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+if __name__ == '__main__':
+    unittest.main()
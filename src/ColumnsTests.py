@@ -0,0 +1,42 @@
+import glob
+import sys
+import unittest
+import Project3
+from io import StringIO
+from columns import np
+
+if np is not None:
+    from columns import TreeColumns, future_dates, death_before_birth, too_old
+
+@unittest.skipIf(np is None, "numpy is not installed")
+class ColumnsTests(unittest.TestCase):
+    def load(self, file):
+        old_stdout, old_stderr = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = StringIO(), StringIO()
+        try:
+            return Project3.process_file(file)
+        finally:
+            sys.stdout, sys.stderr = old_stdout, old_stderr
+
+    def rows_with(self, indivs, story):
+        return [i for i, indiv in enumerate(indivs) if any(story + ":" in e for e in indiv.errors)]
+
+    def test_checks_match_individuals(self):
+        for file in glob.glob("./data/*.ged"):
+            indivs, fams = self.load(file)
+            cols = TreeColumns(indivs, fams)
+            self.assertEqual(list(future_dates(cols)), self.rows_with(indivs, "US01"), file)
+            self.assertEqual(list(death_before_birth(cols)), self.rows_with(indivs, "US03"), file)
+            self.assertEqual(list(too_old(cols)), self.rows_with(indivs, "US07"), file)
+
+    def test_parent_and_spouse_rows(self):
+        indivs, fams = self.load("./data/ForwardReferences.ged")
+        cols = TreeColumns(indivs, fams)
+        tom = cols.row['@I3@']
+        self.assertEqual(cols.father[tom], cols.row['@I1@'])
+        self.assertEqual(cols.mother[tom], cols.row['@I2@'])
+        self.assertEqual(list(cols.spouses(cols.row['@I1@'])), [cols.row['@I2@']])
+        self.assertEqual(list(cols.sex), [1, 2, 1, 2])
+
+if __name__ == '__main__':
+    unittest.main()
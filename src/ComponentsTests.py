@@ -0,0 +1,69 @@
+import unittest
+import Project3
+import diagnostics
+import rules
+from components import UnionFind, components, batches, validate_parallel
+from contextlib import redirect_stderr, redirect_stdout
+from io import StringIO
+
+def load(file):
+    with redirect_stdout(StringIO()), redirect_stderr(StringIO()):
+        return Project3.process_file(file, validate=False)
+
+class ComponentsTests(unittest.TestCase):
+    def test_union_find(self):
+        sets = UnionFind()
+        sets.union('a', 'b')
+        sets.union('c', 'd')
+        self.assertEqual(sets.find('a'), sets.find('b'))
+        self.assertNotEqual(sets.find('a'), sets.find('c'))
+        sets.union('b', 'd')
+        self.assertEqual(sets.find('a'), sets.find('c'))
+
+    def test_components(self):
+        indivs, fams = load("./data/SmithFamilyErrors_Final.ged")
+        groups = components(indivs, fams)
+        self.assertTrue(len(groups) > 1)
+        self.assertEqual(sorted(indiv.id for group, _ in groups for indiv in group), sorted(indiv.id for indiv in indivs))
+        self.assertEqual(sum(len(group) for _, group in groups), len(fams))
+        for group_indivs, group_fams in groups:
+            for fam in group_fams:
+                self.assertTrue(fam.husband in group_indivs and fam.wife in group_indivs)
+
+        packed = batches(groups, 2)
+        self.assertTrue(len(packed) <= 2)
+        self.assertEqual(sum(len(group) for group, _ in packed), len(indivs))
+
+    def test_matches_serial(self):
+        serial_indivs, serial_fams = load("./data/SmithFamilyErrors_Final.ged")
+        serial_out = StringIO()
+        with redirect_stdout(serial_out):
+            rules.validate_all(serial_indivs, serial_fams)
+
+        indivs, fams = load("./data/SmithFamilyErrors_Final.ged")
+        out = StringIO()
+        with redirect_stdout(out):
+            validate_parallel(indivs, fams, 2)
+
+        self.assertEqual(out.getvalue(), serial_out.getvalue())
+        self.assertEqual([list(indiv.errors) + list(indiv.anomalies) for indiv in indivs],
+                         [list(indiv.errors) + list(indiv.anomalies) for indiv in serial_indivs])
+        self.assertEqual([list(fam.errors) + list(fam.anomalies) for fam in fams],
+                         [list(fam.errors) + list(fam.anomalies) for fam in serial_fams])
+
+    def test_cap_matches_serial(self):
+        found = []
+        for jobs in (1, 2):
+            indivs, fams = load("./data/SmithFamilyErrors_Final.ged")
+            diagnostics.collector = diagnostics.Collector(5)
+            try:
+                with redirect_stdout(StringIO()):
+                    validate_parallel(indivs, fams, jobs)
+            finally:
+                diagnostics.collector = diagnostics.Collector()
+            found.append([str(d) for entity in indivs + fams for d in entity.findings()])
+        self.assertEqual(len(found[0]), 5)
+        self.assertEqual(found[1], found[0])
+
+if __name__ == "__main__":
+    unittest.main()
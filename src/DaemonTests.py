@@ -0,0 +1,146 @@
+import asyncio
+import datetime
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import daemon
+import dates
+from contextlib import redirect_stderr
+from io import StringIO
+
+class DaemonTests(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.file = os.path.join(self.dir, "tree.ged")
+        shutil.copy("./data/SmithFamilyErrors2.ged", self.file)
+        self.daemon = daemon.Daemon([self.file], as_of=datetime.date(2020, 1, 1))
+
+    def tearDown(self):
+        dates.set_as_of()
+        shutil.rmtree(self.dir)
+
+    def test_queries(self):
+        found = self.daemon.handle({ "op": "validate" })
+        self.assertTrue(found["ok"])
+        self.assertTrue(any(d["story"] == "US01" for d in found["diagnostics"]))
+        self.assertEqual(self.daemon.handle({ "op": "validate", "stories": ["US01"] })["diagnostics"],
+                         [d for d in found["diagnostics"] if d["story"] == "US01"])
+
+        person = self.daemon.handle({ "op": "lookup", "file": self.file, "id": "@I1@" })
+        self.assertEqual((person["kind"], person["row"]["ID"]), ("individual", "@I1@"))
+        family = self.daemon.handle({ "op": "lookup", "id": "@F1@" })
+        self.assertEqual(family["kind"], "family")
+
+        relation = self.daemon.handle({ "op": "relationship", "a": family["row"]["Husband ID"],
+                                        "b": family["row"]["Children"].strip("{}").split(",")[0] })
+        self.assertEqual(relation["relationship"], "parent")
+
+        upcoming = self.daemon.handle({ "op": "upcoming", "kind": "birthday", "days": 366 })
+        self.assertEqual(upcoming["as_of"], "2020-01-01")
+        self.assertEqual(len(upcoming["events"]), len(self.daemon.tree({}).individuals))
+
+    def test_errors(self):
+        self.assertFalse(self.daemon.handle({ "op": "lookup", "id": "@X9@" })["ok"])
+        self.assertFalse(self.daemon.handle({ "op": "lookup", "file": "other.ged", "id": "@I1@" })["ok"])
+        self.assertFalse(self.daemon.handle({ "op": "drop" })["ok"])
+        self.assertFalse(self.daemon.handle([])["ok"])
+        self.assertFalse(self.daemon.handle({ "op": "upcoming", "days": -1 })["ok"])
+        self.assertFalse(self.daemon.handle({ "op": ["lookup"] })["ok"])
+        self.assertFalse(self.daemon.handle({ "op": "lookup", "id": ["@I1@"] })["ok"])
+        self.assertFalse(self.daemon.handle({ "op": "relationship", "a": "@I1@", "b": { "id": "@I2@" } })["ok"])
+        self.assertFalse(self.daemon.handle({ "op": "validate", "file": 1 })["ok"])
+        self.assertFalse(self.daemon.handle({ "op": "validate", "stories": "US1" })["ok"])
+        self.assertFalse(self.daemon.handle({ "op": "validate", "stories": ["US12", 12] })["ok"])
+
+    def test_reload(self):
+        self.assertEqual(self.daemon.handle({ "op": "lookup", "id": "@I1@" })["row"]["Gender"], "M")
+        with open(self.file) as f:
+            text = f.read()
+        start = text.index("0 @I1@ INDI")
+        with open(self.file, "w") as f:
+            f.write(text[:start] + text[start:].replace("1 SEX M", "1 SEX F", 1))
+        stat = os.stat(self.file)
+        os.utime(self.file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        self.assertEqual(self.daemon.handle({ "op": "lookup", "id": "@I1@" })["row"]["Gender"], "F")
+
+    def touch(self, text):
+        with open(self.file, "w") as f:
+            f.write(text)
+        stat = os.stat(self.file)
+        os.utime(self.file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    def test_failed_reload(self):
+        with open(self.file) as f:
+            text = f.read()
+        start = text.index("0 @I1@ INDI")
+        # Caught halfway through a save, @I1@ has a name but no SEX line yet
+        self.touch(text[:text.index("1 SEX", start)])
+        person = self.daemon.handle({ "op": "lookup", "id": "@I1@" })
+        self.assertTrue(person["ok"])
+        self.assertEqual(person["row"]["Gender"], "M")
+        self.assertIn("reload of %s failed" % self.file, person["reload_error"])
+        self.assertIn("reload_error", self.daemon.handle({ "op": "files" })["files"][0])
+
+        self.touch(text[:start] + text[start:].replace("1 SEX M", "1 SEX F", 1))
+        person = self.daemon.handle({ "op": "lookup", "id": "@I1@" })
+        self.assertEqual(person["row"]["Gender"], "F")
+        self.assertNotIn("reload_error", person)
+
+    def serving(self, poll):
+        # Serve in a thread, and a function to stop it
+        path = os.path.join(self.dir, "daemon.sock")
+        loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        serving = loop.create_task(self.daemon.serve(path, poll=poll, ready=ready))
+
+        def run():
+            try:
+                loop.run_until_complete(serving)
+            except asyncio.CancelledError:
+                pass
+        thread = threading.Thread(target=run)
+        thread.start()
+
+        def stop():
+            loop.call_soon_threadsafe(serving.cancel)
+            thread.join()
+            loop.close()
+        self.assertTrue(ready.wait(10))
+        return path, stop
+
+    def wait(self, condition, timeout=10):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            self.assertTrue(time.monotonic() < deadline, "timed out")
+            time.sleep(0.01)
+
+    def test_watch_survives_failed_reload(self):
+        path, stop = self.serving(0.01)
+        try:
+            with open(self.file) as f:
+                text = f.read()
+            start = text.index("0 @I1@ INDI")
+            with redirect_stderr(StringIO()):
+                self.touch(text[:text.index("1 SEX", start)])
+                self.wait(lambda: "reload_error" in daemon.query(path, { "op": "files" })["files"][0])
+            self.touch(text[:start] + text[start:].replace("1 SEX M", "1 SEX F", 1))
+            self.wait(lambda: daemon.query(path, { "op": "lookup", "id": "@I1@" })["row"]["Gender"] == "F")
+            self.assertNotIn("reload_error", daemon.query(path, { "op": "files" })["files"][0])
+        finally:
+            stop()
+
+    def test_socket(self):
+        path, stop = self.serving(0)
+        try:
+            self.assertEqual(daemon.query(path, { "op": "lookup", "id": "@I1@" })["id"], "@I1@")
+            self.assertEqual(daemon.query(path, { "op": "files" })["files"][0]["file"], self.file)
+        finally:
+            stop()
+        self.assertFalse(os.path.exists(path))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import datetime
+import unittest
+import dates
+from dates import parse_date
+from Individual import Individual
+
+class DatesTests(unittest.TestCase):
+    def strptime(self, text):
+        try:
+            return datetime.datetime.strptime(text, '%d %b %Y'), True
+        except ValueError:
+            return None, False
+
+    def test_matches_strptime(self):
+        samples = ["1 FEB 1995", "01 feb 1995", "31 Jan 2000", "29 FEB 2000", "29 FEB 1900",
+                   "31 APR 2001", "0 JAN 2000", "1 02 1995", "abad", "00-00-0000", "12-18-1975",
+                   "1 FEB", "2 1980", "TEST", "1 FEB 95", "1 FEB 0000", "123 JAN 2000",
+                   "1  SEP   1752", "ABT 1 JAN 1900", "1 JANUARY 1900", ""]
+        for text in samples:
+            self.assertEqual(parse_date(text), self.strptime(text), text)
+
+    def test_every_day_of_a_leap_year(self):
+        day = datetime.datetime(2020, 1, 1)
+        while day.year == 2020:
+            self.assertEqual(parse_date(day.strftime('%d %b %Y').upper()), (day, True))
+            day += datetime.timedelta(days=1)
+    def test_clock(self):
+        clock = dates.Clock(datetime.date(2020, 2, 28))
+        self.assertEqual(clock.now, datetime.datetime(2020, 2, 28))
+        self.assertEqual(clock.ordinal, datetime.date(2020, 2, 28).toordinal())
+        self.assertEqual(clock.age(datetime.datetime(2000, 2, 28)), 20)
+        self.assertEqual(clock.age(datetime.datetime(2000, 2, 29)), 19)
+        self.assertEqual(dates.Clock(datetime.datetime(2020, 2, 28, 23, 59)).day, datetime.date(2020, 2, 28))
+
+    def test_as_of(self):
+        try:
+            dates.set_as_of(datetime.date(2000, 6, 1))
+            person = Individual.instance_from_dict({'INDI': 'I1', 'NAME': 'Person /One', 'SEX': 'M',
+                                                    'BIRT': '1 JUN 2000', 'DEAT': '2 JUN 2000'})
+            self.assertEqual(person.age, 0)
+            self.assertEqual([d.story for d in person.findings()], ['US01'])
+        finally:
+            dates.set_as_of()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import datetime
+import json
+import unittest
+import diagnostics
+from diagnostics import Diagnostic, Sink, Collector
+from Individual import Individual
+from io import StringIO
+
+class DiagnosticsTests(unittest.TestCase):
+    def tearDown(self):
+        diagnostics.collector = Collector()
+
+    def test_text(self):
+        found = Diagnostic(Individual.error_header, "US01", "@I1@", "Birthday %s occurs in the future", (datetime.datetime(2900, 1, 2),))
+        self.assertEqual(str(found), "ERROR: INDIVIDUAL: US01: @I1@: Birthday 2900-01-02 occurs in the future")
+        self.assertEqual(found.kind, "error")
+        self.assertEqual(found.entity, "individual")
+        self.assertEqual(str(Diagnostic("Invalid Date:", "US24", None, "30 FEB 2000")), "Invalid Date: US24: 30 FEB 2000")
+        self.assertEqual(str(Diagnostic("ERROR: FAMILY:", None, "@F2@", "%s %s not found", ("WIFE", "@I9@"))),
+                         "ERROR: FAMILY: @F2@: WIFE @I9@ not found")
+
+    def test_entity_findings(self):
+        person = Individual.instance_from_dict({'INDI': 'I1', 'NAME': 'Person /One', 'SEX': 'M', 'BIRT': '1 Jan 1800'})
+        self.assertEqual(len(person.findings()), 1)
+        self.assertEqual(person.findings()[0].story, "US07")
+        self.assertEqual(person.errors, ["ERROR: INDIVIDUAL: US07: I1: More than 150 years old - Birth 1800-01-01"])
+
+    def test_sink_modes(self):
+        found = [Diagnostic(Individual.error_header, "US01", "@I%d@" % i, "found") for i in range(3)]
+        found.append(Diagnostic(Individual.anomaly_header, "US23", "@I9@", "found"))
+
+        stream = StringIO()
+        sink = Sink("jsonl", stream=stream, buffer_lines=2)
+        sink.extend(found)
+        self.assertEqual(len(stream.getvalue().splitlines()), 4)
+        sink.close()
+        self.assertEqual(json.loads(stream.getvalue().splitlines()[3])["kind"], "anomaly")
+
+        stream = StringIO()
+        sink = Sink("counts", stream=stream)
+        sink.extend(found)
+        sink.close()
+        self.assertEqual(stream.getvalue(), "US01 ERROR: 3\nUS23 ANOMALY: 1\n")
+
+    def test_limit(self):
+        stream = StringIO()
+        sink = Sink(limit=2, stream=stream)
+        sink.extend(Diagnostic(Individual.error_header, "US01", "@I%d@" % i, "found") for i in range(5))
+        sink.close()
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(sink.dropped, 3)
+
+        diagnostics.collector = Collector(1)
+        person = Individual.instance_from_dict({'INDI': 'I1', 'NAME': 'Person /One', 'SEX': 'M', 'BIRT': '1 Jan 1800'})
+        other = Individual.instance_from_dict({'INDI': 'I2', 'NAME': 'Person /Two', 'SEX': 'M', 'BIRT': '1 Jan 1800'})
+        self.assertEqual(len(person.errors), 1)
+        self.assertEqual(len(other.errors), 0)
+        self.assertTrue(diagnostics.collector.exhausted)
+
+if __name__ == "__main__":
+    unittest.main()
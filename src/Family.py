@@ -1,7 +1,10 @@
 import sys
-import datetime 
-from collections import Counter
-from dateutil import relativedelta as rd
+from bisect import bisect_left, bisect_right
+import rules
+import diagnostics
+from diagnostics import Diagnostic
+import dates
+from dates import parse_date, add_months, DEFAULT_MARRIAGE
 
 class Family():
     row_headers = [
@@ -11,9 +14,13 @@ class Family():
     error_header = "ERROR: FAMILY:"
     anomaly_header = "ANOMALY: FAMILY"
 
-    def __init__(self, id, husband, wife, married_date, div_date=None, children=None):
+    # No per-instance __dict__; diagnostics lists are only created on the first finding
+    __slots__ = ("id", "husband", "wife", "married_date", "div_date", "children",
+                 "_errors", "_anomalies")
+
+    def __init__(self, id, husband, wife, married_date, div_date=None, children=None, validate=True):
         id.replace('@', '')
-        self.id = id
+        self.id = sys.intern(id)
         self.husband = husband
         self.wife = wife
         self.married_date = married_date
@@ -22,82 +29,59 @@ class Family():
             self.children = children
         else:
             self.children = []
-        self.errors = []
-        self.anomalies = []
-        
-        self.validate()
+        self._errors = None
+        self._anomalies = None
+        if validate:
+            self.validate()
+
+    @property
+    def errors(self):
+        return () if self._errors is None else [str(error) for error in self._errors]
+
+    @property
+    def anomalies(self):
+        return () if self._anomalies is None else [str(anomaly) for anomaly in self._anomalies]
+
+    def findings(self):
+        """Diagnostic records, errors first"""
+        return (self._errors or []) + (self._anomalies or [])
     
     def validate(self):
-        self._check_dates()
-        self._check_names()
-        self._check_parents()
-        self._check_marriages()
-        self._check_marriages2()
-        self._check_siblings()
-        self._check_anniversary()
-
-        if len(self.children) > 0:
-            self._check_siblings()
-            self._validate_children()
-            
-    def marriage_check(self):
-        self._check_first_cousin_spouse()
-        self._check_aunts_uncles()
+        #Checks registered at the bottom of this module, see rules.py
+        for rule in rules.active(rules.FAMILY, False):
+            rule.check(self)
+
+    def marriage_check(self, kinship):
+        #Kinship rules need the whole tree linked, see kinship.Kinship
+        self._check_marriages2(kinship)
+        self._check_kin_spouses(kinship)
         
-    def _add_error(self, story, error):
-        self.errors.append("%s %s: %s: %s" % 
-                (Family.error_header, story, self.id, error))
-
-    def _add_anomaly(self, story, anomaly):
-        self.anomalies.append("%s %s: %s: %s" % (Family.anomaly_header, story, self.id, anomaly))
+    def _add_error(self, story, error, *args):
+        if not rules.enabled(story) or not diagnostics.collector.accept():
+            return
+        if self._errors is None:
+            self._errors = []
+        self._errors.append(Diagnostic(Family.error_header, story, self.id, error, args))
+
+    def _add_anomaly(self, story, anomaly, *args):
+        if not rules.enabled(story) or not diagnostics.collector.accept():
+            return
+        if self._anomalies is None:
+            self._anomalies = []
+        self._anomalies.append(Diagnostic(Family.anomaly_header, story, self.id, anomaly, args))
 
     
-    def _check_anniversary(self):
-        married_date_in = self.married_date
-        curr_year = datetime.datetime.now().year
-        married_date_in = married_date_in.replace(year=curr_year)
-        check = married_date_in - datetime.datetime.now()
-        if check.days<30 and check.days>0:
-            print("US32: "+self.id+" Upcoming anniversary on: "+str(self.married_date))
 
                                                                                                                                                                                 
                                                                                                                                            
-    def _check_marriages(self):
-        #US18 Siblings should not marry 
-        #US17 Descendants should not marry
-        if self.children is not None:
-            for child in self.children:
-                if child.spouses is not None:
-                    for spouse in child.spouses:
-                        if child.gender == 'M' and child.spouses is not None:
-                            self._add_anomaly("US18", "Spouse cannot be your sister")
-                            self._add_anomaly("US17", "Spouse cannot be your descendant")                            
-                        if child.gender == 'F' and child.spouses is not None:                          
-                            self._add_anomaly("US18", "Spouse cannot be your brother")
-                            self._add_anomaly("US17", "Spouse cannot be your descendant")                            
-          
-       
-    def _check_marriages2(self):
+    def _check_marriages2(self, kinship):
         #US17 No marriages to descendants
-        childrenList = []
-        temp = self.children
-        if self.children is not None:
-            while temp != []:
-                for group in temp:
-                    childrenList.append(group)
-                    #if type(group.children)!=list:
-                    if group.children == 'NA':
-                        temp.append(group.children)
-                        temp.remove(group)
-                    else:
-                        temp = group.children                        
-        for i in childrenList:
-            if i.id == self.wife.id:
-                self._add_anomaly("US17", "Husband is a descendant")
-
-
-                
-        
+        if self.husband is None or self.wife is None:
+            return
+        if kinship.is_ancestor(self.husband.id, self.wife.id):
+            self._add_anomaly("US17", "Wife %s is a descendant of husband %s", self.wife.id, self.husband.id)
+        elif kinship.is_ancestor(self.wife.id, self.husband.id):
+            self._add_anomaly("US17", "Husband %s is a descendant of wife %s", self.husband.id, self.wife.id)
 
     def _check_parents(self):
         if self.husband is not None and self.husband.gender != 'M':
@@ -105,68 +89,39 @@ class Family():
         if self.wife is not None and self.wife.gender != 'F':
             self._add_anomaly("US21", "Wife's gender is not F")
 
+    def _check_kin_spouses(self, kinship):
+        #US18-US20 all ask how the husband is related to the wife, found once
+        if self.husband is None or self.wife is None:
+            return
+        relation = kinship.near_relationship(self.husband.id, self.wife.id)
+        if relation is None:
+            return
+        self._check_sibling_spouse(relation)
+        self._check_first_cousin_spouse(relation)
+        self._check_aunts_uncles(relation)
+
+    #US18: Check for marriage between siblings
+    def _check_sibling_spouse(self, relation):
+        if relation.siblings:
+            self._add_anomaly("US18", "Siblings should not marry: %s, %s", self.husband.id, self.wife.id)
+
     #US19: Check for marriage between first cousins
-    def _check_first_cousin_spouse(self):
-        bad_marriages = []
-        if self.children is not None:
-            for child in self.children:
-                if child.children is not None:
-                    for grandchild in child.children:
-                        if grandchild.spouses is not None and grandchild not in bad_marriages:
-                            for spouse in grandchild.spouses:
-                                for otherparent in self.children:
-                                    if otherparent.id is not child.id:
-                                        if spouse in otherparent.children and spouse not in bad_marriages:
-                                            self._add_anomaly("US19", "Cannot marry between first cousins: " + spouse.id + ", " + grandchild.id)
-                                            bad_marriages.append(spouse)
-                                            bad_marriages.append(grandchild)
-                                            
+    def _check_first_cousin_spouse(self, relation):
+        if relation.first_cousins:
+            self._add_anomaly("US19", "Cannot marry between first cousins: %s, %s", self.husband.id, self.wife.id)
+
     #US20: Check for aunts and uncles married to their nephiews or nieces
-    def _check_aunts_uncles(self):
-        if self.children is not None:
-            for child in self.children:
-                if child.children is not None:
-                    for grandchild in child.children:
-                        if grandchild.spouses is not None:
-                            for spouse in grandchild.spouses:
-                                if spouse in self.children:
-                                    self._add_anomaly("US20", "An aunt or uncle should not marry their niece or nephiew: " + spouse.id + ", " + grandchild.id)
-                    
+    def _check_aunts_uncles(self, relation):
+        # relation is of husband to wife; of wife to husband, up and down swap
+        if relation.aunt_or_uncle:
+            self._add_anomaly("US20", "An aunt or uncle should not marry their niece or nephiew: %s, %s", self.husband.id, self.wife.id)
+        elif (relation.up, relation.down) == (2, 1):
+            self._add_anomaly("US20", "An aunt or uncle should not marry their niece or nephiew: %s, %s", self.wife.id, self.husband.id)
+
     def _validate_children(self):
-        child_sorted = sorted(self.children, key=lambda x: x.bday)
-        count_bdays = Counter()
-
-        for i in range(len(child_sorted)):
-            # Children born too close together
-            first = child_sorted[i]
-            for j in range(i + 1, len(child_sorted)):
-                second = child_sorted[j]
-                diff = rd.relativedelta(second.bday, first.bday)
-
-                if abs(diff.months) < 8 and abs(diff.days) > 2 and abs(diff.months) >= 0:
-                    self._add_error("US13", "Children's bdays are less than 8 months and are not twins %s: %s %s: %s" \
-                                    % (first.id, first.bday.strftime("%Y-%m-%d"), second.id, second.bday.strftime("%Y-%m-%d")))
-
-            # More than 5 children on the same day
-            if len(count_bdays.keys()) == 0:
-                count_bdays[first.bday] += 1
-            else:
-                added = False
-                for key in count_bdays.keys():
-                    diff2 = rd.relativedelta(first.bday, key)
-
-                    if abs(diff2.days) <= 2 and diff2.months == 0 and diff2.years == 0:
-                        added = True
-                        count_bdays[key] += 1
-
-                        if count_bdays[key] == 5:
-                            self._add_error("US14", "More than 5 children born on: %s" % key.strftime("%Y-%m-%d"))
-                        break
-
-                if not added:
-                    count_bdays[first.bday] += 1
-
-                
+        for story, error, args in children_spacing(self.children):
+            self._add_error(story, error, *args)
+
     def _check_names(self):
         if self.husband is not None and self.children is not None:
             temp = self.husband.name
@@ -198,10 +153,13 @@ class Family():
             self._add_anomaly("US15", "Siblings not fewer then 15")
         
     #Method to add error for bigomy within the family      
-    def bigError(self,person):
-        self._add_error("US12", "Person %s cannot have another marriage without getting the first one divorced." %(person.id))
+    def bigError(self, person, other=None):
+        if other is None:
+            self._add_error("US12", "Person %s cannot have another marriage without getting the first one divorced.", person.id)
+        else:
+            self._add_error("US12", "Person %s cannot have another marriage without getting the first one (%s) divorced.", person.id, other.id)
     def _check_dates(self):
-        now = datetime.datetime.now()
+        now = dates.clock.now
 
         if self.husband is not None and self.wife is not None:
 
@@ -209,88 +167,88 @@ class Family():
             if self.married_date is not None:
                 # Married before current date
                 if self.married_date > now:
-                    self._add_error("US01", "Marriage date %s occurs in the future" % self.married_date.strftime("%Y-%m-%d"))
+                    self._add_error("US01", "Marriage date %s occurs in the future", self.married_date)
                 # Birth before marriage - husband
                 if self.husband.bday > self.married_date:
-                    self._add_error("US02", "Husband's birth date %s after marriage date %s" % (self.husband.bday.strftime("%Y-%m-%d"), self.married_date.strftime("%Y-%m-%d")))
+                    self._add_error("US02", "Husband's birth date %s after marriage date %s", self.husband.bday, self.married_date)
                 # Birth before marriage - wife
                 if self.wife.bday > self.married_date:
-                    self._add_error("US02", "Wife's birth date %s after marriage date %s" % (self.wife.bday.strftime("%Y-%m-%d"), self.married_date.strftime("%Y-%m-%d")))
+                    self._add_error("US02", "Wife's birth date %s after marriage date %s", self.wife.bday, self.married_date)
                     
                 # Marriage before death - husband 
                 if not self.husband.alive and self.husband.death < self.married_date:
-                    self._add_error("US05", "Married %s after husband's (%s) death on %s" % (self.married_date.strftime('%Y-%m-%d'), self.husband.id, self.husband.death.strftime('%Y-%m-%d')))
+                    self._add_error("US05", "Married %s after husband's (%s) death on %s", self.married_date, self.husband.id, self.husband.death)
                 # Marriage before death - wife
                 if not self.wife.alive and self.wife.death < self.married_date:
-                    self._add_error("US05", "Married %s after wife's (%s) death on %s" % (self.married_date.strftime('%Y-%m-%d'), self.wife.id, self.wife.death.strftime('%Y-%m-%d')))
+                    self._add_error("US05", "Married %s after wife's (%s) death on %s", self.married_date, self.wife.id, self.wife.death)
 
                 # Marriage under 14 years old
                 if self.married_date.year - self.husband.bday.year < 14:
-                    self._add_error("US10", "Under 14 at time of marriage - Birth %s: Marriage %s" % (self.husband.bday.strftime("%Y-%m-%d"), self.married_date.strftime("%Y-%m-%d")))
+                    self._add_error("US10", "Under 14 at time of marriage - Birth %s: Marriage %s", self.husband.bday, self.married_date)
                 if self.married_date.year - self.wife.bday.year < 14:
-                    self._add_error("US10", "Under 14 at time of marriage - Birth %s: Marriage %s" % (self.wife.bday.strftime("%Y-%m-%d"), self.married_date.strftime("%Y-%m-%d")))
+                    self._add_error("US10", "Under 14 at time of marriage - Birth %s: Marriage %s", self.wife.bday, self.married_date)
 
                 for child in self.children:
                 # Validate child birth is after parents marriage
                     if child.bday < self.married_date:
-                        self._add_anomaly("US08", "Child %s born %s before marriage on %s" % (child.id, child.bday.strftime("%Y-%m-%d"), self.married_date.strftime("%Y-%m-%d")))
+                        self._add_anomaly("US08", "Child %s born %s before marriage on %s", child.id, child.bday, self.married_date)
                 # Validate child birth is before parents death
                     if not self.wife.alive and child.bday > self.wife.death:
                         if child.bday > self.wife.death:
-                            self._add_error("US09", "Child %s born on %s after mother's death on %s" % (child.id, child.bday.strftime('%Y-%m-%d'), self.wife.death.strftime('%Y-%m-%d')))
+                            self._add_error("US09", "Child %s born on %s after mother's death on %s", child.id, child.bday, self.wife.death)
                     if not self.husband.alive and child.bday > self.husband.death:
-                            self._add_error("US09", "Child %s born on %s after father's death on %s" % (child.id, child.bday.strftime('%Y-%m-%d'), self.husband.death.strftime('%Y-%m-%d')))
+                            self._add_error("US09", "Child %s born on %s after father's death on %s", child.id, child.bday, self.husband.death)
             
             # Validate divorce date
             if self.div_date is not None:
                 # Divorce before current date
                 if self.div_date > now:
-                    self._add_error("US01", "Divorce date %s occurs in the future" % self.div_date.strftime("%Y-%m-%d"))
+                    self._add_error("US01", "Divorce date %s occurs in the future", self.div_date)
                 # Divorce before death - husband
                 if not self.husband.alive and self.husband.death < self.div_date:
-                    self._add_error("US06", "Divorced %s after husband's (%s) death on %s" % (self.div_date.strftime('%Y-%m-%d'), self.husband.id, self.husband.death.strftime('%Y-%m-%d')))
+                    self._add_error("US06", "Divorced %s after husband's (%s) death on %s", self.div_date, self.husband.id, self.husband.death)
                 # Divore before death - wife
                 if not self.wife.alive and self.wife.death < self.div_date:
-                    self._add_error("US06", "Divorced %s after wife's (%s) death on %s" % (self.div_date.strftime('%Y-%m-%d'), self.wife.id, self.wife.death.strftime('%Y-%m-%d')))
+                    self._add_error("US06", "Divorced %s after wife's (%s) death on %s", self.div_date, self.wife.id, self.wife.death)
                 # Divorce before marriage
                 if self.married_date is not None and self.div_date < self.married_date:
-                    self._add_error("US04", "Divorced %s before married %s" % (self.div_date.strftime('%Y-%m-%d'), self.married_date.strftime('%Y-%m-%d')))
+                    self._add_error("US04", "Divorced %s before married %s", self.div_date, self.married_date)
                     
                 for child in self.children:
                 # Validate child birth is after parents marriage
                     if child.bday < self.married_date:
-                        self._add_anomaly("US08", "Child %s born %s before marriage on %s" % (child.id, child.bday.strftime("%Y-%m-%d"), self.married_date.strftime("%Y-%m-%d")))
+                        self._add_anomaly("US08", "Child %s born %s before marriage on %s", child.id, child.bday, self.married_date)
                 # Validate child birth is before parents death
                     if not self.wife.alive and not self.husband.alive:    
                         if child.bday > self.wife.death:
-                            self._add_error("US09", "Child %s born on %s after father's death on %s" % (child.id, child.bday.strftime('%Y-&m-%d'), self.husband.death.strftime('%Y-&m-%d')))
+                            self._add_error("US09", "Child %s born on %s after mother's death on %s", child.id, child.bday, self.wife.death)
                         if child.bday > self.husband.death:
-                            self._add_error("US09", "Child %s born on %s after mother's death on %s" % (child.id, child.bday.strftime('%Y-&m-%d'), self.wife.death.strftime('%Y-&m-%d')))
+                            self._add_error("US09", "Child %s born on %s after father's death on %s", child.id, child.bday, self.husband.death)
                         
             # Validate divorce date
             if self.div_date is not None:
                 # Divorce before current date
                 if self.div_date > now:
-                    self._add_error("US01", "Divorce date %s occurs in the future" % self.div_date.strftime("%Y-%m-%d"))
+                    self._add_error("US01", "Divorce date %s occurs in the future", self.div_date)
                 # Divorce before death - husband
                 if not self.husband.alive and self.husband.death < self.div_date:
-                    self._add_error("US06", "Divorced %s after husband's (%s) death on %s" % (self.div_date.strftime('%Y-%m-%d'), self.husband.id, self.husband.death.strftime('%Y-%m-%d')))
+                    self._add_error("US06", "Divorced %s after husband's (%s) death on %s", self.div_date, self.husband.id, self.husband.death)
                 # Divore before death - wife
                 if not self.wife.alive and self.wife.death < self.div_date:
-                    self._add_error("US06", "Divorced %s after wife's (%s) death on %s" % (self.div_date.strftime('%Y-%m-%d'), self.wife.id, self.wife.death.strftime('%Y-%m-%d')))
+                    self._add_error("US06", "Divorced %s after wife's (%s) death on %s", self.div_date, self.wife.id, self.wife.death)
                 # Divorce before marriage
                 if self.married_date is not None and self.div_date < self.married_date:
-                    self._add_error("US04", "Divorced %s before married %s" % (self.div_date.strftime('%Y-%m-%d'), self.married_date.strftime('%Y-%m-%d')))
+                    self._add_error("US04", "Divorced %s before married %s", self.div_date, self.married_date)
 
         # Validate age of children compared too the age of children
         if self.children is not None:
             for child in self.children:
                 #Check if Father is not older than 80 years
                 if self.husband is not None and (self.husband.age - child.age) > 80:
-                    self._add_error("US12", "Father is %s years older than his child." % (self.husband.age - child.age))
+                    self._add_error("US12", "Father is %s years older than his child.", self.husband.age - child.age)
                 #Check if Mother is not older than 60 years
                 if self.wife is not None and (self.wife.age - child.age) > 60:
-                    self._add_error("US11", "Mother is %s years older than her child." % (self.wife.age - child.age))
+                    self._add_error("US11", "Mother is %s years older than her child.", self.wife.age - child.age)
 
     #US28: Method used for sorting siblings by decreasing age order
     def sibling_sort(self):
@@ -317,17 +275,21 @@ class Family():
         return (i+1)
         
     @staticmethod
-    def instance_from_dict(fam_dict):
+    def instance_from_dict(fam_dict, validate=True):
         id = fam_dict['FAM']
         husband = fam_dict["HUSB"]
         wife = fam_dict["WIFE"]
 
         husband.add_spouse(wife)
         wife.add_spouse(husband)
-        married_date = datetime.datetime.strptime('1 JAN 1980', '%d %b %Y')
+        married_date = DEFAULT_MARRIAGE
 
         if 'MARR' in fam_dict:
-            married_date = datetime.datetime.strptime(fam_dict["MARR"], '%d %b %Y')
+            married_date, valid = parse_date(fam_dict["MARR"])
+            if not valid:
+                if rules.enabled("US24"):
+                    diagnostics.emit(Diagnostic("Invalid Date:", "US24", None, fam_dict["MARR"]))
+                married_date = DEFAULT_MARRIAGE
 
         children = [] 
         div_date = None
@@ -338,9 +300,12 @@ class Family():
             wife.add_children(children)           
 
         if "DIV" in fam_dict:
-            div_date = datetime.datetime.strptime(fam_dict["DIV"], '%d %b %Y')
+            div_date, valid = parse_date(fam_dict["DIV"])
+            if not valid:
+                if rules.enabled("US24"):
+                    diagnostics.emit(Diagnostic("Invalid Date:", "US24", None, fam_dict["DIV"]))
             
-        return Family(id, husband, wife, married_date, div_date=div_date, children=children)
+        return Family(id, husband, wife, married_date, div_date=div_date, children=children, validate=validate)
 
     def print_anomalies(self):
         for i in self.anomalies:
@@ -373,3 +338,39 @@ class Family():
     def __str__(self):
         return str(dict(zip(Family.row_headers, self.to_row())))
 
+def children_spacing(children):
+    """(story, error, args) of the US13 and US14 findings for children in
+    family order, anything with an id and a bday"""
+    # Births as day ordinals in date order, swept once for both checks
+    children = sorted(children, key=lambda x: x.bday)
+    days = [child.bday.toordinal() for child in children]
+    group = None
+
+    for i, first in enumerate(children):
+        # Children born too close together: more than 2 days (twins) but
+        # less than 8 months apart, every such pair
+        later = bisect_right(days, days[i] + 2, i + 1)
+        end = bisect_left(days, add_months(first.bday, 8).toordinal(), later)
+        for second in children[later:end]:
+            yield ("US13", "Children's bdays are less than 8 months and are not twins %s: %s %s: %s",
+                   (first.id, first.bday, second.id, second.bday))
+
+        # More than 5 children on the same day: a child within 2 days of
+        # the first birth of the current group joins it, otherwise starts the next
+        if group is not None and days[i] - days[group] <= 2:
+            count += 1
+            if count == 5:
+                yield ("US14", "More than 5 children born on: %s", (children[group].bday,))
+        else:
+            group = i
+            count = 1
+
+# In the order the checks have always run
+rules.register(rules.FAMILY, Family._check_dates,
+               ("US01", "US02", "US04", "US05", "US06", "US08", "US09", "US10", "US11", "US12"))
+rules.register(rules.FAMILY, Family._check_names, ("US16", "US25"))
+rules.register(rules.FAMILY, Family._check_parents, ("US21",))
+rules.register(rules.FAMILY, Family._check_siblings, ("US15",))
+rules.register(rules.FAMILY, Family._validate_children, ("US13", "US14"))
+rules.register(rules.FAMILY, Family._check_marriages2, ("US17",), needs=("kinship",))
+rules.register(rules.FAMILY, Family._check_kin_spouses, ("US18", "US19", "US20"), needs=("kinship",))
@@ -0,0 +1,70 @@
+import glob
+import os
+import tempfile
+import unittest
+from gedcom import iter_records, record_to_dict, iter_dicts, iter_dicts_mmap, iter_dicts_parallel, chunk_bounds
+
+class GedcomTests(unittest.TestCase):
+    def test_records_in_order(self):
+        records = iter_records("./data/ForwardReferences.ged")
+        self.assertEqual(next(records).tag, "HEAD")
+        fam = next(records)
+        self.assertEqual((fam.tag, fam.xref), ("FAM", "@F1@"))
+        self.assertEqual([r.tag for r in records], ["INDI", "INDI", "INDI", "INDI", "FAM", "TRLR"])
+
+    def test_nested_children(self):
+        indi = [r for r in iter_records("./data/OneDeceased.ged") if r.tag == "INDI"][0]
+        name = indi.find("NAME")
+        self.assertEqual(name.value, "Bob /Smith/")
+        self.assertEqual([c.tag for c in name.children], ["GIVN", "SURN", "_MARNM"])
+        self.assertEqual(indi.find("DEAT").find("DATE").value, "31 MAY 1990")
+
+    def test_record_to_dict(self):
+        indi = [r for r in iter_records("./data/OneDeceased.ged") if r.tag == "INDI"][0]
+        self.assertEqual(record_to_dict(indi), {'INDI': '@I1@', 'NAME': 'Bob /Smith/', 'SEX': 'M',
+                                                'BIRT': '21 APR 1926', 'DEAT': '31 MAY 1990', 'FAM': ['@F1@']})
+
+    def test_mmap_matches_text_reader(self):
+        for file in glob.glob("./data/*.ged"):
+            self.assertEqual(list(iter_dicts_mmap(file)), list(iter_dicts(file)), file)
+
+    def test_mmap_crlf_and_spacing(self):
+        fd, path = tempfile.mkstemp(suffix=".ged")
+        with os.fdopen(fd, "wb") as f:
+            f.write(b"0 HEAD\r\n0 @I1@ INDI\r\n1 NAME  Bob   /Smith/ \r\n1 DEAT Y\r\n2 PLAC Here\r\n1 BIRT\r\n2 DATE 2 MAR 1928\r\n0 TRLR")
+        try:
+            self.assertEqual(list(iter_dicts_mmap(path)), list(iter_dicts(path)))
+            self.assertEqual(list(iter_dicts_mmap(path))[0][2]['DEAT'], 'Y')
+        finally:
+            os.remove(path)
+
+    def test_mmap_tabs(self):
+        fd, path = tempfile.mkstemp(suffix=".ged")
+        with os.fdopen(fd, "wb") as f:
+            f.write(b"0 HEAD\n0\t@I1@\tINDI\n1\tNAME\tBob \t/Smith/\n1 SEX\tM\n1\tBIRT\n2\tDATE\t2 MAR 1928\n"
+                    b"0 @F1@\tFAM\n1\tHUSB @I1@\n0\tTRLR\n")
+        try:
+            found = list(iter_dicts_mmap(path))
+            self.assertEqual(found, list(iter_dicts(path)))
+            self.assertEqual(found[0][2]['INDI'], '@I1@')
+            self.assertEqual(found[0][2]['BIRT'], '2 MAR 1928')
+            self.assertEqual(found[1][2]['HUSB'], '@I1@')
+        finally:
+            os.remove(path)
+
+    def test_chunks_start_on_level_0(self):
+        with open("./data/SmithFamilyErrors_Final.ged", "rb") as f:
+            data = f.read()
+        chunks = chunk_bounds("./data/SmithFamilyErrors_Final.ged", 6)
+        self.assertEqual(len(chunks), 6)
+        self.assertEqual(chunks[-1][1], len(data))
+        for start, stop in chunks:
+            self.assertTrue(data[start:start + 2] == b"0 ")
+
+    def test_parallel_matches_text_reader(self):
+        for jobs in (2, 5):
+            records = list(iter_dicts_parallel("./data/SmithFamilyErrors_Final.ged", jobs))
+            self.assertEqual(records, list(iter_dicts("./data/SmithFamilyErrors_Final.ged")))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import os
+import shutil
+import tempfile
+import unittest
+import diagnostics
+import generate
+import rules
+import Project3
+from contextlib import redirect_stdout
+from io import StringIO
+
+class GenerateTests(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.file = os.path.join(self.dir, "tree.ged")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def findings(self):
+        with redirect_stdout(StringIO()), diagnostics.recording() as recorder:
+            indivs, fams = Project3.process_file(self.file, validate=False)
+            rules.validate_all(indivs, fams)
+        found = list(recorder.diagnostics)
+        for entity in indivs + fams:
+            found.extend(entity.findings())
+        return found
+
+    def test_manifest_matches_findings(self):
+        manifest = generate.generate(self.file, seed=7, violation_rate=0.002, individuals=600)
+        self.assertTrue(manifest["individuals"] >= 600)
+        expected = set((entry["story"], entry["id"]) for entry in manifest["expected"])
+        self.assertEqual(set(story for story, _ in expected), set(generate.STORIES))
+
+        found = self.findings()
+        checked = set((d.story, d.id) for d in found if d.story != "US24")
+
+        # US24 is reported without an id
+        self.assertEqual(checked, set(entry for entry in expected if entry[0] != "US24"))
+        self.assertEqual(len([d for d in found if d.story == "US24"]),
+                         len([entry for entry in expected if entry[0] == "US24"]))
+
+    def test_clean(self):
+        manifest = generate.generate(self.file, seed=3, individuals=300, rates={"US13": 0.01})
+        self.assertEqual(set(entry["story"] for entry in manifest["expected"]), set(["US13"]))
+        self.assertEqual(set(d.story for d in self.findings()), set(["US13"]))
+
+if __name__ == "__main__":
+    unittest.main()
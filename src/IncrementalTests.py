@@ -0,0 +1,85 @@
+import os
+import shutil
+import tempfile
+import unittest
+import diagnostics
+import generate
+import incremental
+import rules
+import Project3
+from contextlib import redirect_stdout
+from io import StringIO
+
+class IncrementalTests(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.dir, "cache")
+        self.file = os.path.join(self.dir, "tree.ged")
+        generate.generate(self.file, seed=11, violation_rate=0.01, individuals=300)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def edit(self, old, new):
+        with open(self.file) as f:
+            text = f.read()
+        self.assertIn(old, text)
+        with open(self.file, "w") as f:
+            f.write(text.replace(old, new, 1))
+
+    def result(self, indivs, fams, out, recorder):
+        return (out.getvalue(), [str(d) for d in recorder.diagnostics],
+                [str(d) for entity in indivs + fams for d in entity.findings()])
+
+    def full(self):
+        out = StringIO()
+        with redirect_stdout(out), diagnostics.recording() as recorder:
+            indivs, fams = Project3.process_file(self.file, validate=False)
+            rules.validate_all(indivs, fams)
+        return self.result(indivs, fams, out, recorder)
+
+    def revalidated(self):
+        out = StringIO()
+        with redirect_stdout(out), diagnostics.recording() as recorder:
+            indivs, fams = Project3.revalidate_file(self.file, self.cache_dir)
+        return self.result(indivs, fams, out, recorder)
+
+    def test_matches_full_run(self):
+        self.assertEqual(self.revalidated(), self.full())
+        for old, new in (("1 SEX M", "1 SEX F"), ("1 CHIL", "1 NOTE"), ("2 DATE", "2 DATE 1 JAN 2999\n2 NOTE"),
+                         ("1 WIFE @I1@", "1 WIFE @I6@")):
+            self.edit(old, new)
+            self.assertEqual(self.revalidated(), self.full(), old)
+
+    def test_dirty(self):
+        with redirect_stdout(StringIO()), diagnostics.recording():
+            records = list(Project3.read_file(self.file))
+            indivs, fams = Project3.build_tree(records, validate=False)
+            state = incremental.capture(incremental.first_records(records), indivs, fams)
+            self.assertEqual(incremental.dirty(state, incremental.first_records(records), indivs, fams), ([], []))
+
+            # Dropping a parent link changes the ancestors of the child and
+            # everyone below, so whoever married one of them is checked again
+            parent = next(indiv for indiv in indivs if indiv.children and indiv.children[0].children)
+            child = parent.children[0].id
+            self.edit("1 CHIL %s\n" % child, "")
+            records = list(Project3.read_file(self.file))
+            indivs, fams = Project3.build_tree(records, validate=False)
+            people, families = incremental.dirty(state, incremental.first_records(records), indivs, fams)
+
+        index = dict((indiv.id, indiv) for indiv in indivs)
+        below = set()
+        stack = [child]
+        while stack:
+            id = stack.pop()
+            below.add(id)
+            stack.extend(grandchild.id for grandchild in index[id].children)
+        married = set(spouse.id for id in below for spouse in index[id].spouses)
+        self.assertTrue(married)
+        self.assertTrue(married <= set(indiv.id for indiv in people))
+        self.assertTrue(len(people) < len(indivs) / 2)
+        self.assertTrue(set(fam.id for fam in fams if below.intersection((fam.husband.id, fam.wife.id)))
+                        <= set(fam.id for fam in families))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,9 @@
 import sys
-import datetime
-from user_stories import US23, US24
+import rules
+import diagnostics
+from diagnostics import Diagnostic
+import dates
+from dates import parse_date, DEFAULT_BIRTH
 
 class Individual():
     row_headers = [
@@ -11,16 +14,20 @@ class Individual():
     error_header = "ERROR: INDIVIDUAL:"
     anomaly_header = "ANOMALY: INDIVIDUAL:"
 
-    def __init__(self, id, name, gender, bday, age, familes, alive, death=None, children=None, spouses=None):
+    # No per-instance __dict__; diagnostics lists are only created on the first finding
+    __slots__ = ("id", "name", "gender", "bday", "age", "alive", "families", "death",
+                 "children", "spouses", "_errors", "_anomalies")
+
+    def __init__(self, id, name, gender, bday, age, familes, alive, death=None, children=None, spouses=None, validate=True):
         if '@' in id:
             id.replace('@', '')
-        self.id = id
+        self.id = sys.intern(id)
         self.name = name
-        self.gender = gender
+        self.gender = sys.intern(gender)
         self.bday = bday
         self.age = age
         self.alive = alive
-        self.families = familes
+        self.families = tuple(sys.intern(fam) for fam in familes)
         self.death = death
 
         if children is None:
@@ -32,67 +39,71 @@ class Individual():
             self.spouses = []
         else:
             self.spouses = spouses
-        self.errors = []
-        self.anomalies = []
-        self.validate()
+        self._errors = None
+        self._anomalies = None
+        if validate:
+            self.validate()
+
+    @property
+    def errors(self):
+        return () if self._errors is None else [str(error) for error in self._errors]
+
+    @property
+    def anomalies(self):
+        return () if self._anomalies is None else [str(anomaly) for anomaly in self._anomalies]
+
+    def findings(self):
+        """Diagnostic records, errors first"""
+        return (self._errors or []) + (self._anomalies or [])
 
     def validate(self):
-        self._check_dates()
-        self._check_marriages2()
-        self._check_birthday_coming()
+        #Checks registered at the bottom of this module, see rules.py
+        for rule in rules.active(rules.INDIVIDUAL, False):
+            rule.check(self)
+
+    def marriage_check(self, kinship):
+        #Kinship rules need the whole tree linked, see kinship.Kinship
+        self._check_marriages2(kinship)
 
 
-    def _add_error(self, story, error):
-        self.errors.append("%s %s: %s: %s" % 
-                (Individual.error_header, story, self.id, error))
+    def _add_error(self, story, error, *args):
+        if not rules.enabled(story) or not diagnostics.collector.accept():
+            return
+        if self._errors is None:
+            self._errors = []
+        self._errors.append(Diagnostic(Individual.error_header, story, self.id, error, args))
   
-    def _add_anomaly(self, story, anomaly):
-        self.anomalies.append("%s %s: %s: %s" %
-                (Individual.anomaly_header, story, self.id, anomaly))
-
-    def _check_birthday_coming(self):
-        bday_in = self.bday
-        curr_year = datetime.datetime.now().year
-        bday_in = bday_in.replace(year=curr_year, month=bday_in.month, day=bday_in.day)
-        check = bday_in - datetime.datetime.now()
-        if check.days<30 and check.days>0:
-            print("US31: "+self.id+" Upcoming birthday on: "+str(self.bday))
-    def _check_marriages2(self):
+    def _add_anomaly(self, story, anomaly, *args):
+        if not rules.enabled(story) or not diagnostics.collector.accept():
+            return
+        if self._anomalies is None:
+            self._anomalies = []
+        self._anomalies.append(Diagnostic(Individual.anomaly_header, story, self.id, anomaly, args))
+
+    def _check_marriages2(self, kinship):
         #US17 No marriages to descendants
-        childrenList = []
-        temp = self.children
-        if self.children is not None:
-            while temp != []:
-                for group in temp:
-                    childrenList.append(group)
-                    if type(group.children)!=list:
-                        temp.append(group.children)
-                        temp.remove(group)
-                    else:
-                        temp = []
         for spouse in self.spouses:
-            if spouse in childrenList:
-                self._add_anomaly("US17", "Husband is a descendant")
-           
-                    
+            if kinship.is_ancestor(self.id, spouse.id):
+                self._add_anomaly("US17", "Spouse %s is a descendant", spouse.id)
+
     def _check_dates(self):
-        now = datetime.datetime.now()
+        now = dates.clock.now
 
         # Birth and death dates before current date
         if self.bday is not None and self.bday > now:
-            self._add_error("US01", "Birthday %s occurs in the future" % (self.bday.strftime('%Y-%m-%d')))
+            self._add_error("US01", "Birthday %s occurs in the future", self.bday)
         elif self.death is not None:
             if self.death > now:
-                self._add_error("US01", "Death %s occurs in the future" % (self.death.strftime('%Y-%m-%d')))
+                self._add_error("US01", "Death %s occurs in the future", self.death)
             # Death before birth
             if self.death < self.bday:
-                self._add_error("US03", "Died %s before born %s" % (self.death.strftime('%Y-%m-%d'), self.bday.strftime('%Y-%m-%d')))
+                self._add_error("US03", "Died %s before born %s", self.death, self.bday)
             # Died over 150 years old
             if abs(self.death.year - self.bday.year) > 150:
-                self._add_error("US07", "More than 150 years old at death - Birth %s: Death %s" % (self.bday.strftime("%Y-%m-%d"), self.death.strftime("%Y-%m-%d")))
+                self._add_error("US07", "More than 150 years old at death - Birth %s: Death %s", self.bday, self.death)
         # Over 150 and still alive        
         elif abs(now.year - self.bday.year) > 150:
-            self._add_error("US07", "More than 150 years old - Birth %s" % (self.bday.strftime("%Y-%m-%d")))
+            self._add_error("US07", "More than 150 years old - Birth %s", self.bday)
 
     def print_errors(self):
         for i in self.errors:
@@ -103,33 +114,21 @@ class Individual():
             print(i, file=sys.stderr)            
 
     @staticmethod
-    def instance_from_dict(info_dict):
+    def instance_from_dict(info_dict, validate=True):
         id = info_dict['INDI']
         name = info_dict['NAME']
         gender = info_dict['SEX']
-        bday = datetime.datetime.strptime('01 Jan 1900', '%d %b %Y')
+        bday = DEFAULT_BIRTH
 
         if 'BIRT' in info_dict.keys():
-            try:
-                #abbrev_to_num = {"JAN": 1, "FEB": 2, "MAR": 3, "APR": 4, "MAY": 5, "JUN": 6, "JUL": 7, "AUG": 8, "SEP": 9, "OCT": 10, "NOV": 11, "DEC": 12}
-                #check_valid = info_dict['BIRT']
-                #check_valid = check_valid.split(" ")
-                #check_valid[1] = str(abbrev_to_num[check_valid[1]])
-                #check_valid = "-".join(check_valid)
-                if(US24(info_dict['BIRT'])):
-                    bday = datetime.datetime.strptime(info_dict['BIRT'], '%d %b %Y')
-                else:
-                    print('Invalid Date: US24: %s' % info_dict['BIRT'], file=sys.stderr)
-            except:
-                print("ERROR: US24: INVALID DATE: %s" % info_dict['BIRT'], file=sys.stderr)
-                bday = datetime.datetime.strptime('01 Jan 1900', '%d %b %Y')
-        else:
-            bday = datetime.datetime.strptime('01 Jan 1900', '%d %b %Y')
-
-        today = datetime.datetime.today()
-        
-        #US27 - Displaying age of individual based on today's date.
-        age = today.year - bday.year - ((today.month, today.day) < (bday.month, bday.day))
+            bday, valid = parse_date(info_dict['BIRT'])
+            if not valid:
+                if rules.enabled("US24"):
+                    diagnostics.emit(Diagnostic("Invalid Date:", "US24", None, info_dict['BIRT']))
+                bday = DEFAULT_BIRTH
+
+        #US27 - Displaying age of individual as of the reference day
+        age = dates.clock.age(bday)
         if 'FAM' in info_dict:
             families = info_dict['FAM']
         else:
@@ -138,9 +137,13 @@ class Individual():
         death = None
 
         if 'DEAT' in info_dict.keys():
-            alive = False
-            death = datetime.datetime.strptime(info_dict['DEAT'], '%d %b %Y')
-        return Individual(id, name, gender, bday, age, families, alive, death=death)
+            death, valid = parse_date(info_dict['DEAT'])
+            if valid:
+                alive = False
+            else:
+                if rules.enabled("US24"):
+                    diagnostics.emit(Diagnostic("Invalid Date:", "US24", None, info_dict['DEAT']))
+        return Individual(id, name, gender, bday, age, families, alive, death=death, validate=validate)
 
     def add_child(self, child):
         self.children.append(child)
@@ -182,3 +185,6 @@ class Individual():
 
     def __str__(self):
         return str(dict(zip(Individual.row_headers, self.to_row())))
+
+rules.register(rules.INDIVIDUAL, Individual._check_dates, ("US01", "US03", "US07"))
+rules.register(rules.INDIVIDUAL, Individual._check_marriages2, ("US17",), needs=("kinship",))
@@ -0,0 +1,95 @@
+import unittest
+from Family import Family
+from Individual import Individual
+from kinship import Kinship
+
+def person(id, sex='M'):
+    return Individual.instance_from_dict({'INDI': id, 'NAME': 'Person /%s' % id, 'SEX': sex, 'BIRT': '1 Jan 1950'})
+
+class KinshipTests(unittest.TestCase):
+    def setUp(self):
+        # grandpa -> dad, aunt; dad -> son; aunt -> cousin
+        self.people = dict((id, person(id)) for id in ['grandpa', 'dad', 'aunt', 'son', 'cousin'])
+        self.people['grandpa'].add_children([self.people['dad'], self.people['aunt']])
+        self.people['dad'].add_child(self.people['son'])
+        self.people['aunt'].add_child(self.people['cousin'])
+        self.kinship = Kinship(self.people.values())
+
+    def test_generations(self):
+        self.assertEqual(self.kinship.generation['grandpa'], 0)
+        self.assertEqual(self.kinship.generation['cousin'], 2)
+        self.assertFalse(self.kinship.cyclic)
+
+    def test_ancestors(self):
+        self.assertEqual(self.kinship.ancestors('son'), frozenset(['dad', 'grandpa']))
+        self.assertTrue(self.kinship.is_ancestor('grandpa', 'cousin'))
+        self.assertFalse(self.kinship.is_ancestor('dad', 'cousin'))
+
+    def test_relations(self):
+        self.assertTrue(self.kinship.first_cousins('son', 'cousin'))
+        self.assertFalse(self.kinship.first_cousins('dad', 'aunt'))
+        self.assertTrue(self.kinship.siblings('dad', 'aunt'))
+        self.assertFalse(self.kinship.siblings('son', 'cousin'))
+        self.assertTrue(self.kinship.aunt_or_uncle('aunt', 'son'))
+        self.assertFalse(self.kinship.aunt_or_uncle('dad', 'son'))
+
+    def test_cycle_terminates(self):
+        self.people['cousin'].add_child(self.people['grandpa'])
+        kinship = Kinship(self.people.values())
+        self.assertEqual(kinship.cyclic, set(self.people))
+        self.assertTrue('grandpa' in kinship.ancestors('grandpa'))
+        self.assertTrue(kinship.is_ancestor('son', 'son') is False)
+
+    def test_family_rules(self):
+        son, cousin, aunt = self.people['son'], self.people['cousin'], self.people['aunt']
+        cousin.gender = 'F'
+        fam = Family.instance_from_dict({'FAM': 'F1', 'HUSB': son, 'WIFE': cousin, 'MARR': '1 Jan 1980'})
+        fam2 = Family.instance_from_dict({'FAM': 'F2', 'HUSB': son, 'WIFE': aunt, 'MARR': '1 Jan 1980'})
+        fam3 = Family.instance_from_dict({'FAM': 'F3', 'HUSB': self.people['dad'], 'WIFE': aunt, 'MARR': '1 Jan 1980'})
+        kinship = Kinship(self.people.values())
+        fam.marriage_check(kinship)
+        fam2.marriage_check(kinship)
+        fam3.marriage_check(kinship)
+
+        self.assertTrue(any('US19' in a for a in fam.anomalies))
+        self.assertTrue(any('US20' in a and 'aunt, son' in a for a in fam2.anomalies))
+        self.assertTrue(any('US18' in a and 'dad, aunt' in a for a in fam3.anomalies))
+        self.assertFalse(any('US18' in a for a in fam.anomalies + fam2.anomalies))
+
+class RelationshipTests(unittest.TestCase):
+    def setUp(self):
+        # root -> a1 -> a2 -> a3, root -> b1 -> b2, b1 -> b2s
+        people = dict((id, person(id)) for id in ['root', 'a1', 'a2', 'a3', 'b1', 'b2', 'b2s', 'loner'])
+        for parent, child in [('root', 'a1'), ('a1', 'a2'), ('a2', 'a3'), ('root', 'b1'), ('b1', 'b2'), ('b1', 'b2s')]:
+            people[parent].add_child(people[child])
+        self.kinship = Kinship(people.values())
+
+    def describe(self, a, b):
+        return str(self.kinship.relationship(a, b))
+
+    def test_direct_line(self):
+        self.assertEqual(self.describe('a3', 'a3'), 'self')
+        self.assertEqual(self.describe('root', 'a1'), 'parent')
+        self.assertEqual(self.describe('root', 'a3'), 'great-grandparent')
+        self.assertEqual(self.describe('a2', 'root'), 'grandchild')
+
+    def test_collateral(self):
+        self.assertEqual(self.describe('b2', 'b2s'), 'sibling')
+        self.assertEqual(self.describe('b1', 'a2'), 'aunt/uncle')
+        self.assertEqual(self.describe('b1', 'a3'), 'great-aunt/uncle')
+        self.assertEqual(self.describe('a3', 'b1'), 'great-niece/nephew')
+        self.assertEqual(self.describe('a2', 'b2'), 'first cousin')
+        self.assertEqual(self.describe('a3', 'b2'), 'first cousin once removed')
+
+    def test_degree_and_ancestor(self):
+        relation = self.kinship.relationship('a3', 'b2')
+        self.assertEqual((relation.ancestor, relation.up, relation.down, relation.degree), ('root', 3, 2, 5))
+        self.assertIsNone(self.kinship.relationship('loner', 'a1'))
+
+    def test_rule_depth(self):
+        self.assertEqual(self.kinship.ancestor_depths('a3', 2), {'a3': 0, 'a2': 1, 'a1': 2})
+        self.assertEqual(len(self.kinship.ancestor_depths('a3')), 4)
+        self.assertEqual(str(self.kinship.near_relationship('b2', 'b2s')), 'sibling')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import sys
+import unittest
+import Project3
+from io import StringIO
+
+# Families are linked through an id index after the whole file is read, so
+# HUSB/WIFE/CHIL may point at INDI records that come later in the file
+class LinkingTests(unittest.TestCase):
+    def test_forward_references(self):
+        old_stderr = sys.stderr
+        sys.stderr = StringIO()
+        indivs, fams = Project3.process_file("./data/ForwardReferences.ged")
+        sys.stderr = old_stderr
+
+        self.assertEqual(len(indivs), 4)
+        self.assertEqual([fam.id for fam in fams], ['@F1@'])
+        self.assertEqual(fams[0].husband.id, '@I1@')
+        self.assertEqual(fams[0].wife.id, '@I2@')
+
+    def test_children_in_file_order(self):
+        old_stderr = sys.stderr
+        sys.stderr = StringIO()
+        indivs, fams = Project3.process_file("./data/ForwardReferences.ged")
+        sys.stderr = old_stderr
+
+        self.assertEqual([child.id for child in fams[0].children], ['@I3@', '@I4@'])
+        self.assertEqual([child.id for child in indivs[0].children], ['@I3@', '@I4@'])
+
+    def test_missing_spouse(self):
+        old_stderr = sys.stderr
+        result = StringIO()
+        sys.stderr = result
+        Project3.process_file("./data/ForwardReferences.ged")
+        sys.stderr = old_stderr
+
+        self.assertTrue('@F2@: WIFE @I9@ not found' in result.getvalue())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import json
+import unittest
+import profiling
+import rules
+import Project3
+from contextlib import redirect_stderr, redirect_stdout
+from io import StringIO
+
+class ProfilingTests(unittest.TestCase):
+    def tearDown(self):
+        profiling.disable()
+
+    def load(self):
+        with redirect_stdout(StringIO()), redirect_stderr(StringIO()):
+            indivs, fams = Project3.process_file("./data/SmithFamilyErrors_Final.ged", validate=False)
+            rules.validate_all(indivs, fams)
+        return indivs, fams
+
+    def test_disabled(self):
+        rule = rules.active(rules.FAMILY)[0]
+        self.assertTrue(rules.bind([rule], {})[0][0] is rule.check)
+        self.load()
+        self.assertTrue(profiling.profile is None)
+
+    def test_totals(self):
+        profile = profiling.enable()
+        indivs, fams = self.load()
+        self.assertEqual(profile.phases["read"][0], 1)
+        self.assertTrue("validate:family" in profile.phases)
+
+        calls = profile.rules["Family._check_dates"][1]
+        self.assertEqual(calls, len(fams))
+        findings = sum(totals[3] for totals in profile.rules.values())
+        self.assertEqual(findings, sum(len(entity.findings()) for entity in indivs + fams))
+
+        stream = StringIO()
+        profiling.report(stream)
+        self.assertTrue(stream.getvalue().startswith("PROFILE\n+"))
+        self.assertTrue("Family._validate_children" in stream.getvalue())
+
+    def test_trace(self):
+        profile = profiling.enable()
+        self.load()
+        events = json.loads(json.dumps(profile.trace()))["traceEvents"]
+        passes = [event for event in events if event["name"] == "validate:family"]
+        self.assertEqual(len(passes), 1)
+        # Rule totals are laid out inside the pass that ran them
+        inside = [event for event in events if event["cat"] == "rule" and event["name"].startswith("Family.")]
+        self.assertTrue(inside)
+        for event in inside:
+            self.assertTrue(passes[0]["ts"] <= event["ts"])
+            self.assertTrue(event["ts"] + event["dur"] <= passes[0]["ts"] + passes[0]["dur"] + 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,21 @@
 #!/usr/bin/env python
 from Family import Family
 from Individual import Individual
-from prettytable import PrettyTable
+from contextlib import redirect_stdout
+from io import StringIO
+import cache
+import dates
+import incremental
+import rules
+import diagnostics
+import profiling
+from diagnostics import Diagnostic
+from components import validate_parallel
+from anniversaries import AnniversaryIndex, BIRTHDAY, ANNIVERSARY
+from gedcom import iter_dicts, iter_dicts_mmap, iter_dicts_parallel
+import tables
+from collections import defaultdict
+import argparse
 import datetime
 
 """project2.py SSW 555-WS Project 2 GEDCOM validator"""
@@ -10,209 +24,303 @@ __author__ = "Keyur Ved, Monica Razak, Jacob Ciesieleski, Bora Bibe"
 
 import sys 
 
-valid_tags = { 0: ["INDI", "FAM", "HEAD", "RLR", "NOTE", "TRLR"],
-               1: ["NAME", "SEX", "BIRT", "DEAT", "FAMC", "FAMS", "MARR", "HUSB", "WIFE", "CHIL", "DIV"],
-               2: ["DATE"]
-            }
+def add_individual(indiv_dict, individuals, indiv_index, indiv_order, validate=True):
+    if 'INDI' not in indiv_dict:
+        return
+    if indiv_dict['INDI'] in indiv_index:
+        if rules.enabled("US22"):
+            diagnostics.emit(Diagnostic(Individual.error_header, "US22", indiv_dict['INDI'], "already exists"))
+        return
 
-def validate(level, tag):
-    return level in valid_tags.keys() and tag in valid_tags[level]
+    indiv = Individual.instance_from_dict(indiv_dict, validate=validate)
+    indiv_order[indiv.id] = len(individuals)
+    indiv_index[indiv.id] = indiv
+    individuals.append(indiv)
 
-def process_tag(level, curr_dict, tag, arg):
-    if tag == 'INDI':
-        curr_dict = {'INDI': arg}
-    else:
-        if tag == "FAMS" or tag == "FAMC" or tag == "CHIL":
-            if tag == "FAMS" or tag == "FAMC":
-                tag = "FAM"
-            arg = [arg]
+def link_family(fam_dict, indiv_index, indiv_order):
+    """Resolve the HUSB, WIFE and CHIL xrefs of a family through the id index.
+    Children keep the order their INDI records appear in the file, and a
+    spouse is never also linked as a child of the same family."""
+    linked = dict(fam_dict)
 
-            if tag in curr_dict:
-                curr_dict[tag] += arg
-            else:
-                curr_dict[tag] = arg
-        elif arg != '':
-            curr_dict[tag] = arg
+    for tag in ("HUSB", "WIFE"):
+        if fam_dict.get(tag) not in indiv_index:
+            diagnostics.emit(Diagnostic(Family.error_header, None, fam_dict['FAM'], "%s %s not found", (tag, fam_dict.get(tag, "NA"))))
+            return None
+        linked[tag] = indiv_index[fam_dict[tag]]
+
+    parents = (fam_dict['HUSB'], fam_dict['WIFE'])
+    children = [cid for cid in set(fam_dict.get('CHIL', [])) if cid in indiv_index and cid not in parents]
+    children.sort(key=indiv_order.get)
+    linked['CHIL'] = [indiv_index[cid] for cid in children]
+    return linked
 
-def process_file(file):
-    indiv_ids = set()
+def read_records(records, validate=True):
+    """Individuals built from the INDI records, in file order, with the id
+    index and file positions used to link them, and the FAM records held
+    back until every individual is known"""
+    indiv_index = {}
+    indiv_order = {}
     fam_ids = set()
     individuals = []
-    curr_indiv = {}
+    pending_fams = []
+
+    for tag, xref, info in records:
+        if tag == "INDI":
+            add_individual(info, individuals, indiv_index, indiv_order, validate)
+        elif xref not in fam_ids:
+            pending_fams.append(info)
+            fam_ids.add(xref)
+        else:
+            if rules.enabled("US22"):
+                diagnostics.emit(Diagnostic(Family.error_header, "US22", xref, "already exists"))
+    return individuals, indiv_index, indiv_order, pending_fams
+
+def link_families(pending_fams, indiv_index, indiv_order, validate=True):
+    # Families are linked once every INDI record is indexed, so HUSB/WIFE/CHIL
+    # may refer to individuals that appear later in the file
     families = []
-    curr_fam = {}
-    prev_tag = ""
-    fam_process = False
-
-    with open(file, "r") as f:
-        for line in f:
-            line_splt = line.split()
-            line_splt = list(map(lambda x: x.strip(), line_splt))
-
-            level = int(line_splt[0])
-            tag = line_splt[1]
-            arg = ""
-
-            if len(line_splt) > 2:
-                arg = ' '.join(line_splt[2:])
-
-                if line_splt[2] == "INDI" or line_splt[2] == "FAM":
-                    tag = line_splt[2]
-                    arg = line_splt[1]
-
-                    if level == 0 and tag == "FAM":
-                        if curr_indiv != {}:
-                            if 'INDI' in curr_indiv.keys() and curr_indiv['INDI'] not in indiv_ids:
-                                individuals.append(Individual.instance_from_dict(curr_indiv))
-                                indiv_ids.add(curr_indiv['INDI'])
-                            else:
-                                print("ERROR: INDIVIDUAL: %s: already exists" % (curr_indiv['INDI']), file=sys.stderr)
-                            curr_indiv = {}
-                            fam_process = True
-                
-            if validate(level, tag):
-                if not fam_process:
-                    if level == 0:
-                        if curr_indiv != {}:
-                            if 'INDI' in curr_indiv.keys() and curr_indiv['INDI'] not in indiv_ids:
-                                individuals.append(Individual.instance_from_dict(curr_indiv))
-                                indiv_ids.add(curr_indiv['INDI'])
-                            else:
-                                print("ERROR: INDIVIDUAL: US22: %s: already exists" % (curr_indiv['INDI']), file=sys.stderr)
-                        if tag == "INDI":
-                            curr_indiv = {}
-                            curr_indiv = {'INDI': arg}
-                        else:
-                            curr_indiv = {}
-                    else:
-                        if tag == "BIRT" or tag == "DEAT":
-                            prev_tag = tag
-                        elif tag == "DATE":
-                            tag = prev_tag
-                            prev_tag = ""
-                    process_tag(level, curr_indiv, tag, arg)
-                else:
-                    if level == 0 and curr_fam != {}:
-                        if 'FAM' in curr_fam.keys() and curr_fam['FAM'] not in fam_ids:
-                            if 'CHIL' in curr_fam.keys():
-                                children = curr_fam['CHIL']
-                            curr_fam['CHIL'] = []
-
-                            for indiv in individuals:
-                                if indiv.id == curr_fam['HUSB']:
-                                    curr_fam['HUSB'] = indiv
-                                elif indiv.id == curr_fam['WIFE']:
-                                    curr_fam['WIFE'] = indiv
-                                elif indiv.id in children:
-                                    curr_fam['CHIL'].append(indiv)
-
-                            families.append(Family.instance_from_dict(curr_fam))
-                            fam_ids.add(curr_fam['FAM'])
-                        else:
-                            print("ERROR: FAMILY: US22: %s: already exists" % curr_fam['FAM'], file=sys.stderr)
-                        if tag == "FAM":
-                            curr_fam = {"FAM": arg}
-                        else:
-                            curr_fam = {}
-                    else:
-                        if tag == "MARR" or tag == "DIV":
-                            prev_tag = tag
-                        elif tag == "DATE":
-                            tag = prev_tag
-                            prev_tag = ""
-                        process_tag(level, curr_fam, tag, arg)
-                   
+    for fam_dict in pending_fams:
+        linked = link_family(fam_dict, indiv_index, indiv_order)
+        if linked is not None:
+            families.append(Family.instance_from_dict(linked, validate=validate))
+    return families
+
+def read_file(file, use_mmap=False, jobs=1):
+    """The (tag, xref, info) records of a file"""
+    if jobs > 1:
+        return iter_dicts_parallel(file, jobs)
+    if use_mmap:
+        return iter_dicts_mmap(file)
+    return iter_dicts(file)
+
+def build_tree(records, validate=True):
+    with profiling.phase("read"):
+        individuals, indiv_index, indiv_order, pending_fams = read_records(records, validate)
+    with profiling.phase("link"):
+        families = link_families(pending_fams, indiv_index, indiv_order, validate)
+    return individuals, families
+
+def process_file(file, use_mmap=False, jobs=1, validate=True):
+    """Build the individuals and families of a file. With validate False
+    nothing is checked, call rules.validate_all once the tree is returned."""
+    individuals, families = build_tree(read_file(file, use_mmap, jobs), validate)
+    diagnostics.flush()
     return individuals, families
             
-def run():
-    if len(sys.argv) <= 1:
-        exit("Required arg <filename> missing") 
-
-    indivs, fams = process_file(sys.argv[1])
-
-    indiv_table = PrettyTable()
-    deceased_table = PrettyTable()
-    married_table = PrettyTable()
-    born_recently_table = PrettyTable()
-    indiv_table.field_names = Individual.row_headers
-    deceased_table.field_names = Individual.row_headers
-    num_deceased = 0
-    married_table.field_names = Individual.row_headers
-    num_married = 0
-    born_recently_table.field_names = Individual.row_headers
-    count_recent = 0
-    
+def check_bigamy(fams):
+    """US12 bigamy: sweep each person's marriages in date order and report every
+    pair that overlaps without a divorce ending the earlier one, on the later family"""
+    marriages = defaultdict(list)
+    for fam in fams:
+        for spouse in (fam.husband, fam.wife):
+            if spouse is not None and (not marriages[spouse.id] or marriages[spouse.id][-1][1] is not fam):
+                marriages[spouse.id].append((spouse, fam))
+
+    for person_marriages in marriages.values():
+        if len(person_marriages) < 2:
+            continue
+        person_marriages.sort(key=lambda marriage: marriage[1].married_date)
+
+        active = []
+        for spouse, fam in person_marriages:
+            active = [other for other in active if other.div_date is None or other.div_date > fam.married_date]
+            for other in active:
+                fam.bigError(spouse, other)
+            active.append(fam)
+
+def check_duplicates(indivs):
+    """US23 no two individuals share a name and birthday; the later ones are flagged"""
     unique = set()
     for indiv in indivs:
         temp = "NAME: "+str(indiv.name) + ", Birthday: " + str(indiv.bday)
         if temp in unique:
-            print("ANOMALY: US23: DUPLICATE PERSON: ", temp, file=sys.stderr)
+            indiv._add_anomaly("US23", "Duplicate person: " + temp)
         else:
             unique.add(temp)
-        if not indiv.alive:
-            deceased_table.add_row(indiv.to_row())
-            num_deceased += 1
-        elif len(indiv.spouses) > 0:
-            married_table.add_row(indiv.to_row())
-            num_married += 1
-            
-        #US35 List recent births
-        now = datetime.datetime.now()       
-        num_days = ((now-indiv.bday).days)
-        if num_days <= 30:
-            born_recently_table.add_row(indiv.to_row())
-            count_recent = count_recent + 1
-        
-        indiv_table.add_row(indiv.to_row())
-        indiv.print_errors()
-        indiv.print_anomalies()
-
-    fam_table = PrettyTable()
-    fam_table.field_names = Family.row_headers
-
-    #Error Check for Bigomy between families
-    for big1Fam in fams:
-        for big2Fam in fams:
-            if big1Fam.id is not big2Fam.id and big1Fam.husband == big2Fam.husband and (big1Fam.div_date is None and big2Fam.div_date is None):
-                big2Fam.bigError(big2Fam.husband)
-            if big1Fam.id is not big2Fam.id and big1Fam.wife == big2Fam.wife and (big2Fam.div_date is None and big2Fam.div_date is None):
-                big2Fam.bigError(big2Fam.wife)            
 
-    for fam in fams:
-        #Marriage Check
-        fam.marriage_check()
-        fam_table.add_row(fam.to_row())
-        fam.print_errors()
-        fam.print_anomalies()
-        
-    
-    print("ALL INDIVIDUALS")
-    print(indiv_table)
-    if num_deceased > 0:
-        print("US29: DECEASED INDIVIDUALS")
-        print(deceased_table)
-    
-    if num_married > 0:
-        print("US30: MARRIED ALIVE INDIVIDUALS")
-        print(married_table)
-    print(fam_table)
-    if count_recent > 0:
-        print("US35: BORN IN THE PAST 30 DAYS")
-        print(born_recently_table)
+def upcoming(anniversaries, kind, days=30):
+    """Occurrences of kind in the next days days, in tree order"""
+    found = anniversaries.upcoming(kind, dates.clock.day, days)
+    return sorted(found, key=lambda occurrence: occurrence.position)
+
+def _tree_bigamy(indivs, fams):
+    check_bigamy(fams)
+
+def _tree_duplicates(indivs, fams):
+    check_duplicates(indivs)
+
+def _tree_upcoming_birthdays(indivs, fams, anniversaries):
+    #US31 List upcoming birthdays
+    for occurrence in upcoming(anniversaries, BIRTHDAY):
+        print("US31: " + occurrence.entity.id + " Upcoming birthday on: " + str(occurrence.date))
+
+def _tree_upcoming_anniversaries(indivs, fams, anniversaries):
+    #US32 List upcoming anniversaries
+    for occurrence in upcoming(anniversaries, ANNIVERSARY):
+        print("US32: " + occurrence.entity.id + " Upcoming anniversary on: " + str(occurrence.date))
 
+rules.register(rules.TREE, _tree_bigamy, ("US12",))
+rules.register(rules.TREE, _tree_duplicates, ("US23",))
+rules.register(rules.TREE, _tree_upcoming_birthdays, ("US31",), needs=("anniversaries",))
+rules.register(rules.TREE, _tree_upcoming_anniversaries, ("US32",), needs=("anniversaries",))
+
+def revalidate_tree(records, state=None, jobs=1):
+    """Build and validate the tree of records, running the individual and
+    family rules only on the entities changed since state, or on all of
+    them without one. Returns (individuals, families, the state for next time)."""
+    indivs, fams = build_tree(records, validate=False)
+    with profiling.phase("revalidate"):
+        records = incremental.first_records(records)
+        if state is None:
+            validate_parallel(indivs, fams, jobs, tree=False)
+        else:
+            incremental.revalidate(state, records, indivs, fams)
+        state = incremental.capture(records, indivs, fams)
+        rules.validate_tree_rules(indivs, fams)
+    return indivs, fams, state
+
+def revalidate_file(file, cache_dir, options="", max_bytes=cache.DEFAULT_MAX_BYTES, use_mmap=False, jobs=1):
+    """revalidate_tree of a file against the state the previous run of the
+    same file left in cache_dir"""
+    key = incremental.state_key(file, options)
+    state = cache.load_state(cache_dir, key)
+    with profiling.phase("tokenize"):
+        records = list(read_file(file, use_mmap, jobs))
+    indivs, fams, state = revalidate_tree(records, state, jobs)
+    cache.store_state(cache_dir, key, state, max_bytes)
+    diagnostics.flush()
+    return indivs, fams
+
+def cached_process_file(file, cache_dir, max_bytes=cache.DEFAULT_MAX_BYTES, use_mmap=False, jobs=1,
+                        incremental=False):
+    """Build and validate a file through the on-disk snapshot cache. Output
+    printed and diagnostics emitted while doing so are stored with the
+    snapshot and replayed on a hit. On a miss, incremental revalidates only
+    what changed since the last run of the file; not with a diagnostics
+    limit, as which findings are kept then depends on all the others."""
+    options = "%s:%s" % (rules.selection(), diagnostics.collector.limit)
+    key = cache.content_key(file, options=options)
+    snapshot = cache.load(cache_dir, key)
+
+    if snapshot is None:
+        out = StringIO()
+        with redirect_stdout(out), diagnostics.recording() as recorder:
+            if incremental and diagnostics.collector.limit is None:
+                indivs, fams = revalidate_file(file, cache_dir, options, max_bytes, use_mmap, jobs)
+            else:
+                indivs, fams = process_file(file, use_mmap=use_mmap, jobs=jobs, validate=False)
+                validate_parallel(indivs, fams, jobs)
+        snapshot = (indivs, fams, out.getvalue(), recorder.diagnostics)
+        cache.store(cache_dir, key, *snapshot, max_bytes=max_bytes)
+
+    indivs, fams, out, emitted = snapshot
+    sys.stdout.write(out)
+    for diagnostic in emitted:
+        diagnostics.emit(diagnostic)
+    diagnostics.flush()
+    return indivs, fams
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="GEDCOM validator")
+    parser.add_argument("file", help="GEDCOM file to validate")
+    parser.add_argument("--as-of", type=datetime.date.fromisoformat, metavar="YYYY-MM-DD",
+                        help="check dates and compute ages as of this day instead of today")
+    parser.add_argument("--mmap", action="store_true",
+                        help="tokenize the memory mapped file instead of decoding every line")
+    parser.add_argument("--jobs", type=int, default=1, metavar="N",
+                        help="tokenize and validate the file in N worker processes")
+    parser.add_argument("--cache", metavar="DIR",
+                        help="reuse parsed snapshots of unchanged files stored in DIR")
+    parser.add_argument("--cache-size", type=int, default=cache.DEFAULT_MAX_BYTES // (1024 * 1024), metavar="MB",
+                        help="evict least recently used snapshots beyond this size")
+    parser.add_argument("--incremental", action="store_true",
+                        help="with --cache, only rerun the checks of records changed since the last run of the file")
+    parser.add_argument("--diagnostics", choices=diagnostics.MODES, default="text",
+                        help="write findings as text, JSON Lines, or only counts per story")
+    parser.add_argument("--max-diagnostics", type=int, metavar="N",
+                        help="stop collecting findings after N of them")
+    parser.add_argument("--format", choices=tables.FORMATS, default="table",
+                        help="layout of the report tables; every format but table is streamed")
+    parser.add_argument("--rules", type=story_list, metavar="US01,US02",
+                        help="only run the checks of these user stories")
+    parser.add_argument("--skip", type=story_list, default=[], metavar="US19",
+                        help="do not run the checks of these user stories")
+    parser.add_argument("--profile", action="store_true",
+                        help="print time, calls and findings per phase, rule and story to stderr "
+                             "(or set %s=1)" % profiling.ENV_PROFILE)
+    parser.add_argument("--trace", metavar="FILE",
+                        help="profile and write a Chrome trace of the run to FILE (or set %s=FILE)" % profiling.ENV_TRACE)
+    args = parser.parse_args(argv)
+
+    if args.incremental and not args.cache:
+        parser.error("--incremental needs --cache DIR")
+    unknown = sorted(set(args.rules or []).union(args.skip) - rules.stories())
+    if unknown:
+        parser.error("unknown user stories: %s" % ",".join(unknown))
+    return args
+
+def story_list(text):
+    return [story.strip().upper() for story in text.split(",") if story.strip()]
+
+def run():
+    args = parse_args(sys.argv[1:])
+    dates.set_as_of(args.as_of)
+    rules.select(args.rules, args.skip)
+    sink = diagnostics.configure(args.diagnostics, args.max_diagnostics)
+
+    profiled, trace = profiling.requested()
+    trace = args.trace or trace
+    if args.profile or profiled or trace:
+        profiling.enable()
+
+    if args.cache:
+        with profiling.phase("cache"):
+            indivs, fams = cached_process_file(args.file, args.cache, args.cache_size * 1024 * 1024,
+                                               use_mmap=args.mmap, jobs=args.jobs, incremental=args.incremental)
+    else:
+        indivs, fams = process_file(args.file, use_mmap=args.mmap, jobs=args.jobs, validate=False)
+        with profiling.phase("validate", jobs=args.jobs):
+            validate_parallel(indivs, fams, args.jobs)
+
+    with profiling.phase("diagnostics"):
+        for entity in indivs + fams:
+            found = entity.findings()
+            sink.extend(found)
+            if profiling.profile is not None:
+                profiling.profile.count(found)
+        sink.close()
+
+    write_report(args.format, indivs, fams)
+    profiling.report(sys.stderr, trace)
+
+def write_report(format, indivs, fams):
+    # Each table is streamed as its rows are produced, one pass per table
+    report(format, "ALL INDIVIDUALS", "individuals", Individual.row_headers,
+           (indiv.to_row() for indiv in indivs))
+    report(format, "US29: DECEASED INDIVIDUALS", "deceased", Individual.row_headers,
+           (indiv.to_row() for indiv in indivs if not indiv.alive), required=False)
+    report(format, "US30: MARRIED ALIVE INDIVIDUALS", "married", Individual.row_headers,
+           (indiv.to_row() for indiv in indivs if indiv.alive and len(indiv.spouses) > 0), required=False)
+    report(format, None, "families", Family.row_headers, (fam.to_row() for fam in fams))
+
+    #US35 List recent births (and, as ever, births dated in the future)
+    since = dates.clock.day - datetime.timedelta(days=30)
+    report(format, "US35: BORN IN THE PAST 30 DAYS", "recent_births", Individual.row_headers,
+           (indiv.to_row() for indiv in AnniversaryIndex(indivs).born_since(since)), required=False)
 
     #US28 Listing families siblings in order by age
-    for fam in fams:
-        print("US28: SIBLINGS FROM FAMILY: " + fam.id + " LISTED BY AGE ORDER")
-        fam.sibling_sort()
-        sibling_table = PrettyTable()
-        sibling_table.field_names = Individual.row_headers
-        siblings = fam.children
-        for indiv in siblings:
-            sibling_table.add_row(indiv.to_row())
-        print(sibling_table)
-        
-    
+    with profiling.phase("report:siblings"):
+        for fam in fams:
+            fam.sibling_sort()
+            table = tables.table(format, Individual.row_headers, title="US28: SIBLINGS FROM FAMILY: " + fam.id +
+                                 " LISTED BY AGE ORDER", name="siblings:" + fam.id)
+            table.rows_from(indiv.to_row() for indiv in fam.children).close()
+
+def report(format, title, name, headers, rows, required=True):
+    with profiling.phase("report:" + name):
+        table = tables.table(format, headers, title=title, name=name, required=required)
+        table.rows_from(rows).close()
 
 
 if __name__ == "__main__":
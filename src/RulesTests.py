@@ -0,0 +1,97 @@
+import unittest
+import rules
+import Project3
+from contextlib import redirect_stderr, redirect_stdout
+from io import StringIO
+from Family import Family
+from Individual import Individual
+
+def person(id, sex='M', birt='1 Jan 1950'):
+    return Individual.instance_from_dict({'INDI': id, 'NAME': 'Person /%s' % id, 'SEX': sex, 'BIRT': birt})
+
+def family(id, husband, wife, children=()):
+    return Family.instance_from_dict({'FAM': id, 'HUSB': husband, 'WIFE': wife, 'MARR': '1 Jan 1970',
+                                      'CHIL': list(children)})
+
+class RulesTests(unittest.TestCase):
+    def tearDown(self):
+        rules.select()
+
+    def test_registered(self):
+        stories = rules.stories()
+        for story in ["US01", "US12", "US15", "US17", "US19", "US20", "US23"]:
+            self.assertTrue(story in stories)
+        self.assertTrue(all(rule.needs == ("kinship",) for rule in rules.active(rules.FAMILY, True)))
+        self.assertFalse(any(rule.needs for rule in rules.active(rules.FAMILY, False)))
+
+    def test_select(self):
+        rules.select(["US01"])
+        self.assertTrue(rules.enabled("US01"))
+        self.assertFalse(rules.enabled("US03"))
+        self.assertEqual(rules.active(rules.FAMILY, True), [])
+        self.assertEqual(rules.selection(), "US01")
+
+        rules.select(skip=["US19"])
+        self.assertFalse(rules.enabled("US19"))
+        self.assertTrue(rules.enabled("US20"))
+        rules.select()
+        self.assertEqual(rules.selection(), "")
+
+    def test_filtered_findings(self):
+        # US01 and US07 come from the same check, only US07 is reported
+        rules.select(["US07"])
+        future = person('I1', birt='1 Jan 2900')
+        old = person('I2', birt='1 Jan 1800')
+        self.assertEqual(len(future.errors), 0)
+        self.assertEqual(len(old.errors), 1)
+        self.assertTrue("US07" in old.errors[0])
+
+    def test_validate_tree(self):
+        # dad marries his daughter: US17 on both the family and the husband
+        dad = person('I1')
+        mom = person('I2', 'F')
+        daughter = person('I3', 'F', '1 Jan 1971')
+        fams = [family('F1', dad, mom, [daughter]), family('F2', dad, daughter)]
+        indivs = [dad, mom, daughter]
+
+        rules.select(skip=["US17"])
+        rules.validate_tree(indivs, fams)
+        self.assertFalse(any("descendant of" in anomaly for anomaly in fams[1].anomalies))
+
+        rules.select(["US12", "US17"])
+        rules.validate_tree(indivs, fams)
+        self.assertTrue(any("Wife I3 is a descendant of husband I1" in anomaly for anomaly in fams[1].anomalies))
+        self.assertTrue(any("Spouse I3 is a descendant" in anomaly for anomaly in dad.anomalies))
+        self.assertTrue(any("US12" in error for error in fams[1].errors))
+
+    def test_validate_all(self):
+        with redirect_stdout(StringIO()), redirect_stderr(StringIO()):
+            indivs, fams = Project3.process_file("./data/SmithFamilyErrors_Final.ged", validate=False)
+        self.assertFalse(any(indiv.errors or indiv.anomalies for indiv in indivs))
+        self.assertFalse(any(fam.errors or fam.anomalies for fam in fams))
+
+        with redirect_stdout(StringIO()):
+            rules.validate_all(indivs, fams)
+        self.assertTrue(any("US01" in error for indiv in indivs for error in indiv.errors))
+        self.assertTrue(any("US12" in error for fam in fams for error in fam.errors))
+
+    def test_unknown_story(self):
+        with self.assertRaises(SystemExit), redirect_stderr(StringIO()):
+            Project3.parse_args(["--rules", "US01,US99", "file.ged"])
+        args = Project3.parse_args(["--rules", "us01, US02", "--skip", "US19", "file.ged"])
+        self.assertEqual(args.rules, ["US01", "US02"])
+        self.assertEqual(args.skip, ["US19"])
+
+    def test_parse_stories(self):
+        # US22 and US24 are reported while the file is read, the selection still applies
+        args = Project3.parse_args(["--skip", "US22", "file.ged"])
+        self.assertEqual(args.skip, ["US22"])
+        for only, shown in ((None, 3), (["US01"], 0), (["US24"], 2)):
+            rules.select(only)
+            err = StringIO()
+            with redirect_stdout(StringIO()), redirect_stderr(err):
+                Project3.process_file("./data/SmithFamilyErrors_Final.ged")
+            self.assertEqual(len([line for line in err.getvalue().splitlines() if "US22" in line or "US24" in line]), shown)
+
+if __name__ == "__main__":
+    unittest.main()
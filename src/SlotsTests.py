@@ -0,0 +1,27 @@
+import sys
+import unittest
+from Family import Family
+from Individual import Individual
+
+class SlotsTests(unittest.TestCase):
+    def test_compact_individual(self):
+        person = Individual.instance_from_dict({'INDI': '@I1@', 'NAME': 'Person /One', 'SEX': 'M',
+                                                'BIRT': '24 Feb 1980', 'FAM': ['@F1@']})
+        self.assertFalse(hasattr(person, '__dict__'))
+        self.assertIsNone(person._errors)
+        self.assertEqual(len(person.errors), 0)
+        self.assertTrue(person.id is sys.intern('@I1@'))
+        self.assertTrue(person.families[0] is sys.intern('@F1@'))
+
+    def test_lazy_diagnostics(self):
+        husband = Individual.instance_from_dict({'INDI': '@I1@', 'NAME': 'Person /One', 'SEX': 'F', 'BIRT': '24 Feb 1980'})
+        wife = Individual.instance_from_dict({'INDI': '@I2@', 'NAME': 'Person /Two', 'SEX': 'F', 'BIRT': '13 Feb 1980'})
+        fam = Family.instance_from_dict({'FAM': '@F1@', 'HUSB': husband, 'WIFE': wife, 'MARR': '15 Mar 2002'})
+
+        self.assertFalse(hasattr(fam, '__dict__'))
+        self.assertIsNone(fam._errors)
+        self.assertEqual(len(fam.anomalies), 1)
+        self.assertEqual(husband.spouses, [wife])
+
+if __name__ == '__main__':
+    unittest.main()
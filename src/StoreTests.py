@@ -0,0 +1,96 @@
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+import daemon
+import dates
+import diagnostics
+import generate
+import rules
+import store
+import Project3
+from contextlib import redirect_stdout
+from io import StringIO
+
+class StoreTests(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.file = os.path.join(self.dir, "tree.ged")
+        self.path = os.path.join(self.dir, "tree.db")
+        generate.generate(self.file, seed=5, violation_rate=0.05, individuals=300)
+        dates.set_as_of(datetime.date(2020, 6, 1))
+
+    def tearDown(self):
+        dates.set_as_of()
+        rules.select()
+        shutil.rmtree(self.dir)
+
+    def memory(self):
+        out = StringIO()
+        with redirect_stdout(out), diagnostics.recording() as recorder:
+            indivs, fams = Project3.process_file(self.file, validate=False)
+            rules.validate_all(indivs, fams)
+        found = list(recorder.diagnostics)
+        for entity in indivs + fams:
+            found.extend(entity.findings())
+        return [str(d) for d in found]
+
+    def stored(self, batch=store.BATCH):
+        db = store.build(self.file, self.path, batch)
+        found = [str(d) for d in store.findings(db)]
+        db.close()
+        return found
+
+    def assertSameFindings(self, stored, memory):
+        # The same findings in the same order, but the divorce checks
+        # Family._check_dates repeats are reported once
+        self.assertEqual(set(stored), set(memory))
+        remaining = iter(memory)
+        self.assertTrue(all(found in remaining for found in stored))
+
+    def test_matches_memory(self):
+        found = self.stored()
+        self.assertTrue(found)
+        self.assertSameFindings(found, self.memory())
+        self.assertEqual(self.stored(batch=5), found)
+
+        rules.select(["US12", "US17", "US18", "US23"])
+        self.assertSameFindings(self.stored(), self.memory())
+
+        # The parse findings stay in the store and are filtered when read
+        rules.select(["US12", "US24"])
+        found = self.stored()
+        self.assertTrue(any("US24" in finding for finding in found))
+        self.assertFalse(any("US22" in finding for finding in found))
+        self.assertSameFindings(found, self.memory())
+
+    def test_new_day(self):
+        self.stored()
+        dates.set_as_of(datetime.date(2031, 2, 28))
+        tree = store.SqliteTree(self.path)
+        self.assertSameFindings([str(d) for d in tree.findings()], self.memory())
+
+    def test_queries(self):
+        self.stored()
+        tree = daemon.open_tree(self.path)
+        self.assertIsInstance(tree, store.SqliteTree)
+        memory = daemon.Tree(self.file)
+
+        self.assertEqual(tree.counts()[:2], memory.counts()[:2])
+        self.assertEqual(tree.output, memory.output)
+        for entity in memory.individuals + memory.families:
+            found = tree.entity(entity.id)
+            self.assertEqual(found.to_row(), entity.to_row())
+            self.assertEqual(set(map(str, found.findings())), set(map(str, entity.findings())))
+        self.assertRaises(LookupError, tree.entity, "@X9@")
+
+        for fam in memory.families:
+            for a, b in [(fam.husband.id, child.id) for child in fam.children] + [(fam.husband.id, fam.wife.id)]:
+                self.assertEqual(str(tree.relationship(a, b)), str(memory.relationship(a, b)))
+        for kind in ("birthday", "anniversary"):
+            self.assertEqual([(o.entity.id, o.on) for o in tree.upcoming(kind, 60)],
+                             [(o.entity.id, o.on) for o in memory.upcoming(kind, 60)])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import json
+import unittest
+import tables
+from io import StringIO
+
+try:
+    from prettytable import PrettyTable
+except ImportError:
+    PrettyTable = None
+
+HEADERS = ["ID", "Name", "Age"]
+ROWS = [["@I1@", "Bob /Smith/", 70], ["@I22@", "Al /Li/", 5], ["@I3@", "Mary Jane /Smith/", 101]]
+
+def render(format, rows=ROWS, **kwargs):
+    stream = StringIO()
+    tables.table(format, HEADERS, stream=stream, **kwargs).rows_from(rows).close()
+    return stream.getvalue()
+
+class TablesTests(unittest.TestCase):
+    @unittest.skipIf(PrettyTable is None, "prettytable is not installed")
+    def test_box_matches_prettytable(self):
+        for rows in (ROWS, []):
+            table = PrettyTable()
+            table.field_names = HEADERS
+            for row in rows:
+                table.add_row(row)
+            self.assertEqual(render("table", rows), str(table) + "\n")
+
+    def test_fixed(self):
+        # Widths sampled from every row match the box layout
+        self.assertEqual(render("fixed"), render("table"))
+        streamed = render("fixed", widths=[5, 11, 3])
+        self.assertEqual(streamed.splitlines()[1], "|   ID  |     Name    | Age |")
+
+    def test_optional(self):
+        self.assertEqual(render("table", [], title="US29", required=False), "")
+        self.assertTrue(render("table", [], title="ALL").startswith("ALL\n+"))
+
+    def test_markdown_csv(self):
+        lines = render("markdown", [["@I1@", "a|b", 1]]).splitlines()
+        self.assertEqual(lines[0], "| ID | Name | Age |")
+        self.assertEqual(lines[2], "| @I1@ | a\\|b | 1 |")
+        self.assertEqual(render("csv", title="T").splitlines()[:3], ["T", "ID,Name,Age", "@I1@,Bob /Smith/,70"])
+
+    def test_jsonl(self):
+        records = [json.loads(line) for line in render("jsonl", name="individuals").splitlines()]
+        self.assertEqual(len(records), 3)
+        self.assertEqual(records[2], {"table": "individuals", "ID": "@I3@", "Name": "Mary Jane /Smith/", "Age": 101})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -86,5 +86,25 @@ class TestBirthBeforeDeathOfParents(unittest.TestCase):
         self.assertFalse(Family.instance_from_dict(fam_dict).errors)
     
 
+  def test_divorced_parents(self):
+        husband = Individual.instance_from_dict({ 'INDI': 'I0', 'NAME': 'Person /One', 'SEX': 'M',
+                'BIRT': '8 Jan 1972', 'DEAT': '3 Feb 2001', 'FAM': 'F0' })
+        wife = Individual.instance_from_dict({ 'INDI': 'I1', 'NAME': 'Person /Two', 'SEX': 'F',
+                'BIRT': '11 Aug 1973', 'DEAT': '12 Aug 1999', 'FAM': 'F0' })
+        child = Individual.instance_from_dict({ 'INDI': 'I2', 'NAME': 'Pperson /One', 'SEX': 'F',
+                'BIRT': '23 Apr 2000', 'FAM': 'F0' })
+        fam_dict = { 'FAM': 'F0',
+                'HUSB': husband,
+                'WIFE': wife,
+                'MARR': '15 Mar 1994',
+                'DIV': '1 Jun 1998',
+                'CHIL': [child],
+        }
+
+        errors = [error for error in Family.instance_from_dict(fam_dict).errors if 'US09' in error]
+        self.assertTrue(errors)
+        for error in errors:
+            self.assertTrue(error.endswith("Child I2 born on 2000-04-23 after mother's death on 1999-08-12"), error)
+
 if __name__ == '__main__':
     unittest.main()
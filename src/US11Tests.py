@@ -1,6 +1,7 @@
 import unittest
 from Family import Family
 from Individual import Individual
+from kinship import Kinship
 
 class US11Tests(unittest.TestCase):
 
@@ -97,7 +98,7 @@ class US11Tests(unittest.TestCase):
         }
         Family.instance_from_dict(fam_dict3)
         Family.instance_from_dict(fam_dict2)
-        self.assertTrue(Family.instance_from_dict(fam_dict).anomalies)
+        self.assertFalse(Family.instance_from_dict(fam_dict).anomalies)
     
     def test_marriage_invalid(self):
         #Grandpa
@@ -191,9 +192,11 @@ class US11Tests(unittest.TestCase):
                 'CHIL': [niece],
         }
         Family.instance_from_dict(fam_dict2)
-        Family.instance_from_dict(fam_dict4)
-   
-        self.assertTrue(Family.instance_from_dict(fam_dict).anomalies)
+        fam4 = Family.instance_from_dict(fam_dict4)
+        Family.instance_from_dict(fam_dict)
+
+        fam4.marriage_check(Kinship([grandpa, grandma, aunt, dad]))
+        self.assertTrue(any('US18' in anomaly for anomaly in fam4.anomalies))
 
     def test_marriage_invalid2(self):
         #Grandpa
@@ -287,9 +290,11 @@ class US11Tests(unittest.TestCase):
                 'CHIL': [nephiew],
         }
         Family.instance_from_dict(fam_dict2)
-        Family.instance_from_dict(fam_dict4)
-   
-        self.assertTrue(Family.instance_from_dict(fam_dict).anomalies)
+        fam4 = Family.instance_from_dict(fam_dict4)
+        Family.instance_from_dict(fam_dict)
+
+        fam4.marriage_check(Kinship([grandpa, grandma, aunt, dad]))
+        self.assertTrue(any('US18' in anomaly for anomaly in fam4.anomalies))
 
     def test_valid_marriages2(self):
         #Grandpa
@@ -384,7 +389,7 @@ class US11Tests(unittest.TestCase):
         }
         Family.instance_from_dict(fam_dict3)
         Family.instance_from_dict(fam_dict2)
-        self.assertTrue(Family.instance_from_dict(fam_dict).anomalies)
+        self.assertFalse(Family.instance_from_dict(fam_dict).anomalies)
 
     def test_valid_marriages3(self):
         #Grandpa
@@ -487,7 +492,7 @@ class US11Tests(unittest.TestCase):
         }
         Family.instance_from_dict(fam_dict3)
         Family.instance_from_dict(fam_dict2)
-        self.assertTrue(Family.instance_from_dict(fam_dict).anomalies)
+        self.assertFalse(Family.instance_from_dict(fam_dict).anomalies)
 
 if __name__ == '__main__':
     #unittest.main()
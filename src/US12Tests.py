@@ -1,6 +1,7 @@
 import unittest
 from Family import Family
 from Individual import Individual
+from Project3 import check_bigamy
 
 class US12Tests(unittest.TestCase):
     def test_valid(self):
@@ -106,5 +107,51 @@ class US12Tests(unittest.TestCase):
 
         self.assertTrue(Family.instance_from_dict(fam_dict).errors)
 
+class US12BigamyTests(unittest.TestCase):
+    def family(self, id, husband, wife, married, divorced=None):
+        fam_dict = {'FAM': id, 'HUSB': husband, 'WIFE': wife, 'MARR': married}
+        if divorced is not None:
+            fam_dict['DIV'] = divorced
+        return Family.instance_from_dict(fam_dict)
+
+    def person(self, id, sex):
+        return Individual.instance_from_dict({'INDI': id, 'NAME': 'Person /%s' % id, 'SEX': sex, 'BIRT': '1 Jan 1950'})
+
+    def test_overlap_reported_once_on_later_marriage(self):
+        husband = self.person('I1', 'M')
+        fams = [self.family('F2', husband, self.person('I3', 'F'), '1 Jan 1990'),
+                self.family('F1', husband, self.person('I2', 'F'), '1 Jan 1980')]
+        check_bigamy(fams)
+
+        self.assertFalse(fams[1].errors)
+        self.assertEqual(len(fams[0].errors), 1)
+        self.assertTrue('Person I1' in fams[0].errors[0] and '(F1)' in fams[0].errors[0])
+
+    def test_divorced_before_remarriage(self):
+        wife = self.person('I1', 'F')
+        fams = [self.family('F1', self.person('I2', 'M'), wife, '1 Jan 1980', '1 Jan 1985'),
+                self.family('F2', self.person('I3', 'M'), wife, '1 Jan 1990')]
+        check_bigamy(fams)
+
+        self.assertFalse(fams[0].errors)
+        self.assertFalse(fams[1].errors)
+
+    def test_divorced_after_remarriage(self):
+        wife = self.person('I1', 'F')
+        fams = [self.family('F1', self.person('I2', 'M'), wife, '1 Jan 1980', '1 Jan 1995'),
+                self.family('F2', self.person('I3', 'M'), wife, '1 Jan 1990')]
+        check_bigamy(fams)
+
+        self.assertFalse(fams[0].errors)
+        self.assertEqual(len(fams[1].errors), 1)
+
+    def test_every_overlapping_pair(self):
+        husband = self.person('I1', 'M')
+        fams = [self.family('F%d' % i, husband, self.person('I%d' % (i + 1), 'F'), '1 Jan %d' % (1980 + i))
+                for i in range(1, 4)]
+        check_bigamy(fams)
+
+        self.assertEqual([len(fam.errors) for fam in fams], [0, 1, 2])
+
 if __name__ == '__main__':
     unittest.main()
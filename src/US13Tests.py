@@ -73,5 +73,19 @@ class US13Tests(unittest.TestCase):
 
         self.assertTrue(Family.instance_from_dict(fam_dict).errors)
 
+    def test_window(self):
+        # Born years apart, or 3 whole months apart
+        husband = Individual.instance_from_dict({'INDI': 'I1', 'NAME': 'Person /One', 'SEX': 'M', 'BIRT': '24 Feb 1980'})
+        wife = Individual.instance_from_dict({'INDI': 'I2', 'NAME': 'Person /Two', 'SEX': 'F', 'BIRT': '13 Feb 1980'})
+        def family(*bdays):
+            children = [Individual.instance_from_dict({'INDI': 'I%d' % (i + 3), 'NAME': 'Person /%d' % i, 'SEX': 'M',
+                                                       'BIRT': bday}) for i, bday in enumerate(bdays)]
+            return Family.instance_from_dict({'FAM': 'F0', 'HUSB': husband, 'WIFE': wife, 'MARR': '14 FEB 2000',
+                                              'CHIL': children})
+
+        self.assertFalse(family('15 Feb 2001', '20 Mar 2005').errors)
+        self.assertEqual(len(family('15 Feb 2001', '16 Feb 2001', '15 May 2001').errors), 2)
+        self.assertFalse(family('31 Jan 2001', '30 Sep 2001').errors)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -97,7 +97,7 @@ class US19Tests(unittest.TestCase):
         }
         Family.instance_from_dict(fam_dict3)
         Family.instance_from_dict(fam_dict2)
-        self.assertTrue(Family.instance_from_dict(fam_dict).anomalies)
+        self.assertFalse(Family.instance_from_dict(fam_dict).anomalies)
     
     def test_marriage_invalid(self):
         #Grandpa
@@ -396,7 +396,7 @@ class US19Tests(unittest.TestCase):
         }
         Family.instance_from_dict(fam_dict3)
         Family.instance_from_dict(fam_dict2)
-        self.assertTrue(Family.instance_from_dict(fam_dict).anomalies)
+        self.assertFalse(Family.instance_from_dict(fam_dict).anomalies)
 
     def test_valid_marriages3(self):
         #Grandpa
@@ -499,7 +499,7 @@ class US19Tests(unittest.TestCase):
         }
         Family.instance_from_dict(fam_dict3)
         Family.instance_from_dict(fam_dict2)
-        self.assertTrue(Family.instance_from_dict(fam_dict).anomalies)
+        self.assertFalse(Family.instance_from_dict(fam_dict).anomalies)
 
 if __name__ == '__main__':
     #unittest.main()
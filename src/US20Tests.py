@@ -299,7 +299,7 @@ class US20Tests(unittest.TestCase):
         Family.instance_from_dict(fam_dict2)
         Family.instance_from_dict(fam_dict3)
    
-        self.assertTrue(Family.instance_from_dict(fam_dict).anomalies)
+        self.assertFalse(Family.instance_from_dict(fam_dict).anomalies)
 
     def test_marriage_valid3(self):
         #Grandpa
@@ -375,7 +375,7 @@ class US20Tests(unittest.TestCase):
         Family.instance_from_dict(fam_dict2)
         Family.instance_from_dict(fam_dict3)
    
-        self.assertTrue(Family.instance_from_dict(fam_dict).anomalies)
+        self.assertFalse(Family.instance_from_dict(fam_dict).anomalies)
 
 if __name__ == '__main__':
     #unittest.main()
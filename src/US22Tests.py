@@ -33,5 +33,14 @@ class TestUniqueIDs(unittest.TestCase):
 
         self.assertTrue('US22' in result.getvalue())
 
+    def test_invalid_parallel(self):
+        old_stderr = sys.stderr
+        result = StringIO()
+        sys.stderr = result
+        Project3.process_file("./data/SmithFamilyErrors_Final.ged", jobs=8)
+        sys.stderr = old_stderr
+
+        self.assertTrue('US22' in result.getvalue())
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,6 +1,7 @@
 import unittest
 
 import datetime
+import dates
 import user_stories
 from user_stories import *
 
@@ -10,4 +11,11 @@ class TestUS31(unittest.TestCase):
         self.assertEqual(US31(date), True)
     def test_not_coming_up(self):
         date = datetime.datetime(1997, 8, 21)
-        self.assertEqual(US31(date), False)
\ No newline at end of file
+        self.assertEqual(US31(date), False)
+    def test_leap_day(self):
+        dates.set_as_of(datetime.date(2021, 2, 20))
+        try:
+            self.assertEqual(US31(datetime.datetime(1992, 2, 29)), True)
+            self.assertEqual(US32(datetime.datetime(1992, 2, 29)), True)
+        finally:
+            dates.set_as_of()
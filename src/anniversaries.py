@@ -0,0 +1,104 @@
+"""anniversaries.py day-of-year index of birthdays and marriage dates (US31, US32, US35)"""
+
+import calendar
+import datetime
+from bisect import bisect_left, bisect_right
+
+BIRTHDAY = "birthday"
+ANNIVERSARY = "anniversary"
+
+# Days are keyed by their place in a leap year, so 29 Feb has a key of its own
+_MONTH_STARTS = [0, 31, 60, 91, 121, 152, 182, 213, 244, 274, 305, 335]
+_FEB_28 = 58
+_FEB_29 = 59
+
+def day_key(date):
+    return _MONTH_STARTS[date.month - 1] + date.day - 1
+
+def _day(value):
+    return value.date() if isinstance(value, datetime.datetime) else value
+
+class Occurrence():
+    """A birthday or anniversary of entity on the date on, for the event
+    that happened on date (the entity's own datetime)"""
+
+    __slots__ = ("kind", "entity", "date", "on", "position")
+
+    def __init__(self, kind, entity, date, on, position):
+        self.kind = kind
+        self.entity = entity
+        self.date = date
+        self.on = on
+        self.position = position
+
+    def __repr__(self):
+        return "Occurrence(%s, %s, %s)" % (self.kind, self.entity.id, self.on)
+
+class AnniversaryIndex():
+    """Birthdays of individuals and marriage dates of families sorted by
+    day of the year, and births sorted by date. Every query bisects them,
+    so it touches only the rows it returns. A 29 Feb date comes round on
+    28 Feb in common years."""
+
+    def __init__(self, individuals=(), families=()):
+        self._keys = {}
+        self._rows = {}
+        for kind, entities, date_of in ((BIRTHDAY, individuals, lambda indiv: indiv.bday),
+                                        (ANNIVERSARY, families, lambda fam: fam.married_date)):
+            rows = [(day_key(date), position, entity, date) for position, entity in enumerate(entities)
+                    for date in (date_of(entity),) if date is not None]
+            rows.sort(key=lambda row: (row[0], row[1]))
+            self._keys[kind] = [row[0] for row in rows]
+            self._rows[kind] = rows
+
+        born = sorted(((indiv.bday.toordinal(), position, indiv) for position, indiv in enumerate(individuals)
+                       if indiv.bday is not None), key=lambda row: (row[0], row[1]))
+        self._birth_days = [row[0] for row in born]
+        self._born = born
+
+    def between(self, kind, start, end):
+        """Occurrences of kind from start to end, both included, in date order
+        and then in the order of the entities"""
+        start, end = _day(start), _day(end)
+        if start > end:
+            return []
+        found = []
+        for year in range(start.year, end.year + 1):
+            first = day_key(start) if year == start.year else 0
+            last = day_key(end) if year == end.year else _MONTH_STARTS[-1] + 30
+            leap = calendar.isleap(year)
+            if not leap and last == _FEB_28:
+                last = _FEB_29
+
+            chunk = []
+            for key, position, entity, date in self.rows(kind, first, last):
+                if key == _FEB_29 and not leap:
+                    on = datetime.date(year, 2, 28)
+                else:
+                    on = datetime.date(year, date.month, date.day)
+                chunk.append(Occurrence(kind, entity, date, on, position))
+            if not leap and first <= _FEB_28 < last:
+                # 29 Feb rows moved onto 28 Feb take their place among its rows
+                chunk.sort(key=lambda occurrence: (occurrence.on, occurrence.position))
+            found.extend(chunk)
+        return found
+
+    def rows(self, kind, first, last):
+        """(day key, position, entity, date) of kind with keys first to last, in order"""
+        keys = self._keys[kind]
+        return self._rows[kind][bisect_left(keys, first):bisect_right(keys, last)]
+
+    def upcoming(self, kind, as_of, days):
+        """Occurrences in the days days after as_of"""
+        as_of = _day(as_of)
+        return self.between(kind, as_of + datetime.timedelta(days=1), as_of + datetime.timedelta(days=days))
+
+    def recent(self, kind, as_of, days):
+        """Occurrences in the days days up to and including as_of"""
+        as_of = _day(as_of)
+        return self.between(kind, as_of - datetime.timedelta(days=days), as_of)
+
+    def born_since(self, date):
+        """Individuals born on date or later, in their original order"""
+        rows = self._born[bisect_left(self._birth_days, _day(date).toordinal()):]
+        return [indiv for _, _, indiv in sorted(rows, key=lambda row: row[1])]
@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+"""benchmark.py timings of the parse, link, validate and render phases at several input sizes"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, redirect_stdout
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import diagnostics
+import generate
+import rules
+import Project3
+from gedcom import iter_dicts
+
+SIZES = [1000, 10000, 100000]
+
+class Phases():
+    """Wall time, records handled and net allocated blocks of each phase.
+    With traced set, tracemalloc is running and the peak bytes allocated
+    during each phase are recorded instead of its time."""
+
+    def __init__(self, traced=False):
+        self.traced = traced
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name, records=0, **extra):
+        """Measure the block; it may set stats["records"] once it knows them"""
+        stats = { "records": records }
+        blocks = sys.getallocatedblocks()
+        if self.traced:
+            tracemalloc.reset_peak()
+            current = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        yield stats
+        seconds = time.perf_counter() - start
+
+        stats["blocks"] = sys.getallocatedblocks() - blocks
+        if self.traced:
+            stats["peak_bytes"] = tracemalloc.get_traced_memory()[1] - current
+        else:
+            stats["seconds"] = seconds
+            stats["records_per_s"] = stats["records"] / seconds if seconds > 0 else None
+        stats.update(extra)
+        self.phases[name] = stats
+
+def pipeline(file, phases, format="table"):
+    """Run what Project3 does for file one phase at a time, each rule on
+    its own over all of its entities"""
+    with phases.phase("parse") as stats:
+        records = list(iter_dicts(file))
+        stats["records"] = len(records)
+    with phases.phase("build", len(records)):
+        indivs, indiv_index, indiv_order, pending_fams = Project3.read_records(records, validate=False)
+    with phases.phase("link", len(pending_fams)):
+        fams = Project3.link_families(pending_fams, indiv_index, indiv_order, validate=False)
+
+    scopes = ((rules.INDIVIDUAL, indivs), (rules.FAMILY, fams), (rules.TREE, None))
+    selected = [rule for scope, _ in scopes for rule in rules.active(scope)]
+    indexes = {}
+    for rule in selected:
+        for need in rule.needs:
+            if need not in indexes:
+                with phases.phase("index:" + need, len(indivs)):
+                    indexes[need] = rules.INDEXES[need](indivs, fams)
+
+    for scope, entities in scopes:
+        for rule in rules.active(scope):
+            args = [indexes[need] for need in rule.needs]
+            if scope == rules.TREE:
+                with phases.phase("rule:" + rule.name, len(indivs) + len(fams), stories=list(rule.stories)):
+                    rule.check(indivs, fams, *args)
+                continue
+            with phases.phase("rule:" + rule.name, len(entities), stories=list(rule.stories)):
+                for entity in entities:
+                    rule.check(entity, *args)
+
+    findings = [found for entity in indivs + fams for found in entity.findings()]
+    with open(os.devnull, "w") as null:
+        with phases.phase("diagnostics", len(findings)):
+            sink = diagnostics.Sink(stream=null)
+            sink.extend(findings)
+            sink.close()
+        with phases.phase("render", len(indivs) + len(fams)):
+            Project3.write_report(format, indivs, fams)
+    return len(records)
+
+def measure(file, repeat=3, allocations=False, format="table"):
+    """Phase statistics of file, the fastest of repeat runs for each phase"""
+    best = {}
+    records = 0
+    with open(os.devnull, "w") as null, redirect_stdout(null), diagnostics.recording():
+        for _ in range(repeat):
+            phases = Phases()
+            records = pipeline(file, phases, format)
+            for name, stats in phases.phases.items():
+                if name not in best or stats["seconds"] < best[name]["seconds"]:
+                    best[name] = stats
+        # Before tracing, which holds a record of every allocation
+        peak_rss = peak_rss_kb()
+
+        if allocations:
+            phases = Phases(traced=True)
+            tracemalloc.start()
+            try:
+                pipeline(file, phases, format)
+            finally:
+                tracemalloc.stop()
+            for name, stats in phases.phases.items():
+                best[name]["peak_bytes"] = stats["peak_bytes"]
+
+    total = sum(stats["seconds"] for stats in best.values())
+    return { "file": file, "bytes": os.path.getsize(file), "records": records,
+             "seconds": total, "records_per_s": records / total if total > 0 else None,
+             "peak_rss_kb": peak_rss, "phases": best }
+
+def peak_rss_kb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+def measure_apart(file, repeat, allocations, format):
+    # A fresh interpreter per input, so its peak RSS is that input's alone
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(measure, file, repeat, allocations, format).result()
+
+def compare(results, baseline, threshold=0.25, min_seconds=0.01):
+    """(run, measure, baseline value, value) for every phase time or peak
+    RSS more than threshold above the baseline run of the same name.
+    Phases faster than min_seconds in the baseline are too noisy to judge."""
+    previous = dict((run["name"], run) for run in baseline.get("runs", []))
+    regressions = []
+    for run in results["runs"]:
+        before = previous.get(run["name"])
+        if before is None:
+            continue
+        for name, stats in run["phases"].items():
+            old = before["phases"].get(name)
+            if old is None or old["seconds"] < min_seconds:
+                continue
+            if stats["seconds"] > old["seconds"] * (1 + threshold):
+                regressions.append((run["name"], name, old["seconds"], stats["seconds"]))
+        if run["peak_rss_kb"] and before.get("peak_rss_kb") and run["peak_rss_kb"] > before["peak_rss_kb"] * (1 + threshold):
+            regressions.append((run["name"], "peak_rss_kb", before["peak_rss_kb"], run["peak_rss_kb"]))
+    return regressions
+
+def run_all(files, sizes, repeat=3, allocations=False, format="table", seed=0, apart=True):
+    """Benchmark the given files, or trees generated with the given numbers
+    of individuals when there are none"""
+    results = { "python": platform.python_version(), "platform": platform.platform(),
+                "repeat": repeat, "format": format, "runs": [] }
+    workdir = tempfile.mkdtemp()
+    try:
+        inputs = [(os.path.basename(file), file) for file in files]
+        for size in ([] if files else sizes):
+            file = os.path.join(workdir, "tree%d.ged" % size)
+            generate.generate(file, seed=seed, violation_rate=0.001, individuals=size)
+            inputs.append((str(size), file))
+
+        for name, file in inputs:
+            stats = (measure_apart if apart else measure)(file, repeat, allocations, format)
+            stats["name"] = name
+            results["runs"].append(stats)
+            print("%s: %d records in %.3fs, %.0f records/s, peak RSS %s KB" %
+                  (name, stats["records"], stats["seconds"], stats["records_per_s"] or 0, stats["peak_rss_kb"]),
+                  file=sys.stderr)
+    finally:
+        shutil.rmtree(workdir)
+    return results
+
+def size_list(text):
+    return [int(size) for size in text.split(",") if size.strip()]
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Time each phase of the GEDCOM validator")
+    parser.add_argument("files", nargs="*", help="GEDCOM files to time instead of generated trees")
+    parser.add_argument("--sizes", type=size_list, default=SIZES, metavar="1000,10000",
+                        help="individuals in each generated tree")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per input, the fastest of each phase is kept")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the generated trees")
+    parser.add_argument("--format", choices=Project3.tables.FORMATS, default="table", help="report format to render")
+    parser.add_argument("--allocations", action="store_true",
+                        help="also trace the peak bytes allocated in each phase, in an extra run")
+    parser.add_argument("--output", metavar="FILE", help="write the results here instead of stdout")
+    parser.add_argument("--baseline", metavar="FILE", help="results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="slowdown over the baseline, as a fraction, reported as a regression")
+    return parser.parse_args(argv)
+
+def main(argv):
+    args = parse_args(argv)
+    results = run_all(args.files, args.sizes, args.repeat, args.allocations, args.format, args.seed)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=1)
+    else:
+        json.dump(results, sys.stdout, indent=1)
+        print()
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for name, phase, before, after in regressions:
+            print("REGRESSION %s %s: %.4g -> %.4g (%+.0f%%)" % (name, phase, before, after, (after / before - 1) * 100),
+                  file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,162 @@
+"""cache.py on-disk snapshots of parsed and validated GEDCOM trees"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+import zlib
+import dates
+from Family import Family
+from Individual import Individual
+
+# Bump whenever parsing or validation changes
+CACHE_VERSION = 8
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+MAGIC = b'GEDCACHE'
+SUFFIX = '.snap'
+
+def content_key(file, today=None, options=""):
+    """Hash of the file content, the cache version, the reference day and any
+    options that change the result, e.g. the selected user stories. Ages and
+    date checks are relative to the reference day (dates.clock by default),
+    so snapshots of runs as of today expire daily."""
+    if today is None:
+        today = dates.clock.day
+
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(("%d:%s:%s:" % (CACHE_VERSION, today.isoformat(), options)).encode())
+    with open(file, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _ids(people):
+    return [p.id for p in people]
+
+def _state(obj):
+    return dict((name, getattr(obj, name)) for name in type(obj).__slots__)
+
+def _restore(cls, state):
+    obj = cls.__new__(cls)
+    for name, value in state.items():
+        setattr(obj, name, value)
+    return obj
+
+def flatten(indivs, fams):
+    """Picklable (people, families) states. References are stored as ids so
+    pickle never recurses along the family graph."""
+    people = []
+    for indiv in indivs:
+        state = _state(indiv)
+        state['children'] = _ids(indiv.children)
+        state['spouses'] = _ids(indiv.spouses)
+        people.append(state)
+
+    families = []
+    for fam in fams:
+        state = _state(fam)
+        state['husband'] = None if fam.husband is None else fam.husband.id
+        state['wife'] = None if fam.wife is None else fam.wife.id
+        state['children'] = _ids(fam.children)
+        families.append(state)
+    return people, families
+
+def unflatten(people, families):
+    """Rebuild the (individuals, families) lists of flatten"""
+    index = {}
+    indivs = []
+    for state in people:
+        indiv = _restore(Individual, state)
+        index[indiv.id] = indiv
+        indivs.append(indiv)
+    for indiv in indivs:
+        indiv.children = [index[i] for i in indiv.children]
+        indiv.spouses = [index[i] for i in indiv.spouses]
+
+    fams = []
+    for state in families:
+        fam = _restore(Family, state)
+        fam.husband = index.get(fam.husband)
+        fam.wife = index.get(fam.wife)
+        fam.children = [index[i] for i in fam.children]
+        fams.append(fam)
+    return indivs, fams
+
+def _dumps(indivs, fams, out, err):
+    people, families = flatten(indivs, fams)
+    return zlib.compress(pickle.dumps((people, families, out, err), pickle.HIGHEST_PROTOCOL))
+
+def _loads(data):
+    people, families, out, err = pickle.loads(zlib.decompress(data))
+    indivs, fams = unflatten(people, families)
+    return indivs, fams, out, err
+
+def load(cache_dir, key):
+    """Return (individuals, families, stdout, diagnostics) for key, or None on a miss.
+    Unreadable snapshots are deleted and treated as misses."""
+    return _read(cache_dir, key, _loads)
+
+def store(cache_dir, key, indivs, fams, out='', err=(), max_bytes=DEFAULT_MAX_BYTES):
+    _write(cache_dir, key, _dumps(indivs, fams, out, err), max_bytes)
+
+def load_state(cache_dir, key):
+    """Return the state stored under key by store_state, or None"""
+    return _read(cache_dir, key, lambda data: pickle.loads(zlib.decompress(data)))
+
+def store_state(cache_dir, key, state, max_bytes=DEFAULT_MAX_BYTES):
+    """Store any picklable state, evicted along with the snapshots"""
+    _write(cache_dir, key, zlib.compress(pickle.dumps(state, pickle.HIGHEST_PROTOCOL)), max_bytes)
+
+def _read(cache_dir, key, loads):
+    path = os.path.join(cache_dir, key + SUFFIX)
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+
+    try:
+        if not data.startswith(MAGIC):
+            raise ValueError("bad snapshot header")
+        snapshot = loads(data[len(MAGIC):])
+    except Exception:
+        _remove(path)
+        return None
+
+    # Keep recently used snapshots at the back of the eviction order
+    os.utime(path)
+    return snapshot
+
+def _write(cache_dir, key, data, max_bytes):
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MAGIC)
+            f.write(data)
+        os.replace(tmp, os.path.join(cache_dir, key + SUFFIX))
+    except BaseException:
+        _remove(tmp)
+        raise
+    evict(cache_dir, max_bytes)
+
+def evict(cache_dir, max_bytes):
+    """Delete least recently used snapshots until the cache fits in max_bytes"""
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith(SUFFIX):
+            st = os.stat(os.path.join(cache_dir, name))
+            entries.append((st.st_mtime, st.st_size, name))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= max_bytes:
+            break
+        _remove(os.path.join(cache_dir, name))
+        total -= size
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
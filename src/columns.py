@@ -0,0 +1,87 @@
+"""columns.py columnar NumPy view of a parsed tree with vectorized date checks"""
+
+import datetime
+import dates
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SEX_CODES = {'M': 1, 'F': 2}
+
+# datetime64[D] counts days from 1970-01-01, date.toordinal() from 0001-01-01
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+def _ordinal(value):
+    return 0 if value is None else value.toordinal()
+
+class TreeColumns():
+    """One row per individual, in the order of the list it was built from.
+    Parent and spouse columns hold row numbers, -1 when unknown."""
+
+    def __init__(self, individuals, families=()):
+        if np is None:
+            raise ImportError("TreeColumns requires numpy")
+
+        n = len(individuals)
+        self.ids = [indiv.id for indiv in individuals]
+        self.row = dict((id, i) for i, id in enumerate(self.ids))
+
+        self.bday = np.fromiter((_ordinal(indiv.bday) for indiv in individuals), dtype=np.int32, count=n)
+        self.death = np.fromiter((_ordinal(indiv.death) for indiv in individuals), dtype=np.int32, count=n)
+        self.alive = np.fromiter((indiv.alive for indiv in individuals), dtype=bool, count=n)
+        self.sex = np.fromiter((SEX_CODES.get(indiv.gender, 0) for indiv in individuals), dtype=np.uint8, count=n)
+
+        self.father = np.full(n, -1, dtype=np.int32)
+        self.mother = np.full(n, -1, dtype=np.int32)
+        for fam in families:
+            husband = self.row.get(fam.husband.id, -1) if fam.husband is not None else -1
+            wife = self.row.get(fam.wife.id, -1) if fam.wife is not None else -1
+            for child in fam.children:
+                i = self.row.get(child.id)
+                if i is not None and self.father[i] == -1 and self.mother[i] == -1:
+                    self.father[i] = husband
+                    self.mother[i] = wife
+
+        # Spouses of row i are spouse_index[spouse_offsets[i]:spouse_offsets[i + 1]]
+        counts = np.fromiter((len(indiv.spouses) for indiv in individuals), dtype=np.int64, count=n)
+        self.spouse_offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.spouse_offsets[1:])
+        self.spouse_index = np.fromiter((self.row.get(sp.id, -1) for indiv in individuals for sp in indiv.spouses),
+                                        dtype=np.int32, count=int(self.spouse_offsets[-1]))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def spouses(self, i):
+        return self.spouse_index[self.spouse_offsets[i]:self.spouse_offsets[i + 1]]
+
+    def years(self, ordinals):
+        days = (ordinals.astype(np.int64) - _EPOCH_ORDINAL).astype('datetime64[D]')
+        return days.astype('datetime64[Y]').astype(np.int64) + 1970
+
+def _today(today):
+    if today is None:
+        return dates.clock.ordinal
+    return today.toordinal()
+
+# The vectorized checks below follow Individual._check_dates branch for branch:
+# a future birthday hides every other date error of that person.
+def future_dates(cols, today=None):
+    """US01: rows with a birthday or death date after today"""
+    today = _today(today)
+    born_future = cols.bday > today
+    return np.flatnonzero(born_future | (~born_future & ~cols.alive & (cols.death > today)))
+
+def death_before_birth(cols, today=None):
+    """US03: rows whose death date comes before their birthday"""
+    today = _today(today)
+    return np.flatnonzero((cols.bday <= today) & ~cols.alive & (cols.death < cols.bday))
+
+def too_old(cols, today=None):
+    """US07: rows more than 150 years old at death, or now if still alive"""
+    today = _today(today)
+    end = np.where(cols.alive, np.int32(today), cols.death)
+    span = np.abs(cols.years(end) - cols.years(cols.bday))
+    return np.flatnonzero((cols.bday <= today) & (span > 150))
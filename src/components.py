@@ -0,0 +1,140 @@
+"""components.py connected components of the family graph and parallel validation"""
+
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from io import StringIO
+import sys
+import cache
+import dates
+import diagnostics
+import profiling
+import rules
+
+class UnionFind():
+    """Disjoint sets of ids with path halving and union by size"""
+
+    def __init__(self):
+        self.parent = {}
+        self.size = {}
+
+    def find(self, x):
+        parent = self.parent
+        if x not in parent:
+            parent[x] = x
+            self.size[x] = 1
+            return x
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a, b):
+        a = self.find(a)
+        b = self.find(b)
+        if a == b:
+            return a
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+        return a
+
+def components(individuals, families):
+    """Split a tree into connected (individuals, families) pairs over the
+    HUSB, WIFE and CHIL links. Both lists keep the input order, and the
+    components are ordered by their first individual."""
+    sets = UnionFind()
+    for indiv in individuals:
+        sets.find(indiv.id)
+        for other in indiv.children:
+            sets.union(indiv.id, other.id)
+        for other in indiv.spouses:
+            sets.union(indiv.id, other.id)
+    for fam in families:
+        root = sets.union(fam.husband.id, fam.wife.id)
+        for child in fam.children:
+            sets.union(root, child.id)
+
+    groups = {}
+    for indiv in individuals:
+        groups.setdefault(sets.find(indiv.id), ([], []))[0].append(indiv)
+    for fam in families:
+        groups[sets.find(fam.husband.id)][1].append(fam)
+    return list(groups.values())
+
+def batches(groups, count):
+    """Pack components, in order, into at most count batches of similar size"""
+    total = sum(len(indivs) + len(fams) for indivs, fams in groups)
+    target = max(total // count, 1)
+
+    packed = []
+    indivs, fams = [], []
+    for group_indivs, group_fams in groups:
+        indivs.extend(group_indivs)
+        fams.extend(group_fams)
+        if len(indivs) + len(fams) >= target:
+            packed.append((indivs, fams))
+            indivs, fams = [], []
+    if indivs or fams:
+        packed.append((indivs, fams))
+    return packed
+
+def _validate_batch(args):
+    # A batch is closed under the family links, so its kinship index is complete.
+    # Output printed by a check is captured per entity to be replayed in tree order.
+    as_of, selection, profiled, people, families = args
+    dates.set_as_of(as_of)
+    rules.select(selection)
+    diagnostics.collector = diagnostics.Collector()
+    profile = profiling.enable() if profiled else profiling.disable()
+    indivs, fams = cache.unflatten(people, families)
+
+    results = []
+    for scope, entities in ((rules.INDIVIDUAL, indivs), (rules.FAMILY, fams)):
+        active = rules.active(scope)
+        bound = rules.bind(active, rules.build_indexes(active, indivs, fams))
+        for entity in entities:
+            out = StringIO()
+            with redirect_stdout(out):
+                for check, check_args in bound:
+                    check(entity, *check_args)
+            results.append((entity._errors, entity._anomalies, out.getvalue()))
+    return results, profile.rules if profile is not None else None
+
+def validate_parallel(individuals, families, jobs, tree=True):
+    """rules.validate_all with the entity checks of each connected component
+    run in jobs worker processes. Diagnostics and printed output come out in
+    the same order as a serial run; whole-tree rules run in this process,
+    unless tree is False. A --max-diagnostics cap has to see the findings
+    in tree order, so a capped run stays serial."""
+    capped = diagnostics.collector.limit is not None
+    groups = components(individuals, families) if jobs > 1 and not capped else []
+    if len(groups) <= 1:
+        if tree:
+            rules.validate_all(individuals, families)
+        else:
+            rules.validate_entities(individuals, families)
+        return
+
+    packed = batches(groups, jobs * 4)
+    selection = rules.selected()
+    profiled = profiling.profile is not None
+    work = [(dates.clock.day, selection, profiled) + cache.flatten(indivs, fams) for indivs, fams in packed]
+
+    printed = {}
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for (indivs, fams), (results, totals) in zip(packed, pool.map(_validate_batch, work)):
+            if totals is not None:
+                profiling.profile.merge(totals)
+            for entity, (errors, anomalies, out) in zip(indivs + fams, results):
+                entity._errors = errors
+                entity._anomalies = anomalies
+                if out:
+                    printed[entity] = out
+
+    for entity in individuals + families:
+        if entity in printed:
+            sys.stdout.write(printed[entity])
+
+    if tree:
+        rules.validate_tree_rules(individuals, families)
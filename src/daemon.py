@@ -0,0 +1,356 @@
+#!/usr/bin/env python
+"""daemon.py GEDCOM trees kept parsed and validated in memory, queried as JSON lines over a Unix socket"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import signal
+import socket
+import sys
+from contextlib import redirect_stdout
+from io import StringIO
+
+import dates
+import diagnostics
+import Project3
+import store
+from Family import Family
+from anniversaries import AnniversaryIndex, BIRTHDAY, ANNIVERSARY
+from kinship import Kinship
+
+class QueryError(Exception):
+    """A request that cannot be answered, sent back as its error"""
+
+def _date(value):
+    return None if value is None else value.strftime("%Y-%m-%d")
+
+def _text(request, key, default=None):
+    """The string field key of a request, default when it is left out"""
+    value = request.get(key, default)
+    if value is not default and not isinstance(value, str):
+        raise QueryError("%s is a string" % key)
+    return value
+
+class Tree():
+    """A file parsed and validated, with the indexes the queries use. When
+    the file changes, only the entities the edit touched are revalidated.
+    store.SqliteTree answers the same queries from a database."""
+
+    def __init__(self, path, jobs=1, state=None):
+        self.path = path
+        self.jobs = jobs
+        self.stamp = None
+        self.state = state
+        self.load()
+
+    def file_stamp(self):
+        st = os.stat(self.path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def load(self):
+        stamp = self.file_stamp()
+        out = StringIO()
+        with redirect_stdout(out), diagnostics.recording() as recorder:
+            records = list(Project3.read_file(self.path, jobs=self.jobs))
+            indivs, fams, self.state = Project3.revalidate_tree(records, self.state, self.jobs)
+
+        self.stamp = stamp
+        self.individuals = indivs
+        self.families = fams
+        self.index = dict((entity.id, entity) for entity in indivs + fams)
+        self.kinship = Kinship(indivs)
+        self.anniversaries = AnniversaryIndex(indivs, fams)
+        self.output = out.getvalue()
+        self.diagnostics = list(recorder.diagnostics)
+        for entity in indivs + fams:
+            self.diagnostics.extend(entity.findings())
+
+    def reloaded(self):
+        """A new tree of the file as it is now, revalidating only what changed
+        since this one was loaded. This one is left as it was, so it can keep
+        answering until the new one is ready."""
+        return Tree(self.path, self.jobs, self.state)
+
+    def forget(self):
+        # Ages and date checks moved with the day, nothing can be reused
+        self.state = None
+
+    def close(self):
+        pass
+
+    def counts(self):
+        return len(self.individuals), len(self.families), len(self.diagnostics)
+
+    def findings(self, stories=None):
+        return [d for d in self.diagnostics if stories is None or d.story in stories]
+
+    def entity(self, id):
+        found = self.index.get(id)
+        if found is None:
+            raise LookupError("no individual or family %s in %s" % (id, self.path))
+        return found
+
+    def relationship(self, a, b):
+        return self.kinship.relationship(self.entity(a).id, self.entity(b).id)
+
+    def upcoming(self, kind, days):
+        return self.anniversaries.upcoming(kind, dates.clock.day, days)
+
+def open_tree(path, jobs=1):
+    """The tree of a GEDCOM file, or of a database built by store.py"""
+    if path.endswith(store.SUFFIXES):
+        return store.SqliteTree(path)
+    return Tree(path, jobs)
+
+class Daemon():
+    """Answers the requests of OPS against the loaded trees. A request names
+    its tree with "file", which may be left out when only one is loaded."""
+
+    OPS = { "files": "files", "validate": "validate", "lookup": "lookup",
+            "relationship": "relationship", "upcoming": "upcoming" }
+
+    def __init__(self, files, jobs=1, as_of=None):
+        # Without as_of, the reference day follows the calendar
+        self.fixed = as_of is not None
+        dates.set_as_of(as_of)
+        self.trees = dict((path, open_tree(path, jobs)) for path in files)
+        # Files to reload whatever their stamp, and the last failed reload
+        # of each file as (stamp, message), not retried until it changes
+        self.outdated = set()
+        self.failures = {}
+        self.watching = False
+        self.lock = None
+
+    def _path(self, request):
+        name = _text(request, "file")
+        if name is None:
+            if len(self.trees) != 1:
+                raise QueryError("name the file, one of: %s" % ", ".join(self.trees))
+            return next(iter(self.trees))
+        for path in self.trees:
+            if name == path or os.path.abspath(name) == os.path.abspath(path):
+                return path
+        raise QueryError("%s is not loaded" % name)
+
+    def tree(self, request):
+        return self.trees[self._path(request)]
+
+    def _due(self):
+        # (path, tree, stamp) of the trees to reload: those whose file changed,
+        # and all of them on a new day
+        if not self.fixed and dates.clock.day != datetime.date.today():
+            dates.set_as_of()
+            for tree in self.trees.values():
+                tree.forget()
+            self.outdated.update(self.trees)
+        due = []
+        for path, tree in self.trees.items():
+            try:
+                stamp = tree.file_stamp()
+            except OSError as error:
+                self._failed(path, None, error)
+                continue
+            if (path in self.outdated or stamp != tree.stamp) and stamp != self.failures.get(path, (None,))[0]:
+                due.append((path, tree, stamp))
+        return due
+
+    def _failed(self, path, stamp, error):
+        # Keep answering from the tree loaded before, and say so
+        message = "reload of %s failed, answering from the version loaded before: %s: %s" % (
+            path, type(error).__name__, error)
+        if self.failures.get(path, (None, None))[1] != message:
+            print("daemon: %s" % message, file=sys.stderr)
+        self.failures[path] = (stamp, message)
+
+    def _swap(self, path, tree):
+        old = self.trees[path]
+        self.trees[path] = tree
+        self.outdated.discard(path)
+        self.failures.pop(path, None)
+        old.close()
+
+    def refresh(self):
+        """Move to a new day and reload the files that changed"""
+        for path, tree, stamp in self._due():
+            try:
+                self._swap(path, tree.reloaded())
+            except Exception as error:
+                # A file caught halfway through a save can fail in any check
+                self._failed(path, stamp, error)
+
+    async def refresh_async(self):
+        """refresh with each reload run in a worker thread. The trees loaded
+        before keep answering meanwhile; one refresh runs at a time."""
+        async with self.lock:
+            for path, tree, stamp in self._due():
+                try:
+                    reloaded = await asyncio.to_thread(tree.reloaded)
+                except Exception as error:
+                    self._failed(path, stamp, error)
+                else:
+                    self._swap(path, reloaded)
+
+    def handle(self, request):
+        """Response to a request, both dicts, after reloading the files that changed"""
+        self.refresh()
+        return self.answer(request)
+
+    def answer(self, request):
+        """Response to a request from the trees as they are loaded"""
+        try:
+            if not isinstance(request, dict):
+                raise QueryError("a request is a JSON object")
+            name = request.get("op")
+            op = self.OPS.get(name) if isinstance(name, str) else None
+            if op is None:
+                raise QueryError("unknown op %s, one of: %s" % (name, ", ".join(sorted(self.OPS))))
+            response = getattr(self, op)(request)
+            failure = self.failures.get(self._path(request)) if op != "files" else None
+        except (QueryError, LookupError, OSError) as error:
+            return { "ok": False, "error": str(error) }
+        if failure is not None:
+            response["reload_error"] = failure[1]
+        response["ok"] = True
+        return response
+
+    def files(self, request):
+        found = []
+        for path, tree in self.trees.items():
+            individuals, families, diagnostics = tree.counts()
+            found.append({ "file": path, "individuals": individuals, "families": families, "diagnostics": diagnostics })
+            if path in self.failures:
+                found[-1]["reload_error"] = self.failures[path][1]
+        return { "files": found,
+                 "as_of": dates.clock.day.isoformat() }
+
+    def validate(self, request):
+        tree = self.tree(request)
+        stories = request.get("stories")
+        if stories is not None and (not isinstance(stories, list) or not all(isinstance(story, str) for story in stories)):
+            raise QueryError("stories is a list of story names")
+        return { "file": tree.path, "diagnostics": [d.to_dict() for d in tree.findings(stories)],
+                 "output": tree.output }
+
+    def lookup(self, request):
+        tree = self.tree(request)
+        entity = tree.entity(_text(request, "id", ""))
+        headers = type(entity).row_headers
+        return { "id": entity.id, "kind": "family" if isinstance(entity, Family) else "individual",
+                 "row": dict(zip(headers, entity.to_row())), "diagnostics": [d.to_dict() for d in entity.findings()] }
+
+    def relationship(self, request):
+        tree = self.tree(request)
+        a, b = _text(request, "a", ""), _text(request, "b", "")
+        relation = tree.relationship(a, b)
+        if relation is None:
+            return { "a": a, "b": b, "relationship": None }
+        return { "a": a, "b": b, "relationship": str(relation), "ancestor": relation.ancestor,
+                 "up": relation.up, "down": relation.down, "degree": relation.degree }
+
+    def upcoming(self, request):
+        tree = self.tree(request)
+        kind = _text(request, "kind", BIRTHDAY)
+        if kind not in (BIRTHDAY, ANNIVERSARY):
+            raise QueryError("kind is %s or %s" % (BIRTHDAY, ANNIVERSARY))
+        days = request.get("days", 30)
+        if not isinstance(days, int) or days < 0:
+            raise QueryError("days is a whole number of days")
+        return { "kind": kind, "as_of": dates.clock.day.isoformat(),
+                 "events": [{ "id": occurrence.entity.id, "date": _date(occurrence.date), "on": occurrence.on.isoformat() }
+                            for occurrence in tree.upcoming(kind, days)] }
+
+    async def _client(self, reader, writer):
+        # One JSON request per line, each answered by one JSON line
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except ValueError as error:
+                    response = { "ok": False, "error": "bad JSON: %s" % error }
+                else:
+                    # Without a watcher, a request is when changed files are noticed
+                    if not self.watching:
+                        await self.refresh_async()
+                    response = self.answer(request)
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _watch(self, poll):
+        # Reload changed files in the background, answering from the trees
+        # loaded before until the new ones are ready
+        while True:
+            await asyncio.sleep(poll)
+            await self.refresh_async()
+
+    async def serve(self, path, poll=1.0, ready=None):
+        """Answer requests on the Unix socket path until cancelled"""
+        if os.path.exists(path):
+            os.remove(path)
+        self.lock = asyncio.Lock()
+        self.watching = bool(poll)
+        server = await asyncio.start_unix_server(self._client, path=path)
+        watcher = asyncio.ensure_future(self._watch(poll)) if poll else None
+        if ready is not None:
+            ready.set()
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+            if os.path.exists(path):
+                os.remove(path)
+
+def query(path, request, timeout=30.0):
+    """Send one request to the daemon at path and return its response"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(path)
+        sock.sendall(json.dumps(request).encode() + b"\n")
+        with sock.makefile("rb") as f:
+            return json.loads(f.readline())
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Serve validation results and queries of GEDCOM files")
+    parser.add_argument("files", nargs="*", help="GEDCOM files to load")
+    parser.add_argument("--socket", required=True, metavar="PATH", help="Unix socket to listen on, or to query")
+    parser.add_argument("--query", metavar="JSON", help="send this request to a running daemon and print the response")
+    parser.add_argument("--as-of", type=datetime.date.fromisoformat, metavar="YYYY-MM-DD",
+                        help="check dates and compute ages as of this day instead of today")
+    parser.add_argument("--jobs", type=int, default=1, metavar="N", help="validate a whole file in N worker processes")
+    parser.add_argument("--poll", type=float, default=1.0, metavar="SECONDS",
+                        help="how often to look for changed files, 0 to only look when a request comes")
+    args = parser.parse_args(argv)
+    if args.query is None and not args.files:
+        parser.error("give the files to serve, or --query")
+    return args
+
+async def _serve(daemon, args):
+    # Stop on SIGTERM as on Ctrl-C, removing the socket
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    await daemon.serve(args.socket, args.poll)
+
+def main(argv):
+    args = parse_args(argv)
+    if args.query is not None:
+        print(json.dumps(query(args.socket, json.loads(args.query)), indent=1))
+        return
+
+    daemon = Daemon(args.files, args.jobs, args.as_of)
+    print("serving %s on %s" % (", ".join(args.files), args.socket), file=sys.stderr)
+    try:
+        asyncio.run(_serve(daemon, args))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
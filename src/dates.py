@@ -0,0 +1,73 @@
+"""dates.py GEDCOM DD MON YYYY date parsing"""
+
+import calendar
+import datetime
+from functools import lru_cache
+
+MONTHS = { "JAN": 1, "FEB": 2, "MAR": 3, "APR": 4, "MAY": 5, "JUN": 6,
+           "JUL": 7, "AUG": 8, "SEP": 9, "OCT": 10, "NOV": 11, "DEC": 12
+         }
+
+# Used when a record has no (valid) birth or marriage date
+DEFAULT_BIRTH = datetime.datetime(1900, 1, 1)
+DEFAULT_MARRIAGE = datetime.datetime(1980, 1, 1)
+
+INVALID = (None, False)
+
+class Clock():
+    """The reference day of a run. Date checks, ages and upcoming events
+    all compare against it instead of reading the system clock, so a run
+    is consistent across midnight and repeatable with an as_of day."""
+
+    def __init__(self, day=None):
+        if day is None:
+            day = datetime.date.today()
+        elif isinstance(day, datetime.datetime):
+            day = day.date()
+        self.day = day
+        # Midnight, to compare with the dates of the tree, which have no time
+        self.now = datetime.datetime(day.year, day.month, day.day)
+        self.ordinal = day.toordinal()
+        self.year = day.year
+        self.month_day = (day.month, day.day)
+
+    def age(self, born):
+        """Whole years from born to the reference day"""
+        return self.year - born.year - (self.month_day < (born.month, born.day))
+
+clock = Clock()
+
+def set_as_of(day=None):
+    """Make day (today if None) the reference day of the run; returns the clock"""
+    global clock
+    clock = Clock(day)
+    return clock
+
+@lru_cache(maxsize=1 << 16)
+def parse_date(text):
+    """Parse a 'DD MON YYYY' date the way strptime('%d %b %Y') would.
+    Returns (datetime, True), or (None, False) if the date is not valid."""
+    parts = text.split()
+    if len(parts) != 3:
+        return INVALID
+    day, month, year = parts
+
+    month = MONTHS.get(month.upper())
+    if month is None or not day.isdecimal() or not year.isdecimal():
+        return INVALID
+    if len(day) > 2 or len(year) != 4:
+        return INVALID
+
+    day = int(day)
+    year = int(year)
+    if year < datetime.MINYEAR or day < 1 or day > calendar.monthrange(year, month)[1]:
+        return INVALID
+    return datetime.datetime(year, month, day), True
+
+def add_months(date, months):
+    """date moved by whole months, the day clamped to the end of a shorter
+    month, as date + relativedelta(months=months) would"""
+    month = date.month - 1 + months
+    year = date.year + month // 12
+    month = month % 12 + 1
+    return date.replace(year=year, month=month, day=min(date.day, calendar.monthrange(year, month)[1]))
@@ -0,0 +1,174 @@
+"""diagnostics.py structured findings and the sinks that write them"""
+
+import datetime
+import json
+import sys
+from collections import Counter
+from contextlib import contextmanager
+
+MODES = ("text", "jsonl", "counts")
+
+def _arg(value):
+    # Dates are kept as the entity's own datetime and only formatted on output
+    if isinstance(value, datetime.datetime):
+        return value.strftime("%Y-%m-%d")
+    return value
+
+class Diagnostic():
+    """One finding. The message is a %-template formatted with args only
+    when the diagnostic is written, so collecting one costs a small object.
+    header is the prefix of the text form, e.g. Individual.error_header."""
+
+    __slots__ = ("header", "story", "id", "message", "args")
+
+    def __init__(self, header, story, id, message, args=()):
+        self.header = header
+        self.story = story
+        self.id = id
+        self.message = message
+        self.args = args
+
+    @property
+    def kind(self):
+        return "anomaly" if self.header.startswith("ANOMALY") else "error"
+
+    @property
+    def entity(self):
+        if "INDIVIDUAL" in self.header:
+            return "individual"
+        if "FAMILY" in self.header:
+            return "family"
+        return None
+
+    def text(self):
+        if not self.args:
+            return self.message
+        return self.message % tuple(_arg(arg) for arg in self.args)
+
+    def to_dict(self):
+        return { "kind": self.kind, "entity": self.entity, "story": self.story,
+                 "id": self.id, "message": self.text() }
+
+    def __str__(self):
+        parts = [part for part in (self.story, self.id) if part is not None]
+        parts.append(self.text())
+        return "%s %s" % (self.header, ": ".join(parts))
+
+    def __repr__(self):
+        return "Diagnostic(%r)" % str(self)
+
+class Sink():
+    """Writes diagnostics to stream (sys.stderr at the time of writing by
+    default) as text lines, JSON Lines, or only per story counts on close.
+    Lines are buffered and written every buffer_lines diagnostics. At most
+    limit diagnostics are written; the rest are only counted."""
+
+    def __init__(self, mode="text", limit=None, stream=None, buffer_lines=4096):
+        if mode not in MODES:
+            raise ValueError("Unknown diagnostics mode %s" % mode)
+        self.mode = mode
+        self.limit = limit
+        self.stream = stream
+        self.buffer_lines = buffer_lines
+        self.written = 0
+        self.dropped = 0
+        self.counts = Counter()
+        self._lines = []
+
+    @property
+    def full(self):
+        return self.limit is not None and self.written >= self.limit
+
+    def emit(self, diagnostic):
+        if self.mode == "counts":
+            self.counts[(diagnostic.story, diagnostic.kind)] += 1
+            return
+        if self.full:
+            self.dropped += 1
+            return
+        self.written += 1
+        if self.mode == "jsonl":
+            self._lines.append(json.dumps(diagnostic.to_dict()))
+        else:
+            self._lines.append(str(diagnostic))
+        if len(self._lines) >= self.buffer_lines:
+            self.flush()
+
+    def extend(self, diagnostics):
+        for diagnostic in diagnostics:
+            self.emit(diagnostic)
+
+    def flush(self):
+        if self._lines:
+            stream = self.stream if self.stream is not None else sys.stderr
+            self._lines.append("")
+            stream.write("\n".join(self._lines))
+            self._lines = []
+
+    def close(self):
+        if self.mode == "counts":
+            for (story, kind), count in sorted(self.counts.items(), key=lambda item: (str(item[0][0]), item[0][1])):
+                self._lines.append("%s %s: %d" % (story or "-", kind.upper(), count))
+        elif self.dropped or collector.exhausted:
+            if self.mode == "jsonl":
+                self._lines.append(json.dumps({ "truncated": True, "dropped": self.dropped }))
+            else:
+                self._lines.append("Stopped after %d diagnostics (--max-diagnostics)" % self.written)
+        self.flush()
+
+class Collector():
+    """Counts the findings the entities collect and caps them, so checks can stop early"""
+
+    def __init__(self, limit=None):
+        self.limit = limit
+        self.count = 0
+
+    def accept(self):
+        if self.limit is not None and self.count >= self.limit:
+            return False
+        self.count += 1
+        return True
+
+    @property
+    def exhausted(self):
+        return self.limit is not None and self.count >= self.limit
+
+class Recorder():
+    """Stand-in sink that keeps the diagnostics, e.g. to store them with a snapshot"""
+
+    def __init__(self):
+        self.diagnostics = []
+
+    def emit(self, diagnostic):
+        self.diagnostics.append(diagnostic)
+
+    def flush(self):
+        pass
+
+# The defaults write every diagnostic as soon as it is emitted and never stop
+sink = Sink(buffer_lines=1)
+collector = Collector()
+
+def configure(mode="text", limit=None):
+    """Install a buffered sink and a collector for a run; returns the sink"""
+    global sink, collector
+    sink = Sink(mode, limit)
+    collector = Collector(limit)
+    return sink
+
+def emit(diagnostic):
+    sink.emit(diagnostic)
+
+def flush():
+    sink.flush()
+
+@contextmanager
+def recording():
+    """Divert emitted diagnostics to a Recorder for the duration of the block"""
+    global sink
+    previous = sink
+    sink = Recorder()
+    try:
+        yield sink
+    finally:
+        sink = previous
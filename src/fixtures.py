@@ -0,0 +1,27 @@
+"""fixtures.py small linked trees the marriage story tests validate"""
+
+import rules
+from Family import Family
+from Individual import Individual
+
+def marriage_tree(marriages):
+    """Parents I0 and I1 with children I2 and I3, and I4 from outside the
+    family, then a family (id, husband, wife) for each of marriages, given
+    as indexes into the people. The tree is validated once it is linked."""
+    people = [Individual.instance_from_dict(info, validate=False) for info in (
+        { 'INDI': 'I0', 'NAME': 'Person /One', 'SEX': 'M', 'BIRT': '8 Jan 1952', 'FAM': 'F0' },
+        { 'INDI': 'I1', 'NAME': 'Person /Two', 'SEX': 'F', 'BIRT': '11 Aug 1953', 'FAM': 'F0' },
+        { 'INDI': 'I2', 'NAME': 'Pperson /One', 'SEX': 'F', 'BIRT': '23 Apr 1980', 'FAM': 'F0' },
+        { 'INDI': 'I3', 'NAME': 'Personn /One', 'SEX': 'M', 'BIRT': '20 Mar 1981', 'FAM': 'F0' },
+        { 'INDI': 'I4', 'NAME': 'Persona /Three', 'SEX': 'F', 'BIRT': '2 Feb 1982' })]
+    fams = [Family.instance_from_dict({ 'FAM': 'F0', 'HUSB': people[0], 'WIFE': people[1],
+                                         'MARR': '15 Mar 1975', 'CHIL': people[2:4] }, validate=False)]
+    for id, husband, wife in marriages:
+        fams.append(Family.instance_from_dict({ 'FAM': id, 'HUSB': people[husband], 'WIFE': people[wife],
+                                                'MARR': '15 Jul 2005' }, validate=False))
+    rules.validate_all(people, fams)
+    return people, fams
+
+def anomalies(story, entities):
+    """The anomalies of a story among entities, as printed"""
+    return [anomaly for entity in entities for anomaly in entity.anomalies if story in anomaly]
@@ -0,0 +1,257 @@
+"""gedcom.py streaming GEDCOM record reader"""
+
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+valid_tags = { 0: ["INDI", "FAM", "HEAD", "RLR", "NOTE", "TRLR"],
+               1: ["NAME", "SEX", "BIRT", "DEAT", "FAMC", "FAMS", "MARR", "HUSB", "WIFE", "CHIL", "DIV"],
+               2: ["DATE"]
+            }
+
+# Level 1 events whose value comes from their level 2 DATE line
+date_tags = ("BIRT", "DEAT", "MARR", "DIV")
+
+def validate(level, tag):
+    return level in valid_tags.keys() and tag in valid_tags[level]
+
+def process_tag(level, curr_dict, tag, arg):
+    if tag == 'INDI':
+        curr_dict = {'INDI': arg}
+    else:
+        if tag == "FAMS" or tag == "FAMC" or tag == "CHIL":
+            if tag == "FAMS" or tag == "FAMC":
+                tag = "FAM"
+            arg = [arg]
+
+            if tag in curr_dict:
+                curr_dict[tag] += arg
+            else:
+                curr_dict[tag] = arg
+        elif arg != '':
+            curr_dict[tag] = arg
+
+class Record():
+    """One GEDCOM line together with the lines nested below it"""
+
+    def __init__(self, level, tag, value="", xref=None):
+        self.level = level
+        self.tag = tag
+        self.value = value
+        self.xref = xref
+        self.children = []
+
+    def find(self, tag):
+        for child in self.children:
+            if child.tag == tag:
+                return child
+        return None
+
+    def __repr__(self):
+        return "Record(%d, %s, %s, %r, %d children)" % (self.level, self.xref, self.tag, self.value, len(self.children))
+
+def tokenize(line):
+    """Split a GEDCOM line into (level, xref, tag, value), or None for a blank line"""
+    line_splt = line.split()
+    if len(line_splt) < 2:
+        return None
+
+    level = int(line_splt[0])
+    if line_splt[1].startswith('@') and len(line_splt) > 2:
+        return level, line_splt[1], line_splt[2], ' '.join(line_splt[3:])
+    return level, None, line_splt[1], ' '.join(line_splt[2:])
+
+def iter_records(file):
+    """Yield each level 0 record of a GEDCOM file as soon as it is complete.
+    Only the record being assembled is held in memory."""
+    record = None
+    stack = []
+
+    with open(file, "r") as f:
+        for line in f:
+            token = tokenize(line)
+            if token is None:
+                continue
+            level, xref, tag, value = token
+
+            if level == 0:
+                if record is not None:
+                    yield record
+                record = Record(level, tag, value, xref)
+                stack = [record]
+                continue
+            if record is None:
+                continue
+
+            while len(stack) > 1 and stack[-1].level >= level:
+                stack.pop()
+            node = Record(level, tag, value, xref)
+            stack[-1].children.append(node)
+            stack.append(node)
+
+    if record is not None:
+        yield record
+
+def record_to_dict(record):
+    """Flatten an INDI or FAM record into the dict read by instance_from_dict"""
+    info = {record.tag: record.xref}
+
+    for sub in record.children:
+        if not validate(sub.level, sub.tag):
+            continue
+        value = sub.value
+        if sub.tag in date_tags:
+            date = sub.find("DATE")
+            if date is not None:
+                value = date.value
+        process_tag(sub.level, info, sub.tag, value)
+    return info
+
+def iter_dicts(file):
+    """Yield (tag, xref, dict) for every INDI and FAM record of a file"""
+    for record in iter_records(file):
+        if record.tag == "INDI" or record.tag == "FAM":
+            yield record.tag, record.xref, record_to_dict(record)
+
+# Tags looked up straight from the mapped bytes, per level
+_kept_tags = dict((level, dict((tag.encode(), tag) for tag in tags)) for level, tags in valid_tags.items())
+_space = b' \t\r'
+
+def _token(mm, pos, end):
+    """Bounds of the next space or tab separated token in mm[pos:end]"""
+    while pos < end and (mm[pos] == 32 or mm[pos] == 9):
+        pos += 1
+    stop = mm.find(b' ', pos, end)
+    if stop < 0:
+        stop = end
+    tab = mm.find(b'\t', pos, stop)
+    if tab >= 0:
+        stop = tab
+    return pos, stop
+
+def _value(mm, pos, end):
+    if pos >= end:
+        return ''
+    return b' '.join(mm[pos:end].split()).decode('utf-8')
+
+def iter_dicts_mmap(file, start=0, stop=None):
+    """Yield the same records as iter_dicts from a memory mapped file.
+    Lines are tokenized in place and only the values kept in the dicts
+    (xrefs, NAME, SEX, dates) are ever decoded. start and stop limit the
+    scan to a byte range that begins on a record boundary."""
+    with open(file, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            mv = memoryview(mm)
+            try:
+                yield from _scan(mm, mv, start, len(mm) if stop is None else stop)
+            finally:
+                mv.release()
+
+def _scan(mm, mv, pos, size):
+    if pos == 0 and mm[:3] == b'\xef\xbb\xbf':
+        pos = 3
+    rec_tag = None
+    info = None
+    levels = []
+    event = None
+
+    while pos < size:
+        end = mm.find(b'\n', pos, size)
+        if end < 0:
+            end = size
+        line_end = end
+        while line_end > pos and mm[line_end - 1] in _space:
+            line_end -= 1
+        a, b = _token(mm, pos, line_end)
+        pos = end + 1
+        if a == b:
+            continue
+        level = int(mm[a:b])
+        tag_a, tag_b = _token(mm, b, line_end)
+        if tag_a == tag_b:
+            continue
+        xref = None
+        if mm[tag_a] == 64:
+            c, d = _token(mm, tag_b, line_end)
+            if c < d:
+                xref = (tag_a, tag_b)
+                tag_a, tag_b = c, d
+        depth = 0
+
+        if level != 0:
+            while levels and levels[-1] >= level:
+                levels.pop()
+            depth = len(levels)
+            levels.append(level)
+
+        # A level 1 event is complete once the next sibling or record starts
+        if event is not None and depth == 0:
+            process_tag(1, info, event[0], event[1] if event[1] is not None else _value(mm, event[2], event[3]))
+            event = None
+
+        if level == 0:
+            if rec_tag is not None:
+                yield rec_tag, info[rec_tag], info
+            rec_tag = None
+            levels = []
+            kind = mv[tag_a:tag_b]
+            if kind == b'INDI' or kind == b'FAM':
+                rec_tag = "INDI" if kind == b'INDI' else "FAM"
+                info = {rec_tag: None if xref is None else mm[xref[0]:xref[1]].decode('utf-8')}
+            continue
+        if rec_tag is None:
+            continue
+
+        if depth == 0:
+            tag = _kept_tags.get(level, {}).get(mv[tag_a:tag_b])
+            if tag is None:
+                continue
+            if tag in date_tags:
+                event = [tag, None, tag_b, line_end]
+            else:
+                process_tag(level, info, tag, _value(mm, tag_b, line_end))
+        elif depth == 1 and event is not None and event[1] is None and mv[tag_a:tag_b] == b'DATE':
+            event[1] = _value(mm, tag_b, line_end)
+
+    if event is not None:
+        process_tag(1, info, event[0], event[1] if event[1] is not None else _value(mm, event[2], event[3]))
+    if rec_tag is not None:
+        yield rec_tag, info[rec_tag], info
+
+def chunk_bounds(file, jobs):
+    """Split a file into at most jobs byte ranges, each starting on a level 0 line"""
+    size = os.path.getsize(file)
+    if size == 0:
+        return []
+
+    bounds = [0]
+    with open(file, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for i in range(1, jobs):
+                target = max(size * i // jobs, bounds[-1])
+                pos = mm.find(b'\n0 ', target)
+                if pos < 0:
+                    break
+                if pos + 1 > bounds[-1]:
+                    bounds.append(pos + 1)
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def _parse_chunk(args):
+    file, start, stop = args
+    return list(iter_dicts_mmap(file, start, stop))
+
+def iter_dicts_parallel(file, jobs):
+    """Yield the same records as iter_dicts, tokenizing chunks of the file in
+    jobs worker processes. Records come back in file order, so duplicate ids
+    are detected by the caller exactly as in a serial parse."""
+    chunks = [(file, start, stop) for start, stop in chunk_bounds(file, jobs)]
+    if len(chunks) <= 1:
+        yield from iter_dicts_mmap(file)
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for records in pool.map(_parse_chunk, chunks):
+            yield from records
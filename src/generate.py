@@ -0,0 +1,460 @@
+#!/usr/bin/env python
+"""generate.py synthetic GEDCOM trees with injected user story violations"""
+
+import argparse
+import datetime
+import json
+import random
+import sys
+
+import dates
+
+MALE_NAMES = ["James", "John", "Robert", "Michael", "William", "David", "Richard", "Joseph", "Thomas", "Charles",
+              "Daniel", "Matthew", "Anthony", "Mark", "Donald", "Steven", "Paul", "Andrew", "Joshua", "Kenneth",
+              "Kevin", "Brian", "George", "Edward", "Ronald", "Timothy", "Jason", "Jeffrey", "Ryan", "Jacob"]
+FEMALE_NAMES = ["Mary", "Patricia", "Jennifer", "Linda", "Elizabeth", "Barbara", "Susan", "Jessica", "Sarah", "Karen",
+                "Nancy", "Lisa", "Betty", "Margaret", "Sandra", "Ashley", "Kimberly", "Emily", "Donna", "Michelle",
+                "Dorothy", "Carol", "Amanda", "Melissa", "Deborah", "Stephanie", "Rebecca", "Sharon", "Laura", "Cynthia"]
+SURNAMES = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+            "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin",
+            "Lee", "Perez", "Thompson", "White", "Harris", "Sanchez", "Clark", "Ramirez", "Lewis", "Robinson",
+            "Walker", "Young", "Allen", "King", "Wright", "Scott", "Torres", "Nguyen", "Hill", "Flores"]
+MONTHS = ["JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"]
+
+# Stories the validator checks and the generator can break on purpose.
+# US26-US35 are listings or reminders, not violations.
+STORIES = ["US%02d" % n for n in range(1, 26)]
+
+def gedcom_date(date):
+    return "%d %s %d" % (date.day, MONTHS[date.month - 1], date.year)
+
+def shift(date, years=0, months=0, days=0):
+    """date moved by whole years and months (day of month kept, at most 28) and then days"""
+    month = date.month - 1 + months
+    year = date.year + years + month // 12
+    return datetime.date(year, month % 12 + 1, min(date.day, 28)) + datetime.timedelta(days=days)
+
+class Person():
+    __slots__ = ("id", "given", "surname", "sex", "bday", "death", "famc", "fams", "last_event", "bad_date")
+
+    def __init__(self, id, given, surname, sex, bday):
+        self.id = id
+        self.given = given
+        self.surname = surname
+        self.sex = sex
+        self.bday = bday
+        self.death = None
+        self.famc = None
+        self.fams = []
+        self.last_event = bday
+        self.bad_date = None
+
+class Couple():
+    __slots__ = ("id", "husband", "wife", "married", "divorced", "children")
+
+    def __init__(self, id, husband, wife, married, divorced=None):
+        self.id = id
+        self.husband = husband
+        self.wife = wife
+        self.married = married
+        self.divorced = divorced
+        self.children = []
+
+class Generator():
+    """Writes clans of families generation by generation, so only one
+    generation is held in memory, with violation scenarios in between.
+    Clean records are built to pass every check except the US31/US32
+    reminders, though in large trees two people may share a name and
+    birthday (US23) by chance."""
+
+    def __init__(self, out, individuals=1000, family_size=2.5, marriage_rate=0.8, divorce_rate=0.15,
+                 depth=5, rates=None, seed=0, as_of=None):
+        self.out = out
+        self.individuals = individuals
+        self.family_size = family_size
+        self.marriage_rate = marriage_rate
+        self.divorce_rate = divorce_rate
+        self.depth = depth
+        self.rates = rates if rates is not None else {}
+        self.rng = random.Random(seed)
+        self.today = as_of if as_of is not None else dates.clock.day
+
+        self.people = 0
+        self.families = 0
+        self.expected = []
+        self._clean = 0
+
+    # Records
+
+    def person(self, sex, bday, surname=None, given=None):
+        self.people += 1
+        if given is None:
+            given = self.rng.choice(MALE_NAMES if sex == 'M' else FEMALE_NAMES)
+        if surname is None:
+            surname = self.rng.choice(SURNAMES)
+        return Person("@I%d@" % self.people, given, surname, sex, bday)
+
+    def couple(self, husband, wife, married, divorced=None):
+        self.families += 1
+        couple = Couple("@F%d@" % self.families, husband, wife, married, divorced)
+        for spouse in (husband, wife):
+            spouse.fams.append(couple.id)
+            spouse.last_event = max(spouse.last_event, divorced or married)
+        return couple
+
+    def child(self, couple, bday, sex=None, given=None, surname=None):
+        if sex is None:
+            sex = self.rng.choice("MF")
+        if given is None:
+            taken = set(child.given for child in couple.children)
+            names = [name for name in (MALE_NAMES if sex == 'M' else FEMALE_NAMES) if name not in taken]
+            given = self.rng.choice(names)
+        kid = self.person(sex, bday, couple.husband.surname if surname is None else surname, given)
+        kid.famc = couple.id
+        couple.children.append(kid)
+        for parent in (couple.husband, couple.wife):
+            parent.last_event = max(parent.last_event, bday)
+        return kid
+
+    def write_person(self, person):
+        lines = ["0 %s INDI\n" % person.id, "1 NAME %s /%s/\n" % (person.given, person.surname),
+                 "1 SEX %s\n" % person.sex, "1 BIRT\n",
+                 "2 DATE %s\n" % (person.bad_date or gedcom_date(person.bday))]
+        if person.death is not None:
+            lines.append("1 DEAT Y\n2 DATE %s\n" % gedcom_date(person.death))
+        if person.famc is not None:
+            lines.append("1 FAMC %s\n" % person.famc)
+        for fam in person.fams:
+            lines.append("1 FAMS %s\n" % fam)
+        self.out.write("".join(lines))
+
+    def write_couple(self, couple):
+        lines = ["0 %s FAM\n" % couple.id, "1 HUSB %s\n" % couple.husband.id, "1 WIFE %s\n" % couple.wife.id]
+        lines.extend("1 CHIL %s\n" % child.id for child in couple.children)
+        lines.append("1 MARR\n2 DATE %s\n" % gedcom_date(couple.married))
+        if couple.divorced is not None:
+            lines.append("1 DIV\n2 DATE %s\n" % gedcom_date(couple.divorced))
+        self.out.write("".join(lines))
+
+    def write(self, people=(), couples=()):
+        for person in people:
+            self.write_person(person)
+        for couple in couples:
+            self.write_couple(couple)
+
+    def expect(self, story, id):
+        self.expected.append({"story": story, "id": id})
+
+    # Clean trees
+
+    def random_date(self, start, years):
+        return start + datetime.timedelta(days=self.rng.randrange(max(int(years * 365), 1)))
+
+    def children_count(self):
+        # Poisson by inversion, at most 8 so the parents' ages stay plausible
+        limit = pow(2.718281828459045, -self.family_size)
+        count, product = 0, self.rng.random()
+        while product > limit and count < 8:
+            count += 1
+            product *= self.rng.random()
+        return count
+
+    def set_death(self, person):
+        # Only the old die, and never before their last marriage, divorce or child
+        age = self.today.year - person.bday.year
+        if age < 70 or self.rng.random() > (age - 60) / 40.0:
+            if age < 100:
+                return
+        earliest = max(shift(person.last_event, 1), shift(person.bday, 60))
+        latest = min(shift(person.bday, 100), self.today - datetime.timedelta(days=1))
+        if earliest > latest:
+            if earliest >= self.today:
+                return
+            latest = earliest
+        person.death = earliest + datetime.timedelta(days=self.rng.randrange((latest - earliest).days + 1))
+
+    def marry(self, person, married, children, next_gen):
+        sex = 'F' if person.sex == 'M' else 'M'
+        spouse_bday = self.random_date(shift(person.bday, -4), 8)
+        spouse_bday = min(spouse_bday, shift(married, -18))
+        spouse = self.person(sex, spouse_bday)
+        husband, wife = (person, spouse) if person.sex == 'M' else (spouse, person)
+        couple = self.couple(husband, wife, married)
+
+        # Every child comes at least a year after the last, on the same day of
+        # the month, so no two are within 8 months (US13) or 2 days (US14)
+        day = self.rng.randint(1, 28)
+        bday = shift(married.replace(day=day), 1, self.rng.randrange(12))
+        for _ in range(children):
+            if bday >= self.today or bday > shift(wife.bday, 44) or self.people >= self.individuals:
+                break
+            next_gen.append(self.child(couple, bday))
+            bday = shift(bday, self.rng.randint(1, 3), self.rng.randrange(12))
+
+        if self.rng.random() < self.divorce_rate:
+            divorced = self.random_date(shift(max(married, husband.last_event, wife.last_event), 1), 5)
+            if divorced < self.today:
+                couple.divorced = divorced
+                for partner in (husband, wife):
+                    partner.last_event = max(partner.last_event, divorced)
+        return spouse, couple
+
+    def clan(self):
+        base = shift(self.today, -(self.depth * 30 + 25))
+        founder = self.person(self.rng.choice("MF"), self.random_date(base, 20))
+        gen = [founder]
+        for level in range(self.depth):
+            next_gen = []
+            spouses = []
+            couples = []
+            for person in gen:
+                married = self.random_date(shift(person.bday, 18), 17)
+                while (married < self.today and self.people + 1 < self.individuals
+                       and self.rng.random() < self.marriage_rate):
+                    children = self.children_count() if level < self.depth - 1 else 0
+                    spouse, couple = self.marry(person, married, children, next_gen)
+                    spouses.append(spouse)
+                    couples.append(couple)
+                    if couple.divorced is None:
+                        break
+                    married = self.random_date(shift(couple.divorced, 1), 3)
+
+            for person in gen + spouses:
+                self.set_death(person)
+            self.write(gen + spouses, couples)
+            gen = next_gen
+            if not gen:
+                break
+
+    # Violations, each an isolated group of records with known findings
+
+    def old(self, sex, year=None, **kwargs):
+        year = self.today.year - 60 - self.rng.randrange(10) if year is None else year
+        return self.person(sex, datetime.date(year, self.rng.randint(1, 12), self.rng.randint(1, 28)), **kwargs)
+
+    def parents(self, year):
+        husband = self.old('M', year)
+        wife = self.old('F', year, surname=self.rng.choice(SURNAMES))
+        return husband, wife, self.couple(husband, wife, shift(max(husband.bday, wife.bday), 25))
+
+    def violate(self, story):
+        year = self.today.year - 60 - self.rng.randrange(10)
+        people = []
+        couples = []
+
+        if story == "US01":
+            person = self.person(self.rng.choice("MF"), self.random_date(self.today + datetime.timedelta(days=60), 20))
+            people = [person]
+            self.expect("US01", person.id)
+        elif story == "US03":
+            person = self.old(self.rng.choice("MF"))
+            person.death = shift(person.bday, -5)
+            people = [person]
+            self.expect("US03", person.id)
+        elif story == "US07":
+            person = self.old(self.rng.choice("MF"), self.today.year - 160 - self.rng.randrange(20))
+            people = [person]
+            self.expect("US07", person.id)
+        elif story == "US22":
+            person = self.old(self.rng.choice("MF"))
+            people = [person, Person(person.id, "Clone", person.surname, person.sex, person.bday)]
+            self.expect("US22", person.id)
+        elif story == "US23":
+            person = self.old(self.rng.choice("MF"))
+            twin = self.person(person.sex, person.bday, person.surname, person.given)
+            people = [person, twin]
+            self.expect("US23", twin.id)
+        elif story == "US24":
+            person = self.old(self.rng.choice("MF"))
+            person.bad_date = "30 FEB %d" % person.bday.year
+            people = [person]
+            self.expect("US24", person.id)
+        elif story in ("US17", "US18", "US19", "US20"):
+            people, couples = self.relatives(story, year)
+        else:
+            husband, wife, couple = self.parents(year)
+            people = [husband, wife]
+            couples = [couple]
+            married = couple.married
+
+            if story == "US02":
+                wife.bday = shift(married, 1)
+                self.expect("US10", couple.id)
+            elif story == "US04":
+                couple.divorced = shift(married, -2)
+            elif story == "US05":
+                husband.death = shift(married, -3)
+            elif story == "US06":
+                wife.death = shift(married, 5)
+                couple.divorced = shift(married, 10)
+            elif story == "US08":
+                people.append(self.child(couple, shift(married, -1)))
+            elif story == "US09":
+                wife.death = shift(married, 5)
+                people.append(self.child(couple, shift(married, 6)))
+            elif story == "US10":
+                husband.bday = shift(married, -12)
+            elif story == "US11":
+                wife.bday = shift(married, -45)
+                people.append(self.child(couple, shift(wife.bday, 65)))
+            elif story == "US12":
+                if self.rng.random() < 0.5:
+                    husband.bday = shift(married, -60)
+                    people.append(self.child(couple, shift(husband.bday, 85)))
+                else:
+                    # Bigamy: a second marriage without ending the first
+                    other = self.old('F', year)
+                    second = self.couple(husband, other, shift(married, 5))
+                    people.append(other)
+                    couples.append(second)
+                    couple = second
+            elif story == "US13":
+                first = shift(married, 2)
+                people.append(self.child(couple, first))
+                people.append(self.child(couple, shift(first, 0, 3, 5)))
+            elif story == "US14":
+                bday = shift(married, 2)
+                for _ in range(5):
+                    people.append(self.child(couple, bday))
+            elif story == "US15":
+                bday = shift(married, 1)
+                for _ in range(15):
+                    people.append(self.child(couple, bday))
+                    bday = shift(bday, 1, 1)
+            elif story == "US16":
+                people.append(self.child(couple, shift(married, 2), 'M', surname=self.rng.choice(
+                    [name for name in SURNAMES if name != husband.surname])))
+            elif story == "US21":
+                husband.sex = 'F'
+            elif story == "US25":
+                first = self.child(couple, shift(married, 2), 'M')
+                people.append(first)
+                people.append(self.child(couple, shift(married, 4), 'M', given=first.given))
+            self.expect(story, couple.id)
+
+        self.write(people, couples)
+
+    def relatives(self, story, year):
+        """Two generations from one couple, then the forbidden marriage"""
+        grandpa, grandma, top = self.parents(year - 50)
+        people = [grandpa, grandma]
+        couples = [top]
+        first = shift(top.married, 2)
+        a = self.child(top, first, 'M')
+        b = self.child(top, shift(first, 2), 'F' if story != "US20" else 'M')
+        people += [a, b]
+
+        if story == "US17":
+            # A father marries his daughter after divorcing her mother
+            spouse = self.old('F', a.bday.year)
+            fam = self.couple(a, spouse, shift(a.bday, 25), shift(a.bday, 40))
+            daughter = self.child(fam, shift(a.bday, 27), 'F')
+            incest = self.couple(a, daughter, shift(daughter.bday, 20))
+            people += [spouse, daughter]
+            couples += [fam, incest]
+            self.expect("US17", incest.id)
+            self.expect("US17", a.id)
+        elif story == "US18":
+            incest = self.couple(a, b, shift(b.bday, 20))
+            couples.append(incest)
+            self.expect("US18", incest.id)
+        elif story == "US19":
+            wife_a = self.old('F', a.bday.year)
+            husband_b = self.old('M', b.bday.year)
+            fam_a = self.couple(a, wife_a, shift(b.bday, 20))
+            fam_b = self.couple(husband_b, b, shift(b.bday, 20))
+            cousin_a = self.child(fam_a, shift(fam_a.married, 2), 'M')
+            cousin_b = self.child(fam_b, shift(fam_b.married, 2), 'F')
+            incest = self.couple(cousin_a, cousin_b, shift(cousin_a.bday, 22))
+            people += [wife_a, husband_b, cousin_a, cousin_b]
+            couples += [fam_a, fam_b, incest]
+            self.expect("US19", incest.id)
+        else:
+            wife_a = self.old('F', a.bday.year)
+            fam_a = self.couple(a, wife_a, shift(b.bday, 20))
+            niece = self.child(fam_a, shift(fam_a.married, 2), 'F')
+            incest = self.couple(b, niece, shift(niece.bday, 20))
+            people += [wife_a, niece]
+            couples += [fam_a, incest]
+            self.expect("US20", incest.id)
+        return people, couples
+
+    # Driver
+
+    def violations(self):
+        pending = []
+        for story in STORIES:
+            pending += [story] * int(round(self.rates.get(story, 0) * self.individuals))
+        self.rng.shuffle(pending)
+        return pending
+
+    def run(self):
+        pending = self.violations()
+        total = len(pending)
+        self.out.write("0 HEAD\n1 NOTE generated by generate.py\n")
+        while self.people < self.individuals:
+            self.clan()
+            # Spread the violations through the file in proportion to the clean records
+            due = total - total * max(self.individuals - self.people, 0) // max(self.individuals, 1)
+            while total - len(pending) < due:
+                self.violate(pending.pop())
+        while pending:
+            self.violate(pending.pop())
+        self.out.write("0 TRLR\n")
+
+    def manifest(self, seed=None):
+        return { "seed": seed, "as_of": self.today.isoformat(), "individuals": self.people,
+                 "families": self.families, "rates": self.rates, "expected": self.expected }
+
+def generate(path, manifest_path=None, seed=0, violation_rate=0.0, rates=None, **options):
+    """Write a synthetic tree to path and its manifest of expected findings
+    to manifest_path (path + '.manifest.json' by default). violation_rate
+    applies to every story in STORIES, rates overrides single stories;
+    both are violations per clean individual. Returns the manifest."""
+    story_rates = dict((story, violation_rate) for story in STORIES)
+    story_rates.update(rates or {})
+
+    with open(path, "w", buffering=1 << 20) as out:
+        generator = Generator(out, rates=story_rates, seed=seed, **options)
+        generator.run()
+
+    manifest = generator.manifest(seed)
+    with open(manifest_path or path + ".manifest.json", "w") as f:
+        json.dump(manifest, f, indent=1)
+    return manifest
+
+def parse_rate(text):
+    story, _, rate = text.partition("=")
+    if story.upper() not in STORIES:
+        raise argparse.ArgumentTypeError("unknown user story %s" % story)
+    return story.upper(), float(rate)
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Write a synthetic GEDCOM tree with injected violations")
+    parser.add_argument("file", help="GEDCOM file to write")
+    parser.add_argument("--individuals", type=int, default=1000, help="clean individuals to generate")
+    parser.add_argument("--family-size", type=float, default=2.5, help="mean children per couple")
+    parser.add_argument("--marriage-rate", type=float, default=0.8)
+    parser.add_argument("--divorce-rate", type=float, default=0.15)
+    parser.add_argument("--depth", type=int, default=5, help="generations per clan")
+    parser.add_argument("--violation-rate", type=float, default=0.001,
+                        help="violations of each story per clean individual")
+    parser.add_argument("--rate", type=parse_rate, action="append", default=[], metavar="US13=0.01",
+                        help="violation rate of one story")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--as-of", type=datetime.date.fromisoformat, metavar="YYYY-MM-DD",
+                        help="reference date of the tree, today by default; validate with the same --as-of")
+    parser.add_argument("--manifest", metavar="PATH", help="manifest to write, FILE.manifest.json by default")
+    return parser.parse_args(argv)
+
+def main(argv):
+    args = parse_args(argv)
+    manifest = generate(args.file, args.manifest, seed=args.seed, violation_rate=args.violation_rate,
+                        rates=dict(args.rate), individuals=args.individuals, family_size=args.family_size,
+                        marriage_rate=args.marriage_rate, divorce_rate=args.divorce_rate, depth=args.depth,
+                        as_of=args.as_of)
+    print("%d individuals, %d families, %d expected findings" %
+          (manifest["individuals"], manifest["families"], len(manifest["expected"])))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,105 @@
+"""incremental.py revalidation of only the entities an edit of a file touched"""
+
+import hashlib
+import os
+import cache
+import dates
+import rules
+
+def state_key(file, options=""):
+    """Key of a file's state by its path rather than its content, so a run
+    finds the state the previous run of the same file left behind"""
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(("incremental:%d:%s:%s:%s" % (cache.CACHE_VERSION, dates.clock.day.isoformat(), options,
+                                                os.path.abspath(file))).encode())
+    return digest.hexdigest()
+
+def first_records(records):
+    """{(tag, xref): info} of the records a tree is built from: the first
+    of each id, as in Project3.read_records"""
+    found = {}
+    for tag, xref, info in records:
+        found.setdefault((tag, xref), info)
+    return found
+
+def _ids(people):
+    return tuple(p.id for p in people)
+
+def _members(fam):
+    return (fam.husband.id, fam.wife.id, _ids(fam.children))
+
+def _copy(found):
+    return None if not found else list(found)
+
+def capture(records, individuals, families):
+    """State to diff the next run against: the records, how the entities
+    were linked and the findings of the individual and family rules. Take
+    it before the whole-tree rules add their findings to the same lists."""
+    people = dict((indiv.id, (_ids(indiv.spouses), frozenset(_ids(indiv.children)),
+                              _copy(indiv._errors), _copy(indiv._anomalies))) for indiv in individuals)
+    fams = dict((fam.id, (_members(fam), _copy(fam._errors), _copy(fam._anomalies))) for fam in families)
+    return { "records": records, "people": people, "families": fams }
+
+def dirty(state, records, individuals, families):
+    """(individuals, families) whose rules must run again after the edit
+    from state to records: new ones, those whose record or links changed,
+    families with such a member, and for the kinship rules everyone married
+    to a person whose ancestors changed, i.e. a descendant of an added or
+    removed parent link"""
+    old_records = state["records"]
+    old_people = state["people"]
+    old_families = state["families"]
+
+    changed = set()
+    moved = set()
+    for indiv in individuals:
+        before = old_people.get(indiv.id)
+        if (before is None or before[0] != _ids(indiv.spouses)
+                or old_records.get(("INDI", indiv.id)) != records.get(("INDI", indiv.id))):
+            changed.add(indiv.id)
+        moved.update(frozenset(_ids(indiv.children)).symmetric_difference(() if before is None else before[1]))
+    present = set(indiv.id for indiv in individuals)
+    for id, before in old_people.items():
+        if id not in present:
+            moved.update(before[1])
+
+    # A removed parent link was also a path to the descendants it reached,
+    # and those paths still run through the link's child in the new tree
+    children = dict((indiv.id, indiv.children) for indiv in individuals)
+    affected = set()
+    stack = list(moved)
+    while stack:
+        id = stack.pop()
+        if id not in affected:
+            affected.add(id)
+            stack.extend(child.id for child in children.get(id, ()))
+
+    dirty_people = [indiv for indiv in individuals
+                    if indiv.id in changed or any(spouse.id in affected for spouse in indiv.spouses)]
+    dirty_families = []
+    for fam in families:
+        before = old_families.get(fam.id)
+        members = _members(fam)
+        if (before is None or before[0] != members
+                or old_records.get(("FAM", fam.id)) != records.get(("FAM", fam.id))
+                or fam.husband.id in affected or fam.wife.id in affected
+                or any(id in changed for id in members[:2] + members[2])):
+            dirty_families.append(fam)
+    return dirty_people, dirty_families
+
+def revalidate(state, records, individuals, families):
+    """Give the entities the edit left alone their findings from state and
+    run the individual and family rules on the others. The whole-tree rules
+    are left to the caller. Returns the entities that were revalidated."""
+    dirty_people, dirty_families = dirty(state, records, individuals, families)
+    for entities, saved, stale in ((individuals, state["people"], dirty_people),
+                                   (families, state["families"], dirty_families)):
+        stale = set(id(entity) for entity in stale)
+        for entity in entities:
+            if id(entity) not in stale:
+                before = saved[entity.id]
+                entity._errors = _copy(before[-2])
+                entity._anomalies = _copy(before[-1])
+
+    rules.validate_entities(dirty_people, dirty_families, (individuals, families))
+    return dirty_people, dirty_families
@@ -0,0 +1,225 @@
+"""kinship.py parent/child graph queries shared by the consanguinity rules (US17-US20)"""
+
+from collections import defaultdict
+
+# How far up the marriage rules look: US18-US20 need no more than a
+# grandparent on each side, and anything up to this depth may be closer
+RULE_DEPTH = 4
+
+class Kinship():
+    """Parent/child graph of a whole tree, built once after linking.
+    Ancestor sets are memoized and every walk tolerates cyclic bad data.
+    The rules only memoize ancestors up to RULE_DEPTH generations, so
+    full depth maps are kept only for people a relationship was asked of."""
+
+    def __init__(self, individuals):
+        self.parent_ids = defaultdict(set)
+        self.child_ids = defaultdict(set)
+        for indiv in individuals:
+            for child in indiv.children:
+                if child.id != indiv.id:
+                    self.parent_ids[child.id].add(indiv.id)
+                    self.child_ids[indiv.id].add(child.id)
+
+        self._ancestors = {}
+        self._depths = {}
+        self._near = {}
+        self.generation, self.cyclic = self._generations(individuals)
+
+    def _generations(self, individuals):
+        # Kahn's algorithm from the founders down: a person's generation is one
+        # more than their youngest parent's. People on a cycle are never reached.
+        ids = set(indiv.id for indiv in individuals) | set(self.parent_ids) | set(self.child_ids)
+        waiting = dict((id, len(self.parent_ids.get(id, ()))) for id in ids)
+        generation = dict((id, 0) for id, count in waiting.items() if count == 0)
+        queue = list(generation)
+
+        while queue:
+            id = queue.pop()
+            for child in self.child_ids.get(id, ()):
+                generation[child] = max(generation.get(child, 0), generation[id] + 1)
+                waiting[child] -= 1
+                if waiting[child] == 0:
+                    queue.append(child)
+        return generation, ids - set(generation)
+
+    def parents(self, id):
+        return self.parent_ids.get(id, frozenset())
+
+    def grandparents(self, id):
+        found = set()
+        for parent in self.parents(id):
+            found |= self.parents(parent)
+        return found
+
+    def ancestors(self, id):
+        found = self._ancestors.get(id)
+        if found is not None:
+            return found
+
+        found = set()
+        stack = list(self.parents(id))
+        while stack:
+            ancestor = stack.pop()
+            if ancestor in found:
+                continue
+            found.add(ancestor)
+            known = self._ancestors.get(ancestor)
+            if known is not None:
+                found |= known
+            else:
+                stack.extend(self.parents(ancestor))
+
+        found = frozenset(found)
+        self._ancestors[id] = found
+        return found
+
+    def is_ancestor(self, ancestor, id):
+        older = self.generation.get(ancestor)
+        younger = self.generation.get(id)
+        if older is not None and younger is not None and older >= younger:
+            return False
+        return ancestor in self.ancestors(id)
+
+    def ancestor_depths(self, id, limit=None):
+        """Map of id and each of its ancestors to the fewest generations up to
+        them, or only those at most limit generations up"""
+        memo = self._depths if limit is None else self._near
+        depths = memo.get(id)
+        if depths is not None:
+            return depths
+
+        depths = {id: 0}
+        level = [id]
+        distance = 0
+        while level and distance != limit:
+            distance += 1
+            next_level = []
+            for person in level:
+                for parent in self.parents(person):
+                    if parent not in depths:
+                        depths[parent] = distance
+                        next_level.append(parent)
+            level = next_level
+
+        memo[id] = depths
+        return depths
+
+    def relationship(self, a, b):
+        """Relationship of a to b through their closest common ancestor,
+        or None when they share no ancestor"""
+        return closest(a, b, self.ancestor_depths(a), self.ancestor_depths(b))
+
+    def near_relationship(self, a, b):
+        """relationship as far as the marriage rules look, None when a and b
+        share no ancestor within RULE_DEPTH generations"""
+        return closest(a, b, self.ancestor_depths(a, RULE_DEPTH), self.ancestor_depths(b, RULE_DEPTH))
+
+    def siblings(self, a, b):
+        """a and b share a parent"""
+        relation = self.near_relationship(a, b)
+        return relation is not None and relation.siblings
+
+    def first_cousins(self, a, b):
+        relation = self.near_relationship(a, b)
+        return relation is not None and relation.first_cousins
+
+    def aunt_or_uncle(self, a, b):
+        """a is a sibling of one of b's parents"""
+        relation = self.near_relationship(a, b)
+        return relation is not None and relation.aunt_or_uncle
+
+def closest(a, b, depths_a, depths_b):
+    """Relationship of a to b given the ancestor_depths of each, or None.
+    Maps cut off at some depth still give the right relationship when it
+    is no further than that from either of them."""
+    if len(depths_b) < len(depths_a):
+        smaller, larger = depths_b, depths_a
+    else:
+        smaller, larger = depths_a, depths_b
+
+    best = None
+    for ancestor, depth in smaller.items():
+        other = larger.get(ancestor)
+        if other is None:
+            continue
+        up, down = (depth, other) if smaller is depths_a else (other, depth)
+        key = (up + down, abs(up - down), ancestor)
+        if best is None or key < best[0]:
+            best = (key, ancestor, up, down)
+
+    if best is None:
+        return None
+    return Relationship(a, b, best[1], best[2], best[3])
+
+_ordinals = ["zeroth", "first", "second", "third", "fourth", "fifth", "sixth", "seventh", "eighth", "ninth", "tenth"]
+
+def _ordinal(n):
+    return _ordinals[n] if n < len(_ordinals) else "%dth" % n
+
+def _removed(n):
+    return {0: "", 1: " once removed", 2: " twice removed"}.get(n, " %d times removed" % n)
+
+class Relationship():
+    """How a is related to b. up and down count the generations from a and
+    from b to their closest common ancestor."""
+
+    __slots__ = ("a", "b", "ancestor", "up", "down")
+
+    def __init__(self, a, b, ancestor, up, down):
+        self.a = a
+        self.b = b
+        self.ancestor = ancestor
+        self.up = up
+        self.down = down
+
+    @property
+    def degree(self):
+        # Civil law degree of consanguinity: generations counted through the common ancestor
+        return self.up + self.down
+
+    @property
+    def cousin(self):
+        return max(min(self.up, self.down) - 1, 0)
+
+    @property
+    def removed(self):
+        return abs(self.up - self.down) if self.cousin > 0 else 0
+
+    @property
+    def siblings(self):
+        return self.up == 1 and self.down == 1
+
+    @property
+    def first_cousins(self):
+        return self.kind == "cousin" and self.cousin == 1 and self.removed == 0
+
+    @property
+    def aunt_or_uncle(self):
+        """a is a sibling of one of b's parents"""
+        return self.up == 1 and self.down == 2
+
+    @property
+    def kind(self):
+        up, down = self.up, self.down
+        if up == 0 and down == 0:
+            return "self"
+        if up == 0:
+            return ["parent", "grandparent"][down - 1] if down <= 2 else "great-" * (down - 2) + "grandparent"
+        if down == 0:
+            return ["child", "grandchild"][up - 1] if up <= 2 else "great-" * (up - 2) + "grandchild"
+        if up == 1 and down == 1:
+            return "sibling"
+        if up == 1:
+            return "great-" * (down - 2) + "aunt/uncle"
+        if down == 1:
+            return "great-" * (up - 2) + "niece/nephew"
+        return "cousin"
+
+    def __str__(self):
+        if self.kind == "cousin":
+            return "%s cousin%s" % (_ordinal(self.cousin), _removed(self.removed))
+        return self.kind
+
+    def __repr__(self):
+        return "Relationship(%s is %s of %s via %s)" % (self.a, self, self.b, self.ancestor)
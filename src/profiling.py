@@ -0,0 +1,143 @@
+"""profiling.py opt-in timings and counters per phase and per rule, with a Chrome trace of the run"""
+
+import json
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+import diagnostics
+import tables
+
+# Setting either turns profiling on: GEDCOM_PROFILE=1 for the summary,
+# GEDCOM_TRACE=FILE to also write the trace
+ENV_PROFILE = "GEDCOM_PROFILE"
+ENV_TRACE = "GEDCOM_TRACE"
+
+SUMMARY_HEADERS = ["Name", "Stories", "Calls", "Seconds", "Findings"]
+
+class Profile():
+    """Totals of every phase and rule since the profile started, and the
+    trace events of the phases. A rule's checks run once per entity, so
+    rules get totals only; the trace lays them out back to back inside the
+    phase that ran them."""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+        self.phases = {}
+        self.rules = {}
+        self.stories = Counter()
+        self.events = []
+        # Seconds of each rule already laid out inside a (nested) phase
+        self._laid_out = Counter()
+
+    def rule(self, rule):
+        """[stories, calls, seconds, findings] of a rule, updated in place"""
+        totals = self.rules.get(rule.name)
+        if totals is None:
+            totals = self.rules[rule.name] = [rule.stories, 0, 0.0, 0]
+        return totals
+
+    def merge(self, rules):
+        """Add rule totals made elsewhere, e.g. in a worker process. They
+        ran in parallel, so they are left out of the trace."""
+        for name, (stories, calls, seconds, findings) in rules.items():
+            totals = self.rules.setdefault(name, [stories, 0, 0.0, 0])
+            totals[1] += calls
+            totals[2] += seconds
+            totals[3] += findings
+            self._laid_out[name] += seconds
+
+    def count(self, findings):
+        self.stories.update(finding.story for finding in findings)
+
+    def _event(self, name, category, start, seconds, args):
+        self.events.append({ "name": name, "cat": category, "ph": "X", "pid": self.pid, "tid": 0,
+                             "ts": (start - self.origin) * 1e6, "dur": seconds * 1e6, "args": args })
+
+    def summary(self):
+        """Rows of SUMMARY_HEADERS: phases in the order they started, then
+        rules by time spent, then findings per story"""
+        rows = [[name, "", calls, "%.4f" % seconds, findings]
+                for name, (calls, seconds, findings) in self.phases.items()]
+        for name, (stories, calls, seconds, findings) in sorted(self.rules.items(), key=lambda item: -item[1][2]):
+            rows.append([name, ",".join(stories), calls, "%.4f" % seconds, findings])
+        for story, findings in sorted(self.stories.items(), key=lambda item: str(item[0])):
+            rows.append(["story", story or "-", "", "", findings])
+        return rows
+
+    def trace(self):
+        return { "traceEvents": self.events, "displayTimeUnit": "ms" }
+
+profile = None
+
+def enable():
+    global profile
+    profile = Profile()
+    return profile
+
+def disable():
+    global profile
+    profile = None
+
+def requested():
+    """Whether the environment asks for profiling, and the trace file if any"""
+    trace = os.environ.get(ENV_TRACE) or None
+    return bool(os.environ.get(ENV_PROFILE) or trace), trace
+
+@contextmanager
+def phase(name, **args):
+    """Time the block as a phase, with the rules run in it"""
+    if profile is None:
+        yield
+        return
+    current = profile
+    before = dict((rule, totals[2] - current._laid_out[rule]) for rule, totals in current.rules.items())
+    findings = diagnostics.collector.count
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        found = diagnostics.collector.count - findings
+        totals = current.phases.setdefault(name, [0, 0.0, 0])
+        totals[0] += 1
+        totals[1] += end - start
+        totals[2] += found
+        args["findings"] = found
+        current._event(name, "phase", start, end - start, args)
+
+        offset = start
+        for rule, totals in current.rules.items():
+            seconds = totals[2] - current._laid_out[rule] - before.get(rule, 0.0)
+            if seconds > 0:
+                current._laid_out[rule] += seconds
+                current._event(rule, "rule", offset, seconds, { "stories": ",".join(totals[0]), "total": True })
+                offset += seconds
+
+def timed(rule, check):
+    """check adding its calls, time and findings to the rule's totals"""
+    totals = profile.rule(rule)
+    clock = time.perf_counter
+
+    def run(*args):
+        findings = diagnostics.collector.count
+        start = clock()
+        try:
+            return check(*args)
+        finally:
+            totals[1] += 1
+            totals[2] += clock() - start
+            totals[3] += diagnostics.collector.count - findings
+    return run
+
+def report(stream, trace=None, format="table"):
+    """Write the summary table to stream and the trace to the file trace"""
+    if profile is None:
+        return
+    tables.table(format, SUMMARY_HEADERS, title="PROFILE", name="profile", stream=stream) \
+        .rows_from(profile.summary()).close()
+    if trace:
+        with open(trace, "w") as f:
+            json.dump(profile.trace(), f)
@@ -0,0 +1,147 @@
+"""rules.py registry of user story checks and the engine that runs them"""
+
+import diagnostics
+import profiling
+from anniversaries import AnniversaryIndex
+from kinship import Kinship
+
+INDIVIDUAL = "individual"
+FAMILY = "family"
+TREE = "tree"
+
+# Indexes a rule can ask for, built once per validation run
+INDEXES = { "kinship": lambda individuals, families: Kinship(individuals),
+            "anniversaries": lambda individuals, families: AnniversaryIndex(individuals, families) }
+
+class Rule():
+    """A check and the user stories it reports.
+    Individual and family checks are called with the entity, tree checks
+    with (individuals, families), followed by one argument per index in needs.
+    Checks with no needs run as soon as an entity is built; the others run
+    in validate_tree once the whole tree is linked."""
+
+    def __init__(self, scope, check, stories, needs=()):
+        self.scope = scope
+        self.check = check
+        self.stories = tuple(stories)
+        self.needs = tuple(needs)
+
+    @property
+    def name(self):
+        return self.check.__qualname__
+
+    def __repr__(self):
+        return "Rule(%s, %s, %s)" % (self.scope, self.name, ",".join(self.stories))
+
+registry = []
+_selected = None
+_active = {}
+
+def register(scope, check, stories, needs=()):
+    for need in needs:
+        if need not in INDEXES:
+            raise ValueError("Unknown index %s" % need)
+    rule = Rule(scope, check, stories, needs)
+    registry.append(rule)
+    _active.clear()
+    return rule
+
+# Reported while the file is read, for repeated ids and invalid dates
+PARSE_STORIES = ("US22", "US24")
+
+def stories():
+    found = set(PARSE_STORIES)
+    for rule in registry:
+        found.update(rule.stories)
+    return found
+
+def select(only=None, skip=()):
+    """Limit validation to the stories in only (all if None) minus skip"""
+    global _selected
+    if only is None and not skip:
+        _selected = None
+    else:
+        _selected = (stories() if only is None else set(only)) - set(skip)
+    _active.clear()
+
+def selection():
+    """Selected stories as a sorted comma separated string, empty when all are"""
+    return "" if _selected is None else ",".join(sorted(_selected))
+
+def enabled(story):
+    return _selected is None or story in _selected
+
+def active(scope, linked=None):
+    """Selected rules of a scope: the ones run while building (linked False),
+    the ones that need the linked tree (linked True) or all of them (None)"""
+    found = _active.get((scope, linked))
+    if found is None:
+        found = [rule for rule in registry
+                 if rule.scope == scope and (linked is None or bool(rule.needs or scope == TREE) == linked)
+                 and any(enabled(story) for story in rule.stories)]
+        _active[(scope, linked)] = found
+    return found
+
+def selected():
+    """Set of selected stories, None when all are"""
+    return None if _selected is None else set(_selected)
+
+def build_indexes(rules, individuals, families):
+    """The indexes needed by rules, each built once"""
+    indexes = {}
+    for rule in rules:
+        for need in rule.needs:
+            if need not in indexes:
+                with profiling.phase("index:" + need):
+                    indexes[need] = INDEXES[need](individuals, families)
+    return indexes
+
+def bind(rules, indexes):
+    """(check, index arguments) pairs ready to be called on each entity.
+    While profiling, each check is wrapped to count its calls and time."""
+    if profiling.profile is not None:
+        return [(profiling.timed(rule, rule.check), [indexes[need] for need in rule.needs]) for rule in rules]
+    return [(rule.check, [indexes[need] for need in rule.needs]) for rule in rules]
+
+def _run(individuals, families, linked, scopes=(INDIVIDUAL, FAMILY, TREE), tree=None):
+    passes = [(active(scope, linked), entities) for scope, entities in
+              ((INDIVIDUAL, individuals), (FAMILY, families)) if scope in scopes]
+    tree_rules = active(TREE, linked) if TREE in scopes else []
+    indexes = build_indexes([rule for rules, _ in passes for rule in rules] + tree_rules,
+                            *(tree or (individuals, families)))
+
+    for rules, entities in passes:
+        if not rules:
+            continue
+        bound = bind(rules, indexes)
+        with profiling.phase("validate:" + rules[0].scope):
+            for entity in entities:
+                if diagnostics.collector.exhausted:
+                    return
+                for check, args in bound:
+                    check(entity, *args)
+
+    with profiling.phase("validate:" + TREE):
+        for check, args in bind(tree_rules, indexes):
+            check(individuals, families, *args)
+
+def validate_tree(individuals, families):
+    """Run every selected rule that needs the linked tree, for entities that
+    were validated as they were built: one pass over the individuals, one
+    over the families, then the whole-tree rules"""
+    _run(individuals, families, True)
+
+def validate_all(individuals, families):
+    """Run every selected rule on a tree built with validate=False, once it
+    is fully linked. Each entity gets all of its checks in a single pass."""
+    _run(individuals, families, None)
+
+def validate_entities(individuals, families, tree=None):
+    """Run the selected individual and family rules on these entities only.
+    tree is the (individuals, families) the indexes are built over, the
+    entities themselves by default."""
+    _run(individuals, families, None, (INDIVIDUAL, FAMILY), tree)
+
+def validate_tree_rules(individuals, families):
+    """Run only the selected whole-tree rules"""
+    _run(individuals, families, None, (TREE,))
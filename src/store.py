@@ -0,0 +1,590 @@
+#!/usr/bin/env python
+"""store.py SQLite store of GEDCOM trees larger than memory, validated with set-based SQL"""
+
+import argparse
+import datetime
+import itertools
+import json
+import os
+import sqlite3
+import sys
+from collections import namedtuple
+
+import dates
+import diagnostics
+import rules
+import Project3
+from anniversaries import AnniversaryIndex, BIRTHDAY, ANNIVERSARY, day_key
+from dates import parse_date, DEFAULT_BIRTH, DEFAULT_MARRIAGE
+from diagnostics import Diagnostic
+from Family import Family, children_spacing
+from gedcom import iter_dicts
+from Individual import Individual
+from kinship import closest, RULE_DEPTH
+
+SUFFIXES = (".db", ".sqlite")
+BATCH = 50000
+# Bound on the generations a relationship query walks up, for cyclic data
+MAX_GENERATIONS = 500
+
+# Findings are written by rank: those of reading the records, of linking
+# the families, then of the individuals and of the families, each in file order
+READ, LINK, INDIVIDUAL, FAMILY = range(4)
+ERROR, ANOMALY = range(2)
+
+SCHEMA = """
+CREATE TABLE meta(key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE individuals(seq INTEGER PRIMARY KEY, id TEXT NOT NULL, name TEXT, sex TEXT,
+                         birth TEXT NOT NULL, death TEXT, birth_key INTEGER NOT NULL);
+CREATE TABLE families(seq INTEGER PRIMARY KEY, id TEXT NOT NULL, husband TEXT, wife TEXT,
+                      married TEXT NOT NULL, divorced TEXT, married_key INTEGER NOT NULL);
+CREATE TABLE chil(family INTEGER NOT NULL, child TEXT NOT NULL);
+CREATE TABLE findings(seq INTEGER PRIMARY KEY, rank INTEGER NOT NULL, position INTEGER NOT NULL,
+                      kind INTEGER NOT NULL, rule INTEGER NOT NULL, header TEXT NOT NULL, story TEXT,
+                      id TEXT, message TEXT NOT NULL, args TEXT NOT NULL);
+CREATE INDEX individuals_id ON individuals(id);
+CREATE INDEX families_id ON families(id);
+"""
+
+# Children resolved as in Project3.link_family, the parent links the
+# kinship rules walk, and the indexes of the checks and queries, with the
+# statistics the query planner needs to pick them
+LINKED = """
+CREATE TABLE links(family TEXT NOT NULL, child TEXT NOT NULL, position INTEGER NOT NULL,
+                   PRIMARY KEY (family, child)) WITHOUT ROWID;
+INSERT OR IGNORE INTO links
+    SELECT f.id, c.child, i.seq FROM chil c JOIN families f ON f.seq = c.family JOIN individuals i ON i.id = c.child
+    WHERE c.child <> f.husband AND c.child <> f.wife;
+DROP TABLE chil;
+CREATE INDEX links_child ON links(child);
+CREATE TABLE parents(child TEXT NOT NULL, parent TEXT NOT NULL, PRIMARY KEY (child, parent)) WITHOUT ROWID;
+INSERT OR IGNORE INTO parents
+    SELECT l.child, f.husband FROM links l JOIN families f ON f.id = l.family
+    UNION SELECT l.child, f.wife FROM links l JOIN families f ON f.id = l.family;
+CREATE INDEX parents_parent ON parents(parent);
+CREATE INDEX families_husband ON families(husband);
+CREATE INDEX families_wife ON families(wife);
+CREATE INDEX individuals_birth_key ON individuals(birth_key);
+CREATE INDEX families_married_key ON families(married_key);
+CREATE INDEX individuals_name_birth ON individuals(name, birth);
+CREATE INDEX findings_id ON findings(id);
+CREATE INDEX findings_order ON findings(rank, position, kind, rule, seq);
+ANALYZE;
+"""
+
+def _year(column):
+    return "CAST(substr(%s, 1, 4) AS INTEGER)" % column
+
+def _age(column):
+    # dates.Clock.age of an ISO date column
+    return "(:year - %s - (:month_day < substr(%s, 6, 5)))" % (_year(column), column)
+
+_COUPLE = "FROM families f JOIN individuals h ON h.id = f.husband JOIN individuals w ON w.id = f.wife"
+_CHILDREN = _COUPLE + " JOIN links l ON l.family = f.id JOIN individuals c ON c.id = l.child"
+
+# What a check sorts by within an entity, after its block: nothing or the child
+_ONCE = ("0", "0")
+_EACH_CHILD = ("l.position", "0")
+
+# Blocks of (story, kind, message, FROM ... WHERE, args, sorted by), one
+# block per statement or loop of the checks of Individual and Family, so
+# findings come in the order those give them
+INDIVIDUAL_CHECKS = [
+    [("US01", ERROR, "Birthday %s occurs in the future",
+      "FROM individuals i WHERE i.birth > :now", "json_array(i.birth)", _ONCE),
+     ("US01", ERROR, "Death %s occurs in the future",
+      "FROM individuals i WHERE i.birth <= :now AND i.death > :now", "json_array(i.death)", _ONCE),
+     ("US03", ERROR, "Died %s before born %s",
+      "FROM individuals i WHERE i.birth <= :now AND i.death < i.birth", "json_array(i.death, i.birth)", _ONCE),
+     ("US07", ERROR, "More than 150 years old at death - Birth %s: Death %s",
+      "FROM individuals i WHERE i.birth <= :now AND abs(%s - %s) > 150" % (_year("i.death"), _year("i.birth")),
+      "json_array(i.birth, i.death)", _ONCE),
+     ("US07", ERROR, "More than 150 years old - Birth %s",
+      "FROM individuals i WHERE i.birth <= :now AND i.death IS NULL AND abs(:year - %s) > 150" % _year("i.birth"),
+      "json_array(i.birth)", _ONCE)],
+]
+
+FAMILY_CHECKS = [
+    [("US01", ERROR, "Marriage date %s occurs in the future",
+      _COUPLE + " WHERE f.married > :now", "json_array(f.married)", _ONCE),
+     ("US02", ERROR, "Husband's birth date %s after marriage date %s",
+      _COUPLE + " WHERE h.birth > f.married", "json_array(h.birth, f.married)", _ONCE),
+     ("US02", ERROR, "Wife's birth date %s after marriage date %s",
+      _COUPLE + " WHERE w.birth > f.married", "json_array(w.birth, f.married)", _ONCE),
+     ("US05", ERROR, "Married %s after husband's (%s) death on %s",
+      _COUPLE + " WHERE h.death < f.married", "json_array(f.married, h.id, h.death)", _ONCE),
+     ("US05", ERROR, "Married %s after wife's (%s) death on %s",
+      _COUPLE + " WHERE w.death < f.married", "json_array(f.married, w.id, w.death)", _ONCE),
+     ("US10", ERROR, "Under 14 at time of marriage - Birth %s: Marriage %s",
+      _COUPLE + " WHERE %s - %s < 14" % (_year("f.married"), _year("h.birth")),
+      "json_array(h.birth, f.married)", _ONCE),
+     ("US10", ERROR, "Under 14 at time of marriage - Birth %s: Marriage %s",
+      _COUPLE + " WHERE %s - %s < 14" % (_year("f.married"), _year("w.birth")),
+      "json_array(w.birth, f.married)", _ONCE)],
+    [("US08", ANOMALY, "Child %s born %s before marriage on %s",
+      _CHILDREN + " WHERE c.birth < f.married", "json_array(c.id, c.birth, f.married)", _EACH_CHILD),
+     ("US09", ERROR, "Child %s born on %s after mother's death on %s",
+      _CHILDREN + " WHERE c.birth > w.death", "json_array(c.id, c.birth, w.death)", _EACH_CHILD),
+     ("US09", ERROR, "Child %s born on %s after father's death on %s",
+      _CHILDREN + " WHERE c.birth > h.death", "json_array(c.id, c.birth, h.death)", _EACH_CHILD)],
+    # Family._check_dates repeats these, they are only reported once here
+    [("US01", ERROR, "Divorce date %s occurs in the future",
+      _COUPLE + " WHERE f.divorced > :now", "json_array(f.divorced)", _ONCE),
+     ("US06", ERROR, "Divorced %s after husband's (%s) death on %s",
+      _COUPLE + " WHERE h.death < f.divorced", "json_array(f.divorced, h.id, h.death)", _ONCE),
+     ("US06", ERROR, "Divorced %s after wife's (%s) death on %s",
+      _COUPLE + " WHERE w.death < f.divorced", "json_array(f.divorced, w.id, w.death)", _ONCE),
+     ("US04", ERROR, "Divorced %s before married %s",
+      _COUPLE + " WHERE f.divorced < f.married", "json_array(f.divorced, f.married)", _ONCE)],
+    [("US12", ERROR, "Father is %s years older than his child.",
+      _CHILDREN + " WHERE %s - %s > 80" % (_age("h.birth"), _age("c.birth")),
+      "json_array(%s - %s)" % (_age("h.birth"), _age("c.birth")), _EACH_CHILD),
+     ("US11", ERROR, "Mother is %s years older than her child.",
+      _CHILDREN + " WHERE %s - %s > 60" % (_age("w.birth"), _age("c.birth")),
+      "json_array(%s - %s)" % (_age("w.birth"), _age("c.birth")), _EACH_CHILD)],
+    [("US16", ANOMALY, "Male lastnames don't match!",
+      _CHILDREN + " WHERE c.sex = 'M' AND surname(c.name) IS NOT surname(h.name)", "'[]'", _EACH_CHILD)],
+    [("US25", ANOMALY, "Cannot have identical first names in a family.",
+      "FROM families f WHERE (SELECT count(*) - count(DISTINCT given(c.name)) FROM links l "
+      "JOIN individuals c ON c.id = l.child WHERE l.family = f.id) > 0", "'[]'", _ONCE)],
+    [("US21", ANOMALY, "Husband's gender is not M", _COUPLE + " WHERE h.sex IS NOT 'M'", "'[]'", _ONCE),
+     ("US21", ANOMALY, "Wife's gender is not F", _COUPLE + " WHERE w.sex IS NOT 'F'", "'[]'", _ONCE)],
+    [("US15", ANOMALY, "Siblings not fewer then 15",
+      "FROM families f WHERE (SELECT count(*) FROM links l WHERE l.family = f.id) > 14", "'[]'", _ONCE)],
+]
+
+# Whole-tree rules as queries of (position, id, kind, story, message, args)
+DUPLICATES = """
+    SELECT i.seq AS position, i.id AS id, 1 AS kind, 'US23' AS story,
+           'Duplicate person: NAME: ' || coalesce(i.name, 'None') || ', Birthday: ' || i.birth || ' 00:00:00' AS message,
+           '[]' AS args
+    FROM individuals i
+    WHERE EXISTS (SELECT 1 FROM individuals j WHERE j.name IS i.name AND j.birth = i.birth AND j.seq < i.seq)
+    ORDER BY i.seq"""
+
+BIGAMY = """
+    WITH marriages(person, seq, id, married, divorced, seen) AS (
+        SELECT person, seq, id, married, divorced, min(seq * 2 + role) OVER (PARTITION BY person)
+        FROM (SELECT husband AS person, seq, id, married, divorced, 0 AS role FROM families
+              UNION SELECT wife, seq, id, married, divorced, 1 FROM families))
+    SELECT later.seq AS position, later.id AS id, 0 AS kind, 'US12' AS story,
+           'Person %s cannot have another marriage without getting the first one (%s) divorced.' AS message,
+           json_array(later.person, earlier.id) AS args
+    FROM marriages earlier JOIN marriages later ON later.person = earlier.person
+        AND (earlier.married < later.married OR earlier.married = later.married AND earlier.seq < later.seq)
+    WHERE earlier.divorced IS NULL OR earlier.divorced > later.married
+    ORDER BY later.seq, later.seen, earlier.married, earlier.seq"""
+
+ANCESTOR = """
+    WITH RECURSIVE up(id) AS (SELECT parent FROM parents WHERE child = ?
+                              UNION SELECT p.parent FROM parents p JOIN up ON p.child = up.id)
+    SELECT 1 FROM up WHERE id = ? LIMIT 1"""
+
+DEPTHS = """
+    WITH RECURSIVE up(id, depth) AS (SELECT ?, 0
+                                     UNION SELECT p.parent, up.depth + 1 FROM up JOIN parents p ON p.child = up.id
+                                     WHERE up.depth < ?)
+    SELECT id, min(depth) FROM up GROUP BY id"""
+
+INSERT = ("INSERT INTO findings(rank, position, kind, rule, header, story, id, message, args) "
+          "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)")
+
+# What the rules and queries need of an entity built from a row
+Entity = namedtuple("Entity", "id bday")
+
+def _surname(name):
+    parts = [] if name is None else name.split("/")
+    return parts[1] if len(parts) > 1 else None
+
+def _given(name):
+    return None if name is None else name.split("/")[0]
+
+def _datetime(text):
+    return None if text is None else datetime.datetime.strptime(text, "%Y-%m-%d")
+
+def _iso(date):
+    return None if date is None else date.strftime("%Y-%m-%d")
+
+def _args(args):
+    return json.dumps([_iso(arg) if isinstance(arg, datetime.datetime) else arg for arg in args])
+
+def _header(rank, kind):
+    entity = Individual if rank == INDIVIDUAL else Family
+    return entity.error_header if kind == ERROR else entity.anomaly_header
+
+def connect(path, check_same_thread=True):
+    db = sqlite3.connect(path, check_same_thread=check_same_thread)
+    db.create_function("surname", 1, _surname, deterministic=True)
+    db.create_function("given", 1, _given, deterministic=True)
+    return db
+
+def create(path):
+    """A new, empty store at path, replacing any there"""
+    if os.path.exists(path):
+        os.remove(path)
+    db = connect(path)
+    # A store is rebuilt from its file rather than recovered, so skip the journal
+    db.execute("PRAGMA journal_mode = OFF")
+    db.execute("PRAGMA synchronous = OFF")
+    db.executescript(SCHEMA)
+    return db
+
+def _date(info, tag, default, invalid, rank, position, rule):
+    # The parsed date of tag, or default with a US24 finding when it is not valid
+    if tag not in info:
+        return default
+    date, valid = parse_date(info[tag])
+    if not valid:
+        invalid.append((rank, position, ERROR, rule, "Invalid Date:", "US24", None, info[tag], "[]"))
+        return default
+    return date
+
+def load(db, records, batch=BATCH):
+    """Insert (tag, xref, info) records as they are read, batch rows per
+    transaction, then link them"""
+    people, families, children, invalid = [], [], [], []
+
+    def flush():
+        with db:
+            db.executemany("INSERT INTO individuals VALUES (?, ?, ?, ?, ?, ?, ?)", people)
+            db.executemany("INSERT INTO families VALUES (?, ?, ?, ?, ?, ?, ?)", families)
+            db.executemany("INSERT INTO chil VALUES (?, ?)", children)
+            db.executemany(INSERT, invalid)
+        for rows in (people, families, children, invalid):
+            del rows[:]
+
+    for seq, (tag, xref, info) in enumerate(records):
+        if tag == "INDI":
+            if 'INDI' not in info:
+                continue
+            bday = _date(info, 'BIRT', DEFAULT_BIRTH, invalid, READ, seq, 0)
+            death = _date(info, 'DEAT', None, invalid, READ, seq, 1)
+            people.append((seq, info['INDI'], info.get('NAME'), info.get('SEX'), _iso(bday), _iso(death),
+                           day_key(bday)))
+        else:
+            # As in Family.instance_from_dict, dates of families are reported when they are linked
+            married = _date(info, 'MARR', DEFAULT_MARRIAGE, invalid, LINK, seq, 0)
+            divorced = _date(info, 'DIV', None, invalid, LINK, seq, 1)
+            families.append((seq, xref, info.get('HUSB'), info.get('WIFE'), _iso(married), _iso(divorced),
+                             day_key(married)))
+            children.extend((seq, child) for child in info.get('CHIL', ()))
+        if len(people) + len(families) + len(children) >= batch:
+            flush()
+    flush()
+    link(db)
+
+def link(db):
+    """Drop the records Project3 never builds: repeated ids (US22) and
+    families with a missing spouse. Then link the children."""
+    with db:
+        for table, header in (("individuals", Individual.error_header), ("families", Family.error_header)):
+            db.execute("CREATE TEMP TABLE dropped AS SELECT seq FROM %s t "
+                       "WHERE seq > (SELECT min(seq) FROM %s WHERE id = t.id)" % (table, table))
+            db.execute("INSERT INTO findings(rank, position, kind, rule, header, story, id, message, args) "
+                       "SELECT ?, seq, ?, 0, ?, 'US22', id, 'already exists', '[]' FROM %s "
+                       "WHERE seq IN (SELECT seq FROM dropped)" % table, (READ, ERROR, header))
+            _drop(db, table)
+
+        db.execute("CREATE TEMP TABLE dropped AS SELECT seq FROM families f "
+                   "WHERE NOT EXISTS (SELECT 1 FROM individuals WHERE id = f.husband) "
+                   "OR NOT EXISTS (SELECT 1 FROM individuals WHERE id = f.wife)")
+        db.execute("""
+            INSERT INTO findings(rank, position, kind, rule, header, story, id, message, args)
+            SELECT ?, seq, ?, -1, ?, NULL, id, '%s %s not found',
+                   CASE WHEN NOT EXISTS (SELECT 1 FROM individuals WHERE id = f.husband)
+                        THEN json_array('HUSB', coalesce(husband, 'NA'))
+                        ELSE json_array('WIFE', coalesce(wife, 'NA')) END
+            FROM families f WHERE seq IN (SELECT seq FROM dropped)""", (LINK, ERROR, Family.error_header))
+        _drop(db, "families")
+    db.executescript(LINKED)
+
+def _drop(db, table):
+    # A record that is never built has no dates to report either
+    db.execute("DELETE FROM findings WHERE story = 'US24' AND position IN (SELECT seq FROM dropped)")
+    db.execute("DELETE FROM %s WHERE seq IN (SELECT seq FROM dropped)" % table)
+    db.execute("DROP TABLE dropped")
+
+def _quote(text):
+    return "'%s'" % text.replace("'", "''")
+
+def _block(alias, checks):
+    # One query of the selected checks of a block, sorted as the Python loops run
+    selects = ["SELECT %s.seq AS position, %s.id AS id, %s AS child, %s AS marriage, %d AS step, %d AS kind, "
+               "%s AS story, %s AS message, %s AS args %s" % (alias, alias, order[0], order[1], step, kind,
+                                                               _quote(story), _quote(message), args, source)
+               for step, (story, kind, message, source, args, order) in enumerate(checks) if rules.enabled(story)]
+    if not selects:
+        return None
+    return ("SELECT position, id, kind, story, message, args FROM (%s) ORDER BY position, child, marriage, step"
+            % " UNION ALL ".join(selects))
+
+def _insert(db, rank, rule, select, params):
+    # Findings from a query of (position, id, kind, story, message, args)
+    db.execute("INSERT INTO findings(rank, position, kind, rule, header, story, id, message, args) "
+               "SELECT :rank, position, kind, :rule, CASE kind WHEN %d THEN :error ELSE :anomaly END, "
+               "story, id, message, args FROM (%s)" % (ERROR, select),
+               dict(params, rank=rank, rule=rule, error=_header(rank, ERROR), anomaly=_header(rank, ANOMALY)))
+
+def validate(db, batch=BATCH):
+    """Run the selected rules on a loaded store as of the reference day,
+    replacing the findings of the entities from an earlier run. Each block
+    of checks is one INSERT ... SELECT; sibling spacing and the kinship
+    rules are cursor passes over the families, written batch rows at a time."""
+    clock = dates.clock
+    params = { "now": clock.day.isoformat(), "year": clock.year, "month_day": "%02d-%02d" % clock.month_day }
+    with db:
+        db.execute("DELETE FROM findings WHERE rank >= ?", (INDIVIDUAL,))
+        rule = 0
+        for rank, blocks, alias in ((INDIVIDUAL, INDIVIDUAL_CHECKS, "i"), (FAMILY, FAMILY_CHECKS, "f")):
+            for checks in blocks:
+                rule += 1
+                select = _block(alias, checks)
+                if select is not None:
+                    _insert(db, rank, rule, select, params)
+
+        rule += 1
+        if rules.enabled("US13") or rules.enabled("US14"):
+            _children_spacing(db, rule, batch)
+        rule += 1
+        if any(rules.enabled(story) for story in ("US17", "US18", "US19", "US20")):
+            _kinship(db, rule, batch)
+
+        rule += 4
+        for rank, story, select in ((FAMILY, "US12", BIGAMY), (INDIVIDUAL, "US23", DUPLICATES)):
+            if rules.enabled(story):
+                _insert(db, rank, rule, select, params)
+        db.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                       (("as_of", params["now"]), ("rules", rules.selection())))
+
+def _children_spacing(db, rule, batch):
+    # US13 and US14 of Family._validate_children, one family at a time
+    rows = []
+    children = db.execute("SELECT f.seq, f.id, c.id, c.birth FROM families f JOIN links l ON l.family = f.id "
+                          "JOIN individuals c ON c.id = l.child ORDER BY f.seq, l.position")
+    for (seq, id), group in itertools.groupby(children, lambda row: row[:2]):
+        for story, message, args in children_spacing([Entity(child, _datetime(birth)) for _, _, child, birth in group]):
+            if rules.enabled(story):
+                rows.append((FAMILY, seq, ERROR, rule, Family.error_header, story, id, message, _args(args)))
+        if len(rows) >= batch:
+            _write(db, rows)
+    _write(db, rows)
+
+def _kinship(db, rule, batch):
+    # Individual._check_marriages2 and the kinship rules of Family for each
+    # couple, with the ancestors of the two found by recursive queries
+    rows = []
+    couples = db.execute("SELECT f.seq, f.id, f.husband, f.wife, h.seq, w.seq " + _COUPLE + " ORDER BY f.seq")
+    for seq, id, husband, wife, husband_seq, wife_seq in couples:
+        if rules.enabled("US17"):
+            down = db.execute(ANCESTOR, (wife, husband)).fetchone() is not None
+            up = db.execute(ANCESTOR, (husband, wife)).fetchone() is not None
+            for descends, person, position, spouse in ((down, husband, husband_seq, wife),
+                                                       (up, wife, wife_seq, husband)):
+                if descends:
+                    rows.append((INDIVIDUAL, position, ANOMALY, rule, Individual.anomaly_header, "US17", person,
+                                 "Spouse %s is a descendant", _args([spouse])))
+            if down:
+                rows.append((FAMILY, seq, ANOMALY, rule, Family.anomaly_header, "US17", id,
+                             "Wife %s is a descendant of husband %s", _args([wife, husband])))
+            elif up:
+                rows.append((FAMILY, seq, ANOMALY, rule, Family.anomaly_header, "US17", id,
+                             "Husband %s is a descendant of wife %s", _args([husband, wife])))
+
+        if any(rules.enabled(story) for story in ("US18", "US19", "US20")):
+            relation = closest(husband, wife, dict(db.execute(DEPTHS, (husband, RULE_DEPTH))),
+                               dict(db.execute(DEPTHS, (wife, RULE_DEPTH))))
+            if relation is not None and relation.siblings and rules.enabled("US18"):
+                rows.append((FAMILY, seq, ANOMALY, rule + 1, Family.anomaly_header, "US18", id,
+                             "Siblings should not marry: %s, %s", _args([husband, wife])))
+            if relation is not None and relation.first_cousins and rules.enabled("US19"):
+                rows.append((FAMILY, seq, ANOMALY, rule + 2, Family.anomaly_header, "US19", id,
+                             "Cannot marry between first cousins: %s, %s", _args([husband, wife])))
+            if relation is not None and rules.enabled("US20"):
+                # relation is of husband to wife; of wife to husband, up and down swap
+                for elder, younger, steps in ((husband, wife, (1, 2)), (wife, husband, (2, 1))):
+                    if (relation.up, relation.down) == steps:
+                        rows.append((FAMILY, seq, ANOMALY, rule + 3, Family.anomaly_header, "US20", id,
+                                     "An aunt or uncle should not marry their niece or nephiew: %s, %s",
+                                     _args([elder, younger])))
+        if len(rows) >= batch:
+            _write(db, rows)
+    _write(db, rows)
+
+def _write(db, rows):
+    db.executemany(INSERT, rows)
+    del rows[:]
+
+def findings(db, stories=None):
+    """Diagnostics in the order Project3 writes them, read as they are written"""
+    for header, story, id, message, args in db.execute(
+            "SELECT header, story, id, message, args FROM findings ORDER BY rank, position, kind, rule, seq"):
+        # Parse findings are stored for every load, the selection applies when they are read
+        if (stories is None or story in stories) and (story not in rules.PARSE_STORIES or rules.enabled(story)):
+            yield Diagnostic(header, story, id, message, tuple(json.loads(args)))
+
+class StoredAnniversaries(AnniversaryIndex):
+    """AnniversaryIndex of a store, its rows read through the day-of-year indexes"""
+
+    QUERIES = { BIRTHDAY: "SELECT birth_key, seq, id, birth FROM individuals "
+                          "WHERE birth_key BETWEEN ? AND ? ORDER BY birth_key, seq",
+                ANNIVERSARY: "SELECT married_key, seq, id, married FROM families "
+                             "WHERE married_key BETWEEN ? AND ? ORDER BY married_key, seq" }
+
+    def __init__(self, db):
+        self.db = db
+
+    def rows(self, kind, first, last):
+        return [(key, position, Entity(id, None), _datetime(date))
+                for key, position, id, date in self.db.execute(self.QUERIES[kind], (first, last))]
+
+class SqliteTree():
+    """A store answering the queries of daemon.Tree. Entities are built from
+    their rows when asked for, so memory does not grow with the tree. The
+    store is validated again when it was last validated for another day."""
+
+    def __init__(self, path):
+        self.path = path
+        self.stamp = None
+        self.db = None
+        self.load()
+
+    def file_stamp(self):
+        st = os.stat(self.path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def load(self):
+        # Connecting would create an empty database where there is none
+        self.file_stamp()
+        # Opened by the thread that reloads it and then used by the daemon's
+        self.db = connect(self.path, check_same_thread=False)
+        self.anniversaries = StoredAnniversaries(self.db)
+        validated = dict(self.db.execute("SELECT key, value FROM meta WHERE key IN ('as_of', 'rules')"))
+        if validated != { "as_of": dates.clock.day.isoformat(), "rules": rules.selection() }:
+            validate(self.db)
+        self.stamp = self.file_stamp()
+
+    def reloaded(self):
+        """The store reopened, as it was rebuilt since this one was opened"""
+        return SqliteTree(self.path)
+
+    def forget(self):
+        # Nothing is kept from one day to the next but what is in the store
+        pass
+
+    def close(self):
+        self.db.close()
+
+    def counts(self):
+        return tuple(self.db.execute("SELECT count(*) FROM %s" % table).fetchone()[0]
+                     for table in ("individuals", "families", "findings"))
+
+    def findings(self, stories=None):
+        return list(findings(self.db, stories))
+
+    @property
+    def output(self):
+        # What the US31 and US32 rules print in a run of Project3
+        lines = []
+        for kind, story in ((BIRTHDAY, "US31"), (ANNIVERSARY, "US32")):
+            if rules.enabled(story):
+                lines.extend("%s: %s Upcoming %s on: %s\n" % (story, occurrence.entity.id, kind, occurrence.date)
+                             for occurrence in Project3.upcoming(self.anniversaries, kind))
+        return "".join(lines)
+
+    def _row(self, id):
+        return self.db.execute("SELECT id, name, sex, birth, death FROM individuals WHERE id = ?", (id,)).fetchone()
+
+    def _individual(self, row, children=(), spouses=()):
+        id, name, sex, birth, death = row
+        bday = _datetime(birth)
+        return Individual(id, name, sex, bday, dates.clock.age(bday), (), death is None, _datetime(death),
+                          list(children), list(spouses), validate=False)
+
+    def _with_findings(self, entity, rank):
+        for kind, header, story, message, args in self.db.execute(
+                "SELECT kind, header, story, message, args FROM findings WHERE id = ? AND rank = ? "
+                "ORDER BY kind, rule, seq", (entity.id, rank)):
+            found = Diagnostic(header, story, entity.id, message, tuple(json.loads(args)))
+            if kind == ERROR:
+                entity._errors = (entity._errors or []) + [found]
+            else:
+                entity._anomalies = (entity._anomalies or []) + [found]
+        return entity
+
+    def entity(self, id):
+        """The Individual or Family of id, with its findings"""
+        row = self._row(id)
+        if row is not None:
+            # Spouses and children in the order linking the families gives them
+            spouses = self.db.execute("SELECT wife, seq, 0 FROM families WHERE husband = ? "
+                                      "UNION ALL SELECT husband, seq, 1 FROM families WHERE wife = ? ORDER BY 2, 3",
+                                      (id, id)).fetchall()
+            children = self.db.execute("SELECT l.child, f.seq, 0, l.position FROM families f "
+                                       "JOIN links l ON l.family = f.id WHERE f.husband = ? "
+                                       "UNION ALL SELECT l.child, f.seq, 1, l.position FROM families f "
+                                       "JOIN links l ON l.family = f.id WHERE f.wife = ? ORDER BY 2, 3, 4",
+                                       (id, id)).fetchall()
+            indiv = self._individual(row, [Entity(child[0], None) for child in children],
+                                     [Entity(spouse[0], None) for spouse in spouses])
+            return self._with_findings(indiv, INDIVIDUAL)
+
+        row = self.db.execute("SELECT id, husband, wife, married, divorced FROM families WHERE id = ?", (id,)).fetchone()
+        if row is None:
+            raise LookupError("no individual or family %s in %s" % (id, self.path))
+        id, husband, wife, married, divorced = row
+        children = [Entity(child, None) for child, in
+                    self.db.execute("SELECT child FROM links WHERE family = ? ORDER BY position", (id,))]
+        fam = Family(id, self._individual(self._row(husband)), self._individual(self._row(wife)),
+                     _datetime(married), _datetime(divorced), children, validate=False)
+        return self._with_findings(fam, FAMILY)
+
+    def _known(self, id):
+        if self.db.execute("SELECT 1 FROM individuals WHERE id = ? UNION ALL SELECT 1 FROM families WHERE id = ?",
+                           (id, id)).fetchone() is None:
+            raise LookupError("no individual or family %s in %s" % (id, self.path))
+        return id
+
+    def relationship(self, a, b):
+        a, b = self._known(a), self._known(b)
+        return closest(a, b, dict(self.db.execute(DEPTHS, (a, MAX_GENERATIONS))),
+                       dict(self.db.execute(DEPTHS, (b, MAX_GENERATIONS))))
+
+    def upcoming(self, kind, days):
+        return self.anniversaries.upcoming(kind, dates.clock.day, days)
+
+def build(file, path, batch=BATCH):
+    """Load file into a new store at path and validate it; returns the connection"""
+    db = create(path)
+    load(db, iter_dicts(file), batch)
+    validate(db, batch)
+    return db
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Load a GEDCOM file into an SQLite store and validate it there")
+    parser.add_argument("file", help="GEDCOM file to load")
+    parser.add_argument("db", help="store to build, replacing any there; daemon.py serves files ending in %s"
+                                   % " or ".join(SUFFIXES))
+    parser.add_argument("--as-of", type=datetime.date.fromisoformat, metavar="YYYY-MM-DD",
+                        help="check dates and compute ages as of this day instead of today")
+    parser.add_argument("--batch", type=int, default=BATCH, metavar="ROWS",
+                        help="rows inserted per transaction")
+    parser.add_argument("--diagnostics", choices=diagnostics.MODES, default="text",
+                        help="write findings as text, JSON Lines, or only counts per story")
+    parser.add_argument("--rules", type=Project3.story_list, metavar="US01,US02",
+                        help="only run the checks of these user stories")
+    parser.add_argument("--skip", type=Project3.story_list, default=[], metavar="US19",
+                        help="do not run the checks of these user stories")
+    return parser.parse_args(argv)
+
+def main(argv):
+    args = parse_args(argv)
+    dates.set_as_of(args.as_of)
+    rules.select(args.rules, args.skip)
+    db = build(args.file, args.db, args.batch)
+    sink = diagnostics.configure(args.diagnostics)
+    sink.extend(findings(db))
+    sink.close()
+    db.close()
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
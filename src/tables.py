@@ -0,0 +1,180 @@
+"""tables.py streaming report tables in box, fixed width, markdown, CSV and JSON Lines formats"""
+
+import csv
+import json
+import sys
+
+FORMATS = ("table", "fixed", "markdown", "csv", "jsonl")
+
+class Table():
+    """Writes one table to stream, a row at a time.
+    The title line and header are written with the first row, or on close
+    if the table is required to appear even when it has no rows."""
+
+    def __init__(self, headers, title=None, name=None, required=True, stream=None):
+        self.headers = [str(header) for header in headers]
+        self.title = title
+        self.name = name if name is not None else title
+        self.required = required
+        self.stream = stream if stream is not None else sys.stdout
+        self.rows = 0
+        self._started = False
+
+    # Whether _row takes the values as given rather than as strings
+    raw = False
+
+    def row(self, values):
+        if not self._started:
+            self._start()
+        self.rows += 1
+        self._row(values if self.raw else [str(value) for value in values])
+
+    def rows_from(self, rows):
+        for values in rows:
+            self.row(values)
+        return self
+
+    def close(self):
+        if not self._started and self.required:
+            self._start()
+        if self._started:
+            self._end()
+
+    def _start(self):
+        self._started = True
+        if self.title is not None:
+            self.stream.write(self.title + "\n")
+        self._header()
+
+    def _header(self):
+        pass
+
+    def _row(self, cells):
+        raise NotImplementedError
+
+    def _end(self):
+        pass
+
+def _rule(widths):
+    return "+" + "+".join("-" * (width + 2) for width in widths) + "+\n"
+
+def _line(cells, widths):
+    return "|" + "|".join(" %s " % cell.center(width) for cell, width in zip(cells, widths)) + "|\n"
+
+class BoxTable(Table):
+    """The PrettyTable layout: every column as wide as its widest cell.
+    That needs every row, so this is the one format that buffers."""
+
+    def __init__(self, *args, **kwargs):
+        Table.__init__(self, *args, **kwargs)
+        self._cells = []
+
+    def _row(self, cells):
+        self._cells.append(cells)
+
+    def _end(self):
+        widths = [len(header) for header in self.headers]
+        for cells in self._cells:
+            widths = [max(width, len(cell)) for width, cell in zip(widths, cells)]
+
+        rule = _rule(widths)
+        out = [rule, _line(self.headers, widths), rule]
+        out.extend(_line(cells, widths) for cells in self._cells)
+        out.append(rule)
+        self.stream.write("".join(out))
+        self._cells = []
+
+class FixedTable(BoxTable):
+    """Box layout with column widths fixed from the first sample rows (or
+    given widths), after which rows are written as they come. Wider cells
+    later on are written in full and push their row out of line."""
+
+    def __init__(self, *args, sample=100, widths=None, **kwargs):
+        BoxTable.__init__(self, *args, **kwargs)
+        self.sample = sample
+        self.widths = widths
+
+    def _row(self, cells):
+        if self.widths is not None:
+            self.stream.write(_line(cells, self.widths))
+            return
+        self._cells.append(cells)
+        if len(self._cells) >= self.sample:
+            self._fix_widths()
+
+    def _fix_widths(self):
+        widths = [len(header) for header in self.headers]
+        for cells in self._cells:
+            widths = [max(width, len(cell)) for width, cell in zip(widths, cells)]
+        self.widths = widths
+
+        rule = _rule(widths)
+        out = [rule, _line(self.headers, widths), rule]
+        out.extend(_line(cells, widths) for cells in self._cells)
+        self.stream.write("".join(out))
+        self._cells = []
+
+    def _header(self):
+        if self.widths is not None:
+            rule = _rule(self.widths)
+            self.stream.write(rule + _line(self.headers, self.widths) + rule)
+
+    def _end(self):
+        if self.widths is None:
+            self._fix_widths()
+        self.stream.write(_rule(self.widths))
+
+def _markdown(cell):
+    return cell.replace("|", "\\|")
+
+class MarkdownTable(Table):
+    def _header(self):
+        self.stream.write("| %s |\n" % " | ".join(map(_markdown, self.headers)))
+        self.stream.write("|%s|\n" % "|".join("---" for _ in self.headers))
+
+    def _row(self, cells):
+        self.stream.write("| %s |\n" % " | ".join(map(_markdown, cells)))
+
+    def _end(self):
+        self.stream.write("\n")
+
+class CsvTable(Table):
+    """One section per table: the title alone on a row, the header, the rows
+    and a blank line"""
+
+    def _start(self):
+        self._started = True
+        self._writer = csv.writer(self.stream, lineterminator="\n")
+        if self.title is not None:
+            self._writer.writerow([self.title])
+        self._writer.writerow(self.headers)
+
+    def _row(self, cells):
+        self._writer.writerow(cells)
+
+    def _end(self):
+        self.stream.write("\n")
+
+class JsonLinesTable(Table):
+    """One object per row, keyed by header, with the table name under "table".
+    Nothing is written for the title or header."""
+
+    raw = True
+
+    def _start(self):
+        self._started = True
+
+    def _row(self, cells):
+        record = { "table": self.name }
+        record.update(zip(self.headers, cells))
+        self.stream.write(json.dumps(record) + "\n")
+
+WRITERS = { "table": BoxTable, "fixed": FixedTable, "markdown": MarkdownTable,
+            "csv": CsvTable, "jsonl": JsonLinesTable }
+
+def table(format, headers, title=None, name=None, required=True, stream=None, **options):
+    """A Table of the given format, see FORMATS. options go to the writer,
+    e.g. sample or widths for fixed."""
+    if format not in WRITERS:
+        raise ValueError("Unknown table format %s" % format)
+    return WRITERS[format](headers, title=title, name=name, required=required, stream=stream, **options)
@@ -1,4 +1,6 @@
-import datetime
+import dates
+from anniversaries import AnniversaryIndex, BIRTHDAY
+from dates import parse_date
 
 
 def US23(fam):
@@ -25,29 +27,21 @@ def US23(fam):
             
 
 def US24(date):
-    #Takes in a string and returns wether it is a valid date in the format DD-MM-YYYY
-    try:
-        make_date_possible = datetime.datetime.strptime(date, '%d %b %Y')
-    except:
-        return False #If try block fails, date is invalid, return False
-    return True #If try block succeeds go to here
+    #Takes in a string and returns wether it is a valid date in the format DD MON YYYY
+    return parse_date(date)[1]
+
+class _Dated():
+    def __init__(self, date):
+        self.bday = date
+
+def _coming_up(date):
+    #Whether date comes round in the 30 days after the reference day, as Project3 lists them
+    return bool(AnniversaryIndex([_Dated(date)]).upcoming(BIRTHDAY, dates.clock.day, 30))
 
 def US31(date):
-    married_date_in = date
-    curr_year = datetime.datetime.now().year
-    married_date_in = married_date_in.replace(year=curr_year)
-    check = married_date_in - datetime.datetime.now()
-    if check.days<30 and check.days>0:
-        return True
-    return False
+    return _coming_up(date)
 def US32(date):
-    married_date_in = date
-    curr_year = datetime.datetime.now().year
-    married_date_in = married_date_in.replace(year=curr_year)
-    check = married_date_in - datetime.datetime.now()
-    if check.days<30 and check.days>0:
-        return True
-    return False
+    return _coming_up(date)
 
 def US15(siblings):
     if len(siblings)<14: